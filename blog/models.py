@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django import forms
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.shortcuts import render
@@ -11,8 +14,32 @@ from wagtail.models import Page, Orderable
 from wagtail.fields import RichTextField
 from wagtail.admin.panels import FieldPanel, InlinePanel, MultiFieldPanel
 from wagtail.search import index
+from wagtail.signals import page_published, page_unpublished
 from wagtail.snippets.models import register_snippet
 
+from totrip.conditional import conditional_page
+from totrip.pagecache import anonymous_page_cache, purge
+
+BLOG_NAMESPACE = 'blog'
+BLOG_INDEX_PARAMS = ('tag', 'category', 'query', 'page', 'sort_by')
+
+
+def live_posts_freshness(request, *timestamps):
+    """
+    Freshness of a blog page for totrip.conditional.
+
+    Every blog page lists other live posts (the index, or related posts on a
+    post), so one aggregate over live posts plus the page's own publish time
+    describes it. Previews always render.
+    """
+    if getattr(request, 'is_preview', False):
+        return None
+    posts = BlogPage.objects.live().aggregate(published=Max('last_published_at'), total=Count('pk'))
+    known = [value for value in timestamps + (posts['published'],) if value is not None]
+    if not known:
+        return None
+    return (posts['published'], posts['total']) + timestamps, max(known)
+
 
 class BlogIndexPage(Page):
     intro = RichTextField(blank=True)
@@ -21,6 +48,18 @@ class BlogIndexPage(Page):
         FieldPanel('intro'),
     ]
     
+    def serve(self, request, *args, **kwargs):
+        """Serve the index, answering revisits with 304 Not Modified"""
+        serve = conditional_page(self.freshness)(super().serve)
+        serve = anonymous_page_cache((BLOG_NAMESPACE,), query_params=BLOG_INDEX_PARAMS)(serve)
+        return serve(request, *args, **kwargs)
+
+    def freshness(self, request, *args, **kwargs):
+        # Popular ordering follows view_count, which changes on every post view.
+        if request.GET.get('sort_by') == 'popular':
+            return None
+        return live_posts_freshness(request, self.last_published_at)
+
     def get_context(self, request):
         context = super().get_context(request)
         
@@ -136,8 +175,15 @@ class BlogPage(Page):
         self.view_count += 1
         self.save(update_fields=['view_count'])
     
-    def serve(self, request):
-        """Override the default serve method to add custom context"""
+    def serve(self, request, *args, **kwargs):
+        """Serve the post, answering revisits with 304 Not Modified"""
+        return conditional_page(self.freshness)(self.serve_post)(request)
+
+    def freshness(self, request, *args, **kwargs):
+        return live_posts_freshness(request, self.last_published_at)
+
+    def serve_post(self, request):
+        """Render the post with related posts and categories"""
         context = super().get_context(request)
         
         self.increase_view_count()
@@ -242,3 +288,14 @@ class BlogAuthor(models.Model):
     class Meta:
         verbose_name = "Blog Author"
         verbose_name_plural = "Blog Authors"
+
+
+@receiver(page_published, sender=BlogIndexPage)
+@receiver(page_published, sender=BlogPage)
+@receiver(page_unpublished, sender=BlogIndexPage)
+@receiver(page_unpublished, sender=BlogPage)
+@receiver(post_delete, sender=BlogPage)
+@receiver([post_save, post_delete], sender=BlogCategory)
+def blog_changed(sender, instance, **kwargs):
+    """The blog index lists posts and categories; mark its cached pages stale."""
+    purge(BLOG_NAMESPACE)
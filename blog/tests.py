@@ -1,3 +1,49 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from wagtail.models import Page
+
+from .models import BlogIndexPage, BlogPage
+
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def publish(parent, page):
+    parent.add_child(instance=page)
+    page.save_revision().publish()
+    return page
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class BlogConditionalGetTests(TestCase):
+    def setUp(self):
+        root = Page.objects.get(depth=1).get_children().first()
+        self.index = publish(root, BlogIndexPage(title='Blog', slug='blog'))
+        self.post = publish(self.index, BlogPage(
+            title='Diriyah', slug='diriyah', intro='Old town', date=datetime.date(2025, 1, 1)
+        ))
+
+    def test_post_returns_304_for_matching_etag(self):
+        response = self.client.get(self.post.url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.post.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_publishing_another_post_changes_etag(self):
+        etag = self.client.get(self.post.url)['ETag']
+        publish(self.index, BlogPage(
+            title='AlUla', slug='alula', intro='Rocks', date=datetime.date(2025, 2, 1)
+        ))
+        response = self.client.get(self.post.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_index_is_conditional_except_popular_sort(self):
+        etag = self.client.get(self.index.url)['ETag']
+        response = self.client.get(self.index.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.index.url + '?sort_by=popular')
+        self.assertNotIn('ETag', response)
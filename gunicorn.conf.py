@@ -0,0 +1,91 @@
+"""
+Gunicorn configuration, picked up automatically from the working directory.
+
+Every value can be overridden from the environment, so the same image can be
+sized per host:
+
+    WEB_CONCURRENCY         worker processes (default: 2 x CPUs + 1)
+    GUNICORN_THREADS        threads per worker (default: 1, i.e. sync workers)
+    GUNICORN_WORKER_CLASS   e.g. "uvicorn.workers.UvicornWorker" with
+                            GUNICORN_APP=totrip.asgi:application
+    GUNICORN_PRELOAD        "0" to load the app in each worker instead
+    GUNICORN_MAX_REQUESTS   recycle a worker after this many requests
+    GUNICORN_TIMEOUT        seconds before a silent worker is killed
+    GUNICORN_KEEPALIVE      seconds to hold idle keep-alive connections
+
+Migrations are not run here; see scripts/release.sh.
+"""
+
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "totrip.settings.production")
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _cpu_count():
+    # Respect container CPU pinning where the platform exposes it.
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+wsgi_app = os.environ.get("GUNICORN_APP", "totrip.wsgi:application")
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+workers = _env_int("WEB_CONCURRENCY", 2 * _cpu_count() + 1)
+threads = _env_int("GUNICORN_THREADS", 1)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread" if threads > 1 else "sync")
+
+# Import Django, the URLconf and the warmed template cache once in the master;
+# forked workers share those pages copy-on-write instead of each building
+# their own.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+# Recycle workers now and then so slow leaks can't accumulate; the jitter
+# keeps them from all restarting at once.
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+
+timeout = _env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+# Slightly longer than a typical load balancer's idle timeout.
+keepalive = _env_int("GUNICORN_KEEPALIVE", 75)
+
+# Heartbeat files on tmpfs; the container's overlay filesystem can stall them.
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = "-"
+errorlog = "-"
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def pre_fork(server, worker):
+    """
+    Close anything the preloaded app opened in the master (start-up queries,
+    cache clients), so no worker inherits a socket shared with its siblings.
+    """
+    if not server.cfg.preload_app:
+        return
+    from django.core.cache import caches
+    from django.db import connections
+
+    connections.close_all()
+    caches.close_all()
+
+
+def post_worker_init(worker):
+    """Warm the worker's own connections before it accepts requests."""
+    if worker.cfg.worker_class_str != "sync":
+        # Threaded and async workers run requests on other threads, each with
+        # its own connections.
+        return
+    from totrip.warmup import warm_connections
+
+    try:
+        warm_connections()
+    except Exception as e:
+        # A cold start is better than a worker that never boots.
+        worker.log.warning("Connection warm-up failed: %s", e)
@@ -1,7 +1,20 @@
 from django.db import models
+from django.dispatch import receiver
 
 from wagtail.models import Page
+from wagtail.signals import page_published, page_unpublished
+
+from totrip.pagecache import anonymous_page_cache, purge
+
+HOME_NAMESPACE = 'home'
 
 
 class HomePage(Page):
-    pass
+    def serve(self, request, *args, **kwargs):
+        return anonymous_page_cache((HOME_NAMESPACE,))(super().serve)(request, *args, **kwargs)
+
+
+@receiver(page_published, sender=HomePage)
+@receiver(page_unpublished, sender=HomePage)
+def home_page_changed(sender, instance, **kwargs):
+    purge(HOME_NAMESPACE)
@@ -0,0 +1,8 @@
+#!/bin/sh
+# Release phase: run once per deploy, before the new web containers start
+# serving. Keeping this out of the container's CMD stops every replica from
+# racing to migrate on boot.
+set -eu
+
+python manage.py migrate --noinput
+python manage.py check --deploy --fail-level ERROR
@@ -0,0 +1,38 @@
+/*
+ * Copies third-party front-end dependencies from node_modules into
+ * totrip/static/vendor so they are served by WhiteNoise with hashed names
+ * instead of being loaded from public CDNs.
+ */
+const fs = require('fs');
+const path = require('path');
+
+const root = path.resolve(__dirname, '..');
+const modules = path.join(root, 'node_modules');
+const vendor = path.join(root, 'totrip', 'static', 'vendor');
+
+const copies = [
+  ['jquery/dist/jquery.min.js', 'jquery/jquery.min.js'],
+  ['aos/dist/aos.js', 'aos/aos.js'],
+  ['aos/dist/aos.css', 'aos/aos.css'],
+  ['@fortawesome/fontawesome-free/css/all.min.css', 'fontawesome/css/all.min.css'],
+  ['@fortawesome/fontawesome-free/webfonts', 'fontawesome/webfonts'],
+  ['@fontsource/tajawal/files', 'tajawal/files'],
+];
+
+// Font weights used by the site; concatenated into a single stylesheet.
+const tajawalWeights = ['400', '500', '700'];
+
+fs.rmSync(vendor, { recursive: true, force: true });
+
+for (const [source, target] of copies) {
+  const destination = path.join(vendor, target);
+  fs.mkdirSync(path.dirname(destination), { recursive: true });
+  fs.cpSync(path.join(modules, source), destination, { recursive: true });
+}
+
+const tajawalCss = tajawalWeights
+  .map((weight) => fs.readFileSync(path.join(modules, '@fontsource/tajawal', `${weight}.css`), 'utf8'))
+  .join('\n');
+fs.writeFileSync(path.join(vendor, 'tajawal', 'tajawal.css'), tajawalCss);
+
+console.log(`Vendored ${copies.length} assets into ${path.relative(root, vendor)}`);
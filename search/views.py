@@ -5,16 +5,13 @@ from wagtail.models import Page
 
 # To enable logging of search queries for use with the "Promoted search results" module
 # <https://docs.wagtail.org/en/stable/reference/contrib/searchpromotions.html>
-# uncomment the following line and the lines indicated in the search function
+# uncomment the following line and the lines indicated in the run_search function
 # (after adding wagtail.contrib.search_promotions to INSTALLED_APPS):
 
 # from wagtail.contrib.search_promotions.models import Query
 
 
-def search(request):
-    search_query = request.GET.get("query", None)
-    page = request.GET.get("page", 1)
-
+def run_search(search_query, page):
     # Search
     if search_query:
         search_results = Page.objects.live().search(search_query)
@@ -36,6 +33,16 @@ def search(request):
     except EmptyPage:
         search_results = paginator.page(paginator.num_pages)
 
+    # Run the search now rather than while the template renders.
+    search_results.object_list = list(search_results.object_list)
+    return search_results
+
+
+def search(request):
+    search_query = request.GET.get("query", None)
+    page = request.GET.get("page", 1)
+    search_results = run_search(search_query, page)
+
     return TemplateResponse(
         request,
         "search/search.html",
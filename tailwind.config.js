@@ -0,0 +1,24 @@
+/** @type {import('tailwindcss').Config} */
+module.exports = {
+  // Every file that can emit Tailwind class names. Classes that only appear
+  // outside these paths are purged from the production stylesheet.
+  content: [
+    './totrip/templates/**/*.html',
+    './home/templates/**/*.html',
+    './search/templates/**/*.html',
+    './blog/templates/**/*.html',
+    './tourguides/templates/**/*.html',
+    './users/templates/**/*.html',
+    './tourguides/forms.py',
+    './users/forms.py',
+    './totrip/static/js/totrip.js',
+  ],
+  theme: {
+    extend: {
+      fontFamily: {
+        sans: ['Tajawal', 'sans-serif'],
+      },
+    },
+  },
+  plugins: [],
+};
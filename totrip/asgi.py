@@ -0,0 +1,22 @@
+"""
+ASGI config for totrip project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "totrip.settings.production")
+
+application = get_asgi_application()
+
+if settings.TEMPLATE_WARMUP:
+    from totrip.warmup import warm_templates
+
+    warm_templates()
@@ -0,0 +1,200 @@
+"""
+In-process benchmarks of the public and dashboard pages, and of password
+hashing, which bounds login throughput.
+
+Each scenario is requested through Django's test client, so the numbers
+cover the full middleware, view and template stack without a web server or
+network in the way. The anonymous page cache is switched off so every
+request renders.
+"""
+
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth.hashers import get_hasher, get_hashers
+from django.db import connection, reset_queries
+from django.db.models import Count, Q
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from blog.models import BlogIndexPage, BlogPage
+from tourguides.models import Language, Location, Specialty, TourGuide
+
+BENCHMARK_SETTINGS = {
+    # DEBUG logs every query and renders templates in debug mode.
+    'DEBUG': False,
+    'PAGE_CACHE_ENABLED': False,
+    'ALLOWED_HOSTS': ['*'],
+    # No collectstatic needed for {% static %}.
+    'STORAGES': {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+}
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+def _busiest(model, relation):
+    """The lookup row used by the most active guides, so filters match something."""
+    return (
+        model.objects.annotate(guides=Count(relation, filter=Q(**{f'{relation}__is_active': True})))
+        .order_by('-guides', 'pk')
+        .first()
+    )
+
+
+def build_scenarios():
+    """
+    Return (name, url, login_user) tuples for the current data.
+
+    The sample guide is the active guide with the most reviews, the heaviest
+    profile in the dataset.
+    """
+    guide = (
+        TourGuide.objects.filter(is_active=True).select_related('user')
+        .annotate(total=Count('reviews')).order_by('-total', 'pk').first()
+    )
+    if guide is None:
+        return []
+
+    scenarios = []
+    guides_url = reverse('tourguides:guides_list')
+    filters = {
+        'location': _busiest(Location, 'packages__tour_guide'),
+        'specialty': _busiest(Specialty, 'tourguide'),
+        'language': _busiest(Language, 'tourguide'),
+    }
+    # Every combination of the three filters, including none.
+    for mask in range(8):
+        params = [
+            (name, value.pk) for bit, (name, value) in enumerate(filters.items())
+            if mask & (1 << bit) and value is not None
+        ]
+        suffix = '+'.join(name for name, _ in params) or 'unfiltered'
+        query = '&'.join(f'{name}={pk}' for name, pk in params)
+        scenarios.append((f'guides_list[{suffix}]', f'{guides_url}?{query}' if query else guides_url, None))
+
+    scenarios += [
+        ('guides_list[page 2]', f'{guides_url}?page=2', None),
+        ('guide_profile', reverse('tourguides:tourguide_profile', args=[guide.slug]), None),
+        ('similar_guides', reverse('tourguides:similar_guides', args=[guide.slug]), None),
+        ('tourguide_reviews', reverse('tourguides:tourguide_reviews', args=[guide.slug]), None),
+        ('guide_dashboard', reverse('tourguides:tourguide_dashboard'), guide.user),
+    ]
+
+    index = BlogIndexPage.objects.live().first()
+    if index is not None:
+        for sort_by in ('recent', 'oldest', 'popular'):
+            scenarios.append((f'blog_index[{sort_by}]', f'{index.url}?sort_by={sort_by}', None))
+    post = BlogPage.objects.live().order_by('-first_published_at').first()
+    term = post.title.split()[0] if post else 'tour'
+    scenarios.append(('search', f"{reverse('search')}?query={term}", None))
+    return scenarios
+
+
+def measure(client, url, iterations):
+    """Time iterations GETs of url; count queries and peak memory separately."""
+    # Warm-up: template compilation, connection set-up, lazy imports.
+    response = client.get(url)
+
+    # The query log is a bounded deque; once seeding has filled it,
+    # CaptureQueriesContext would see no new entries.
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    # Read it now: the next request clears the log the capture points into.
+    query_count = len(queries)
+
+    tracemalloc.start()
+    try:
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    return {
+        'status': response.status_code,
+        'iterations': iterations,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'queries': query_count,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(iterations=20, only=None):
+    """
+    Benchmark every scenario and return a list of result dicts. only is an
+    optional collection of scenario name prefixes to run.
+    """
+    results = []
+    with override_settings(**BENCHMARK_SETTINGS):
+        for name, url, user in build_scenarios():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            results.append({'name': name, 'url': url, **measure(client, url, iterations)})
+    return results
+
+
+def compare(results, baseline):
+    """Yield (name, field, before, after) for scenarios present in both runs."""
+    before = {result['name']: result for result in baseline}
+    for result in results:
+        previous = before.get(result['name'])
+        if previous is None:
+            continue
+        for field in ('p50_ms', 'p95_ms', 'queries', 'peak_memory_kb'):
+            yield result['name'], field, previous.get(field), result[field]
+
+
+def benchmark_password_hashers(iterations=5, password='correct horse battery staple'):
+    """
+    Time hashing (registration, password changes) and verifying (every
+    login) with each configured hasher whose library is installed. The first
+    result is the hasher new passwords use.
+    """
+    results = []
+    for hasher in get_hashers():
+        try:
+            encoded = hasher.encode(password, hasher.salt())
+        except ValueError:
+            # Optional library (argon2-cffi, bcrypt) not installed.
+            continue
+        encode_times, verify_times = [], []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            hasher.encode(password, hasher.salt())
+            encode_times.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            hasher.verify(password, encoded)
+            verify_times.append((time.perf_counter() - started) * 1000)
+        verify_p50 = statistics.median(verify_times)
+        results.append({
+            'name': hasher.algorithm,
+            'preferred': hasher.algorithm == get_hasher().algorithm,
+            'iterations': iterations,
+            'encode_p50_ms': round(statistics.median(encode_times), 3),
+            'verify_p50_ms': round(verify_p50, 3),
+            'logins_per_core_per_second': round(1000 / verify_p50, 1) if verify_p50 else None,
+        })
+    return results
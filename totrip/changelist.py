@@ -0,0 +1,70 @@
+"""
+Admin changelist helpers for big tables.
+
+Each changelist page runs COUNT(*) for the paginator, plus a second count of
+the whole table for "N of M" unless show_full_result_count is off. On
+PostgreSQL a COUNT(*) reads the entire table, which can take longer than the
+request timeout once a table has millions of rows. For unfiltered lists,
+EstimatedCountPaginator uses the planner's row estimate from pg_class
+instead. It is refreshed by (auto)VACUUM and ANALYZE and is usually within a
+few percent.
+
+Searches in these admins use icontains; see the trigram indexes in
+tourguides/migrations/0004_admin_search_trigram_indexes.py.
+"""
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+# Below this many rows an exact count is cheap enough.
+ESTIMATE_THRESHOLD = 100_000
+
+
+def estimated_count(queryset):
+    """
+    The planner's row estimate for an unfiltered queryset on PostgreSQL, or
+    None when there is no usable estimate.
+    """
+    if not isinstance(queryset, QuerySet):
+        return None
+    query = queryset.query
+    if query.where or query.distinct or query.combinator or query.low_mark or query.high_mark is not None:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)',
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # reltuples is -1 until the table has been vacuumed or analyzed.
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that counts big unfiltered tables from the planner estimate."""
+
+    threshold = ESTIMATE_THRESHOLD
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate >= self.threshold:
+            return estimate
+        return super().count
+
+
+class LargeTableAdminMixin:
+    """
+    ModelAdmin defaults for tables that grow without bound. Combine with
+    list_select_related for every relation shown in list_display.
+    """
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) behind "N results (M total)".
+    show_full_result_count = False
@@ -0,0 +1,85 @@
+"""
+Conditional GET (ETag / Last-Modified) support for public pages.
+
+Views describe their freshness with a single cheap query and get 304 Not
+Modified responses for free, through Django's own condition() decorator.
+"""
+
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.http import condition
+
+
+def has_pending_messages(request):
+    """
+    Return True when the request carries flash messages.
+
+    A 304 would leave them queued until the next full render, so pages with
+    pending messages are always rendered.
+    """
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+def make_etag(request, parts):
+    """
+    Hash the freshness parts into an ETag.
+
+    The viewer is part of the tag because public pages still render the
+    navigation and owner controls for the logged-in user.
+    """
+    user_id = request.user.pk if hasattr(request, 'user') else None
+    raw = repr((user_id, request.get_full_path(), tuple(parts)))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _validators(request, freshness, args, kwargs):
+    """
+    Compute (etag, last_modified) once per request; condition() asks for each
+    validator separately.
+    """
+    cache = request.__dict__.setdefault('_conditional_validators', {})
+    key = (freshness, args, tuple(sorted(kwargs.items())))
+    if key not in cache:
+        result = None
+        if not has_pending_messages(request):
+            result = freshness(request, *args, **kwargs)
+        if result is None:
+            cache[key] = (None, None)
+        else:
+            parts, last_modified = result
+            cache[key] = (make_etag(request, parts), last_modified)
+    return cache[key]
+
+
+def conditional_page(freshness):
+    """
+    Decorator for views whose output is fully described by freshness().
+
+    freshness(request, *args, **kwargs) returns (etag_parts, last_modified),
+    or None to skip conditional handling, e.g. when the object doesn't exist
+    and the view is about to raise a 404.
+
+    freshness() is always synchronous. For async views it runs in a thread
+    before condition() looks at the (by then cached) validators.
+    """
+    def etag_func(request, *args, **kwargs):
+        return _validators(request, freshness, args, kwargs)[0]
+
+    def last_modified_func(request, *args, **kwargs):
+        return _validators(request, freshness, args, kwargs)[1]
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+        if not iscoroutinefunction(view):
+            return conditional_view
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            await sync_to_async(_validators)(request, freshness, args, kwargs)
+            return await conditional_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,26 @@
+"""
+Password hashers with cost parameters taken from settings.
+
+Django's Argon2 defaults (100 MiB, 8 lanes) make each login cost a lot of
+memory per worker. TunedArgon2PasswordHasher reads ARGON2_TIME_COST,
+ARGON2_MEMORY_COST and ARGON2_PARALLELISM instead. Its algorithm name is
+still "argon2", so changing the parameters rehashes each password at its
+owner's next login rather than invalidating it.
+"""
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
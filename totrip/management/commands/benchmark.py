@@ -0,0 +1,104 @@
+import json
+import platform
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from totrip.benchmark import compare, run_benchmarks
+from totrip.synthetic import generate_dataset
+from tourguides.models import TourGuide
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database with synthetic data and benchmarks the public and '
+        'dashboard pages (latency, query count, peak memory), writing a JSON report.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--guides', type=int, default=1000)
+        parser.add_argument('--reviews', type=int, default=10000)
+        parser.add_argument('--schedules', type=int, default=5000)
+        parser.add_argument('--packages', type=int, default=None, help='Defaults to two per guide.')
+        parser.add_argument('--blog-pages', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic data.')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per scenario.')
+        parser.add_argument('--only', nargs='*', help='Run only scenarios whose names start with these.')
+        parser.add_argument('--output', default='benchmark-report.json', help='Where to write the JSON report.')
+        parser.add_argument('--compare', help='A previous report to print differences against.')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Keep the test database between runs and only seed it when it is empty.',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be positive.')
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            report = self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+        for result in report['results']:
+            line = (
+                f"{result['name']:<45} p50 {result['p50_ms']:>8.1f} ms  p95 {result['p95_ms']:>8.1f} ms  "
+                f"{result['queries']:>4} queries  {result['peak_memory_kb']:>8.0f} KiB"
+            )
+            self.stdout.write(self.style.ERROR(line) if result['status'] != 200 else line)
+        if baseline:
+            self.stdout.write(f"\nChanges against {baseline['meta'].get('revision') or options['compare']}:")
+            for name, field, before, after in compare(report['results'], baseline['results']):
+                if before and after != before:
+                    change = (after - before) / before * 100
+                    self.stdout.write(f'  {name:<45} {field:<15} {before:>10} -> {after:<10} ({change:+.0f}%)')
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def benchmark(self, options):
+        dataset = None
+        if not (options['keepdb'] and TourGuide.objects.exists()):
+            started = time.perf_counter()
+            dataset = generate_dataset(
+                guides=options['guides'], reviews=options['reviews'], schedules=options['schedules'],
+                packages=options['packages'], blog_pages=options['blog_pages'], seed=options['seed'],
+            )
+            dataset['seconds'] = round(time.perf_counter() - started, 1)
+            self.stdout.write(f'Seeded {dataset}')
+
+        results = run_benchmarks(iterations=options['iterations'], only=options['only'])
+        return {
+            'meta': {
+                'revision': git_revision(),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'settings': settings.SETTINGS_MODULE,
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'iterations': options['iterations'],
+                'seed': options['seed'],
+                'dataset': dataset,
+            },
+            'results': results,
+        }
@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from totrip.benchmark import benchmark_password_hashers
+
+
+class Command(BaseCommand):
+    help = (
+        'Times hashing and verifying a password with each configured hasher, i.e. the CPU '
+        'cost of a registration and of a login, and estimates logins per second per core.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5, help='Timed hashes per hasher.')
+        parser.add_argument('--output', help='Also write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be positive.')
+        results = benchmark_password_hashers(options['iterations'])
+        for result in results:
+            marker = '*' if result['preferred'] else ' '
+            self.stdout.write(
+                f"{marker} {result['name']:<16} hash {result['encode_p50_ms']:>8.1f} ms  "
+                f"verify {result['verify_p50_ms']:>8.1f} ms  "
+                f"{result['logins_per_core_per_second'] or 0:>7.1f} logins/s per core"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
@@ -0,0 +1,68 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tourguides.bulk_io import (
+    BATCH_SIZE, EXPORT_FORMATS, FORMATS, KINDS, detect_format, import_rows, read_rows, stream_export
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports or exports tour guides, packages, schedules or reviews as CSV or JSON Lines, '
+        'or exports them as XLSX. Imports validate and write in batches and report failing rows '
+        'by line number; exports stream in chunks with constant memory. Use "-" for stdin/stdout.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['import', 'export'])
+        parser.add_argument('kind', choices=sorted(KINDS))
+        parser.add_argument('path', help='File to read or write, or "-".')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, help='Defaults to the file extension, else csv.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per batch or export chunk.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate an import without saving.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        fmt = options['format'] or detect_format(options['path'])
+        if options['action'] == 'export':
+            self.export(options['kind'], fmt, options)
+        elif fmt not in FORMATS:
+            raise CommandError(f'Cannot import {fmt}; use one of {", ".join(FORMATS)}.')
+        else:
+            self.import_(options['kind'], fmt, options)
+
+    def export(self, kind, fmt, options):
+        chunks = stream_export(kind, fmt, chunk_size=options['batch_size'])
+        if options['path'] == '-':
+            if fmt == 'xlsx':
+                raise CommandError('XLSX exports need a file path.')
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        if fmt == 'xlsx':
+            f = open(options['path'], 'wb')
+        else:
+            f = open(options['path'], 'w', encoding='utf-8', newline='')
+        with f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Exported {kind} to {options['path']}"))
+
+    def import_(self, kind, fmt, options):
+        if options['path'] == '-':
+            result = import_rows(kind, read_rows(sys.stdin, fmt), options['batch_size'], options['dry_run'])
+        else:
+            with open(options['path'], encoding='utf-8-sig', newline='') as f:
+                result = import_rows(kind, read_rows(f, fmt), options['batch_size'], options['dry_run'])
+
+        for line, message in result.errors:
+            self.stderr.write(f'line {line}: {message}')
+        if options['dry_run']:
+            summary = f'Would create {result.created} and update {result.updated} {kind}'
+        else:
+            summary = f'Created {result.created} and updated {result.updated} {kind}'
+        if result.errors:
+            raise CommandError(f'{summary}; {len(result.errors)} rows failed.')
+        self.stdout.write(self.style.SUCCESS(summary))
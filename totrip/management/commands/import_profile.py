@@ -0,0 +1,106 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a cold worker does before it can answer its first request.
+STARTUP_SCRIPT = """
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+"""
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$')
+
+
+def parse_importtime(stderr):
+    """
+    Parse `python -X importtime` output into a list of dicts with the module
+    name, its nesting depth and self/cumulative time in microseconds.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                'module': name.strip(),
+                'depth': (len(indent) - 1) // 2,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+            })
+    return modules
+
+
+def package_totals(modules):
+    """Sum self time per top-level package."""
+    totals = {}
+    for module in modules:
+        package = module['module'].split('.')[0]
+        totals[package] = totals.get(package, 0) + module['self_us']
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures cold-start import cost: runs django.setup() and URLconf loading in a fresh '
+        'interpreter under `python -X importtime` and reports the most expensive imports.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Number of modules to list.')
+        parser.add_argument('--runs', type=int, default=3, help='Runs to take the fastest of.')
+        parser.add_argument('--json', action='store_true', help='Print a JSON report instead of a table.')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE
+        ))
+        best = None
+        for _ in range(max(1, options['runs'])):
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            wall = time.perf_counter() - started
+            if result.returncode != 0:
+                raise CommandError(f'Start-up script failed:\n{result.stderr[-2000:]}')
+            if best is None or wall < best[0]:
+                best = (wall, parse_importtime(result.stderr))
+
+        wall, modules = best
+        top_level = [m for m in modules if m['depth'] == 0]
+        report = {
+            'settings': env['DJANGO_SETTINGS_MODULE'],
+            'wall_seconds': round(wall, 4),
+            'import_seconds': round(sum(m['cumulative_us'] for m in top_level) / 1e6, 4),
+            'modules_imported': len(modules),
+            'slowest_imports': sorted(top_level, key=lambda m: m['cumulative_us'], reverse=True)[:options['top']],
+            'packages': [
+                {'package': name, 'self_us': total}
+                for name, total in package_totals(modules)[:options['top']]
+            ],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"Start-up took {report['wall_seconds'] * 1000:.0f} ms, "
+            f"{report['import_seconds'] * 1000:.0f} ms of it importing "
+            f"{report['modules_imported']} modules."
+        )
+        self.stdout.write('\nSlowest top-level imports (cumulative ms):')
+        for module in report['slowest_imports']:
+            self.stdout.write(f"  {module['cumulative_us'] / 1000:>8.1f}  {module['module']}")
+        self.stdout.write('\nImport time by package (self ms):')
+        for package in report['packages']:
+            self.stdout.write(f"  {package['self_us'] / 1000:>8.1f}  {package['package']}")
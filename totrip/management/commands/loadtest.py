@@ -0,0 +1,98 @@
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from totrip.benchmark import percentile
+
+
+class Target:
+    """One URL under test, with a keep-alive connection per worker thread."""
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.netloc:
+            raise CommandError(f'Not an absolute http(s) URL: {url}')
+        self.url = url
+        self.connection_class = (
+            http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        )
+        self.netloc = parts.netloc
+        self.path = parts.path or '/'
+        if parts.query:
+            self.path += f'?{parts.query}'
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = self.connection_class(self.netloc, timeout=self.timeout)
+        return self.local.connection
+
+    def fetch(self):
+        """Return (status, seconds); status is None when the request failed."""
+        started = time.perf_counter()
+        try:
+            connection = self._connection()
+            connection.request('GET', self.path, headers={'User-Agent': 'totrip-loadtest'})
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.local.connection = None
+            status = None
+        return status, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends concurrent GET requests to one or more running servers and reports '
+        'throughput and latency, e.g. to compare the WSGI and ASGI entry points.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Absolute URLs to load, one result row each.')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per URL.')
+        parser.add_argument('--concurrency', type=int, default=20, help='Concurrent connections.')
+        parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per URL.')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive.')
+
+        targets = [Target(url, options['timeout']) for url in options['urls']]
+        self.stdout.write(
+            f"{'url':<50} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+        )
+        for target in targets:
+            self.stdout.write(self.format_row(target, self.run(target, options)))
+
+    def run(self, target, options):
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(lambda _: target.fetch(), range(options['warmup'])))
+
+            started = time.perf_counter()
+            results = list(pool.map(lambda _: target.fetch(), range(options['requests'])))
+            elapsed = time.perf_counter() - started
+
+        latencies = sorted(seconds for status, seconds in results if status == 200)
+        return {
+            'throughput': len(results) / elapsed if elapsed else 0.0,
+            'p50': statistics.median(latencies) if latencies else 0.0,
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'errors': len(results) - len(latencies),
+        }
+
+    def format_row(self, target, result):
+        row = (
+            f"{target.url[:50]:<50} {result['throughput']:>9.1f} "
+            f"{result['p50'] * 1000:>9.1f} {result['p95'] * 1000:>9.1f} "
+            f"{result['p99'] * 1000:>9.1f} {result['errors']:>7}"
+        )
+        return self.style.ERROR(row) if result['errors'] else self.style.SUCCESS(row)
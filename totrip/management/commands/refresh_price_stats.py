@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from tourguides.pricing import refresh_price_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the per-location package price ranges, percentiles and histograms shown by '
+        'the catalogue price slider and the "from" prices. Run it from a scheduler, every hour '
+        'or so; overlapping runs exit straight away.'
+    )
+
+    def handle(self, *args, **options):
+        changed = refresh_price_stats()
+        if changed is None:
+            self.stdout.write(self.style.WARNING('Another refresh is running.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Updated {changed} price stats rows.'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tourguides.analytics import ROLLUP_BATCH_SIZE, rollup
+
+
+class Command(BaseCommand):
+    help = (
+        'Aggregates buffered guide analytics events into daily per-guide counters and deletes '
+        'them. Run it every few minutes from a scheduler; overlapping runs never count an event twice.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ROLLUP_BATCH_SIZE, help='Events per transaction.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        processed = rollup(options['batch_size'])
+        if processed is None:
+            self.stdout.write(self.style.WARNING('Another rollup is running.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rolled up {processed} events.'))
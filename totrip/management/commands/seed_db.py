@@ -6,12 +6,25 @@ from datetime import timedelta
 from wagtail.models import Page, Site
 from blog.models import BlogIndexPage, BlogPage, BlogCategory, BlogAuthor
 from tourguides.models import TourGuide, Language, Specialty, Location
+from totrip.synthetic import BATCH_SIZE, generate_dataset
 
 User = get_user_model()
 
 
 class Command(BaseCommand):
-    help = 'Seeds the database with initial data: admin user, blogs, and tour guides.'
+    help = (
+        'Seeds the database with initial data: admin user, blogs, and tour guides. '
+        'With --guides or --blog-pages it also generates a synthetic dataset at that scale.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--guides', type=int, default=0, help='Synthetic tour guides to generate.')
+        parser.add_argument('--reviews-per-guide', type=int, default=10)
+        parser.add_argument('--schedules-per-guide', type=int, default=5)
+        parser.add_argument('--packages-per-guide', type=int, default=2)
+        parser.add_argument('--blog-pages', type=int, default=0, help='Synthetic blog posts to generate.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per bulk insert and transaction.')
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Starting database seeding...'))
@@ -131,23 +144,23 @@ class Command(BaseCommand):
                         blog_page.categories.set(post_data['categories'])
                         self.stdout.write(self.style.SUCCESS(f'Created Blog Post: {blog_page.title}'))
 
-        arabic_lang, arabic_created = Language.objects.get_or_create(name='Arabic', defaults={'code': 'ar'})
+        arabic_lang, arabic_created = Language.get_or_create_by_name('Arabic', code='ar')
         if arabic_created:
             self.stdout.write(self.style.SUCCESS('Created Language: Arabic'))
         
-        english_lang, english_created = Language.objects.get_or_create(name='English', defaults={'code': 'en'})
+        english_lang, english_created = Language.get_or_create_by_name('English', code='en')
         if english_created:
             self.stdout.write(self.style.SUCCESS('Created Language: English'))
 
-        specialty1, spec1_created = Specialty.objects.get_or_create(name='Historical Tours')
+        specialty1, spec1_created = Specialty.get_or_create_by_name('Historical Tours')
         if spec1_created:
             self.stdout.write(self.style.SUCCESS('Created Specialty: Historical Tours'))
         
-        specialty2, spec2_created = Specialty.objects.get_or_create(name='Adventure Tours')
+        specialty2, spec2_created = Specialty.get_or_create_by_name('Adventure Tours')
         if spec2_created:
             self.stdout.write(self.style.SUCCESS('Created Specialty: Adventure Tours'))
         
-        specialty3, spec3_created = Specialty.objects.get_or_create(name='Cultural Tours')
+        specialty3, spec3_created = Specialty.get_or_create_by_name('Cultural Tours')
         if spec3_created:
             self.stdout.write(self.style.SUCCESS('Created Specialty: Cultural Tours'))
 
@@ -242,5 +255,29 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(self.style.WARNING(f'Tour Guide "{user.get_full_name() or user.username}" already exists.'))
 
+        if options['guides'] or options['blog_pages']:
+            self.generate(options)
+
         self.stdout.write(self.style.SUCCESS('Database seeding complete!'))
 
+    def generate(self, options):
+        guides = options['guides']
+        started = timezone.now()
+
+        def progress(kind, done, total):
+            self.stdout.write(f'  {kind}: {done}/{total}')
+
+        counts = generate_dataset(
+            guides=guides,
+            reviews=guides * options['reviews_per_guide'],
+            schedules=guides * options['schedules_per_guide'],
+            packages=guides * options['packages_per_guide'],
+            blog_pages=options['blog_pages'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+        seconds = (timezone.now() - started).total_seconds()
+        summary = ', '.join(f'{total} {kind}' for kind, total in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Generated {summary} in {seconds:.1f}s.'))
+
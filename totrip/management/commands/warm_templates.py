@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+
+from totrip.warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = 'Compiles every project template and fails on syntax errors.'
+
+    def handle(self, *args, **options):
+        try:
+            count = warm_templates()
+        except (TemplateSyntaxError, TemplateDoesNotExist) as e:
+            raise CommandError(f'Template compilation failed: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Compiled {count} templates.'))
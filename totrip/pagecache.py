@@ -0,0 +1,233 @@
+"""
+Full-page cache for anonymous visitors.
+
+Public pages are rendered once and stored in the PAGE_CACHE_ALIAS cache.
+Logged-in users, previews and requests carrying flash messages always go to
+the view.
+
+Every cached page belongs to one or more namespaces ("guides",
+"guide:<slug>", "blog", ...). purge() bumps a namespace's generation, which
+marks its pages stale rather than deleting them: the first request after a
+purge (or after the fresh period) re-renders the page while concurrent
+requests keep getting the stale copy, so a purge never stampedes the
+database.
+"""
+
+import hashlib
+import time
+import uuid
+from functools import wraps
+from inspect import iscoroutinefunction
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from totrip.conditional import has_pending_messages
+
+# Headers replayed from a cached page; everything else is per-request.
+STORED_HEADERS = ('Content-Type', 'Content-Language', 'ETag', 'Last-Modified')
+
+
+def _cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def _generation_key(namespace):
+    return f'pagecache:generation:{namespace}'
+
+
+def normalize_query(request, query_params=None):
+    """
+    Return a canonical query string for the cache key.
+
+    Parameters are sorted and blank values dropped. When query_params is
+    given, anything else (utm_*, fbclid, ...) is ignored, so it must list
+    every parameter the view reads.
+    """
+    items = []
+    for key in sorted(request.GET):
+        if query_params is not None and key not in query_params:
+            continue
+        for value in sorted(request.GET.getlist(key)):
+            value = value.strip()
+            if value:
+                items.append((key, value))
+    return urlencode(items)
+
+
+def _page_key(request, namespaces, query_params):
+    raw = f'{request.path}?{normalize_query(request, query_params)}'
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'pagecache:page:{namespaces[0]}:{digest}'
+
+
+def purge(*namespaces):
+    """Mark every cached page in the given namespaces as stale."""
+    if namespaces:
+        generation = uuid.uuid4().hex
+        _cache().set_many({_generation_key(ns): generation for ns in namespaces}, None)
+
+
+def can_use_page_cache(request):
+    if not settings.PAGE_CACHE_ENABLED or request.method not in ('GET', 'HEAD'):
+        return False
+    if getattr(request, 'is_preview', False):
+        return False
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return False
+    return not has_pending_messages(request)
+
+
+def _can_store(response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    cache_control = response.get('Cache-Control', '')
+    return 'private' not in cache_control and 'no-store' not in cache_control
+
+
+def _response_from_entry(request, entry, state):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    response['X-Page-Cache'] = state
+
+    etag = response.get('ETag')
+    last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+    if etag or last_modified:
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified, response=response
+        )
+        if not_modified is not response:
+            not_modified['X-Page-Cache'] = state
+            return not_modified
+    return response
+
+
+def _wait_for_entry(cache, key):
+    """Poll briefly for a page another worker is rendering."""
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+class _PageSlot:
+    """A page this request holds the render lock for."""
+
+    def __init__(self, cache, key, generations, timeout):
+        self.cache = cache
+        self.key = key
+        self.generations = generations
+        self.timeout = timeout if timeout is not None else settings.PAGE_CACHE_TIMEOUT
+
+    def store(self, response):
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        if _can_store(response):
+            self.cache.set(self.key, {
+                'content': response.content,
+                'status': response.status_code,
+                'headers': [(h, response[h]) for h in STORED_HEADERS if response.has_header(h)],
+                'generations': self.generations,
+                'fresh_until': time.time() + self.timeout,
+            }, self.timeout + settings.PAGE_CACHE_STALE_TIMEOUT)
+            response['X-Page-Cache'] = 'miss'
+        return response
+
+    def release(self):
+        self.cache.delete(f'{self.key}:lock')
+
+
+def _lookup(request, names, query_params, timeout):
+    """
+    Return (response, None) when the cache can answer the request, (None,
+    slot) when this request should render and store the page, or (None, None)
+    when it should render without storing.
+    """
+    cache = _cache()
+    key = _page_key(request, names, query_params)
+    lock_key = f'{key}:lock'
+    generation_keys = [_generation_key(ns) for ns in names]
+
+    found = cache.get_many([key] + generation_keys)
+    generations = [found.get(k) for k in generation_keys]
+    entry = found.get(key)
+
+    if entry is not None:
+        if entry['generations'] == generations and entry['fresh_until'] > time.time():
+            return _response_from_entry(request, entry, 'hit'), None
+        if not cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            # Another request is already revalidating this page.
+            return _response_from_entry(request, entry, 'stale'), None
+    elif not cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+        entry = _wait_for_entry(cache, key)
+        if entry is not None:
+            return _response_from_entry(request, entry, 'hit'), None
+        return None, None
+    return None, _PageSlot(cache, key, generations, timeout)
+
+
+def anonymous_page_cache(namespaces, query_params=None, timeout=None):
+    """
+    Cache a view's full response for anonymous visitors.
+
+    namespaces is a tuple of purge namespaces, or a callable taking the view
+    arguments and returning one. query_params lists the GET parameters that
+    affect the page; None keys on all of them. timeout is how long a page
+    stays fresh, defaulting to PAGE_CACHE_TIMEOUT.
+
+    Async views are supported; the cache and session lookups then run in a
+    thread so they never block the event loop.
+    """
+    def resolve(request, args, kwargs):
+        return namespaces(request, *args, **kwargs) if callable(namespaces) else namespaces
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not await sync_to_async(can_use_page_cache)(request):
+                    return await view(request, *args, **kwargs)
+
+                names = resolve(request, args, kwargs)
+                # Waiting on another worker's render sleeps, so keep it off
+                # the thread that runs the ORM.
+                response, slot = await sync_to_async(_lookup, thread_sensitive=False)(
+                    request, names, query_params, timeout
+                )
+                if response is not None:
+                    return response
+                if slot is None:
+                    return await view(request, *args, **kwargs)
+                try:
+                    # Templates may still run queries while rendering.
+                    return await sync_to_async(slot.store)(await view(request, *args, **kwargs))
+                finally:
+                    await sync_to_async(slot.release, thread_sensitive=False)()
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not can_use_page_cache(request):
+                return view(request, *args, **kwargs)
+
+            response, slot = _lookup(request, resolve(request, args, kwargs), query_params, timeout)
+            if response is not None:
+                return response
+            if slot is None:
+                return view(request, *args, **kwargs)
+            try:
+                return slot.store(view(request, *args, **kwargs))
+            finally:
+                slot.release()
+        return wrapper
+    return decorator
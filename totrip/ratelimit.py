@@ -0,0 +1,188 @@
+"""
+Request limits for expensive or abusable views, kept in the default cache so
+every worker shares them.
+
+limit_concurrency() caps how many POSTs to a view one client address may
+have in flight at once. Password hashing is deliberately slow, so this stops
+a login burst from one address tying up every worker; the rest get a quick
+429 instead of queueing behind the hashes.
+
+rate_limit() applies the token buckets configured in RATE_LIMITS, per client
+address and/or per user. Buckets refill continuously and hold at most one
+period's worth of tokens. A request only spends tokens once every bucket
+has one, so a refusal by the address bucket (a busy NAT) costs the user
+nothing. The read-modify-write is not atomic, so requests
+racing on the same bucket can overshoot it by a token or two; that is fine
+for throttling abuse.
+
+Every refused request sends the throttled signal, for instrumentation.
+"""
+
+import logging
+import math
+import time
+from functools import cache as cache_once, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import Signal
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# Sent with request, scope, key and retry_after for every refused request.
+throttled = Signal()
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+TOO_MANY_REQUESTS = 'طلبات كثيرة جداً. يرجى المحاولة مرة أخرى بعد قليل.'
+
+# Counters expire even if a worker dies between incr and decr.
+CONCURRENCY_KEY_TIMEOUT = 60
+
+
+@cache_once
+def _warn_untrusted_proxy():
+    logger.warning(
+        'Requests carry X-Forwarded-For but TRUSTED_PROXY_COUNT is 0: every visitor behind the proxy '
+        'shares one rate limit. Set TRUSTED_PROXY_COUNT to the number of proxies in front of the app.'
+    )
+
+
+def client_ip(request):
+    """
+    The client's address. Behind TRUSTED_PROXY_COUNT reverse proxies, each
+    appends the address it saw to X-Forwarded-For, so the entry that many
+    places from the end is the one the outermost proxy received.
+    """
+    count = settings.TRUSTED_PROXY_COUNT
+    if count:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= count:
+            return forwarded[-count]
+    elif 'HTTP_X_FORWARDED_FOR' in request.META:
+        _warn_untrusted_proxy()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def too_many_requests(request, retry_after):
+    headers = {'Retry-After': str(retry_after)}
+    if request.content_type == 'application/json':
+        return JsonResponse({'success': False, 'error': TOO_MANY_REQUESTS}, status=429, headers=headers)
+    return HttpResponse(TOO_MANY_REQUESTS, status=429, headers=headers, content_type='text/plain; charset=utf-8')
+
+
+def _refuse(request, scope, key, retry_after):
+    logger.warning('Throttled %s request from %s (%s)', scope, client_ip(request), key)
+    throttled.send(sender=None, request=request, scope=scope, key=key, retry_after=retry_after)
+
+
+def limit_concurrency(scope, limit=None):
+    """
+    Allow at most limit concurrent POSTs per client address to the
+    decorated view, sharing the count across every view with the same
+    scope. limit defaults to AUTH_CONCURRENCY_PER_IP. Off unless
+    AUTH_CONCURRENCY_ENABLED, since the count needs a cache every worker
+    shares.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'POST' or not settings.AUTH_CONCURRENCY_ENABLED:
+                return view(request, *args, **kwargs)
+            key = f'ratelimit:concurrency:{scope}:{client_ip(request)}'
+            cache.add(key, 0, CONCURRENCY_KEY_TIMEOUT)
+            try:
+                in_flight = cache.incr(key)
+            except ValueError:
+                # Expired between add() and incr().
+                return view(request, *args, **kwargs)
+            try:
+                if in_flight > (limit if limit is not None else settings.AUTH_CONCURRENCY_PER_IP):
+                    _refuse(request, scope, 'concurrency', 1)
+                    return too_many_requests(request, 1)
+                return view(request, *args, **kwargs)
+            finally:
+                try:
+                    cache.decr(key)
+                except ValueError:
+                    pass
+        return wrapper
+    return decorator
+
+
+def parse_rate(rate):
+    """'5/m' -> (5, 60): that many requests per second, minute, hour or day."""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period]
+
+
+def check_token(bucket, rate):
+    """
+    Look at the bucket without taking from it. Returns (retry_after, take):
+    retry_after is 0 when a token is available and take() then spends it,
+    otherwise it is the whole seconds until the next token is due.
+    """
+    capacity, period = parse_rate(rate)
+    per_second = capacity / period
+    now = time.time()
+    tokens, updated = cache.get(bucket) or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * per_second)
+    if tokens < 1:
+        return math.ceil((1 - tokens) / per_second), None
+    # Past the full refill time a missing bucket reads as full anyway.
+    return 0, lambda: cache.set(bucket, (tokens - 1, now), math.ceil(period))
+
+
+def take_token(bucket, rate):
+    """
+    Take a token from the bucket. Returns 0 on success, otherwise the whole
+    seconds until the next token is due.
+    """
+    retry_after, take = check_token(bucket, rate)
+    if take is not None:
+        take()
+    return retry_after
+
+
+def _identity(request, key):
+    if key == 'user':
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+        return None
+    return f'ip:{client_ip(request)}'
+
+
+def rate_limit(scope, methods=('POST',), refused=None):
+    """
+    Apply RATE_LIMITS[scope], e.g. {'ip': '5/h', 'user': '20/h'}, to the
+    decorated view's requests with the given methods. A request must get a
+    token from every bucket; per-user buckets skip anonymous requests.
+    Place it below login_required so the user is known.
+
+    Refused requests get a 429, or whatever refused(request, retry_after,
+    *args, **kwargs) returns, for views that answer with a redirect and a
+    message instead.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                takes = []
+                for key, rate in settings.RATE_LIMITS[scope].items():
+                    identity = _identity(request, key)
+                    if identity is None:
+                        continue
+                    retry_after, take = check_token(f'ratelimit:bucket:{scope}:{identity}', rate)
+                    if retry_after:
+                        _refuse(request, scope, key, retry_after)
+                        if refused is not None:
+                            return refused(request, retry_after, *args, **kwargs)
+                        return too_many_requests(request, retry_after)
+                    takes.append(take)
+                for take in takes:
+                    take()
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
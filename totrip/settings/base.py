@@ -30,7 +30,6 @@ INSTALLED_APPS = [
     "blog",
     "tourguides",
     "users",
-    "wagtail.contrib.forms",
     "wagtail.contrib.redirects",
     "wagtail.embeds",
     "wagtail.sites",
@@ -49,18 +48,20 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    # Index operator classes for the admin search trigram indexes.
+    "django.contrib.postgres",
     "crispy_forms",
     "crispy_tailwind",
 ]
 
 MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "django.middleware.security.SecurityMiddleware",
     "wagtail.contrib.redirects.middleware.RedirectMiddleware",
 ]
 
@@ -86,6 +87,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "totrip.wsgi.application"
 
+# Compile every project template when the WSGI application starts, so the
+# first request in each worker does not pay the parse cost. See totrip/warmup.py.
+TEMPLATE_WARMUP = False
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -116,6 +121,43 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing. New and re-saved passwords use the first hasher; hashes
+# made by the others still verify and are upgraded at the owner's next login.
+# Production switches to Argon2 with PASSWORD_HASHER=argon2 (needs
+# argon2-cffi). Its costs default to OWASP's minimum (19 MiB, 2 passes,
+# 1 lane), far cheaper per login than Django's Argon2 defaults.
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "totrip.hashers.TunedArgon2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST = 19 * 1024
+ARGON2_PARALLELISM = 1
+
+# Concurrent login and registration POSTs allowed per client address (see
+# totrip/ratelimit.py), and how many reverse proxies in front of the app
+# append to X-Forwarded-For; 0 trusts only REMOTE_ADDR. The in-flight count
+# lives in the default cache, so the limit only works when that cache is
+# shared by every worker (or, as with runserver, there is one process).
+AUTH_CONCURRENCY_ENABLED = True
+AUTH_CONCURRENCY_PER_IP = 2
+TRUSTED_PROXY_COUNT = 0
+
+# Token-bucket limits per scope, per client address ("ip") and/or per
+# logged-in user ("user"), as "<requests>/<s|m|h|d>". See totrip/ratelimit.py.
+# "ip" buckets only separate visitors when TRUSTED_PROXY_COUNT matches the
+# proxies in front of the app; otherwise everyone shares the proxy's bucket
+# (a warning is logged when requests arrive with X-Forwarded-For).
+RATE_LIMITS = {
+    # Anonymous review submissions.
+    "review": {"ip": "5/h"},
+    # The specialty, language and certification creation endpoints.
+    "lookup": {"user": "20/h", "ip": "60/h"},
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -147,6 +189,17 @@ STATIC_URL = "/static/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
 
+# Media files are served by totrip.views.serve_media. "python" streams them
+# from the worker (fine locally); "x-accel-redirect" (nginx) and "x-sendfile"
+# (Apache, lighttpd) only authorize the request and let the web server send
+# the bytes. With nginx, MEDIA_ACCEL_REDIRECT_PREFIX must be an `internal`
+# location aliased to MEDIA_ROOT.
+MEDIA_SERVE_BACKEND = "python"
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+# Paths under MEDIA_ROOT anyone may fetch; everything else is staff-only.
+MEDIA_PUBLIC_PREFIXES = ["original_images/", "images/"]
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24 * 7
+
 # Default storage settings, with the staticfiles storage updated.
 # See https://docs.djangoproject.com/en/5.2/ref/settings/#std-setting-STORAGES
 STORAGES = {
@@ -162,6 +215,39 @@ STORAGES = {
     },
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Flash messages travel in a signed cookie, never the session, so views that
+# only show a message do not create or write a session row. The messages here
+# are one-liners, well under the cookie's 2 KB budget.
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
+# Full-page cache for anonymous visitors, see totrip/pagecache.py. Pages stay
+# fresh for PAGE_CACHE_TIMEOUT seconds and are then served stale for up to
+# PAGE_CACHE_STALE_TIMEOUT more while a single request re-renders them.
+PAGE_CACHE_ENABLED = False
+PAGE_CACHE_ALIAS = "default"
+PAGE_CACHE_TIMEOUT = 60 * 5
+PAGE_CACHE_STALE_TIMEOUT = 60 * 60
+PAGE_CACHE_LOCK_TIMEOUT = 30
+PAGE_CACHE_LOCK_WAIT = 2
+
+# Per-guide dashboard statistics, see tourguides/dashboard.py. Entries are
+# dropped whenever the guide's content changes; the timeout is a backstop.
+DASHBOARD_STATS_TIMEOUT = 60 * 60
+
+# Guide analytics events are buffered in each process and written in one
+# INSERT once ANALYTICS_BUFFER_SIZE events are waiting or the oldest is
+# ANALYTICS_FLUSH_INTERVAL seconds old. See tourguides/analytics.py.
+ANALYTICS_BUFFER_SIZE = 500
+ANALYTICS_FLUSH_INTERVAL = 10
+
 # Django sets a maximum of 1000 fields per form by default, but particularly complex page models
 # can exceed this limit within Wagtail's page editor.
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10_000
@@ -8,9 +8,28 @@ load_dotenv(dotenv_path=env_path)
 
 DEBUG = False
 
+# Directly after SecurityMiddleware, so static requests skip sessions and auth.
 MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Hashed file names plus gzip and Brotli variants written at collectstatic
+# time. WhiteNoise serves the hashed names with a far-future, immutable
+# Cache-Control header and picks the best encoding from Accept-Encoding.
+STORAGES['staticfiles'] = {
+    'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+}
+
+# Keep compiled templates in memory for the lifetime of each worker. Loaders
+# and APP_DIRS are mutually exclusive, so APP_DIRS is switched off here.
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# Compile project templates when the WSGI application is loaded.
+TEMPLATE_WARMUP = True
 
 SECRET_KEY = os.environ.get('SECRET_KEY')
 if not SECRET_KEY:
@@ -31,10 +50,72 @@ if not ALLOWED_HOSTS:
 
 if 'DATABASE_URL' in os.environ:
     import dj_database_url
+    # Persistent connections: each gunicorn worker keeps its connection across
+    # requests instead of reconnecting every time.
     DATABASES = {
-        'default': dj_database_url.parse(os.environ['DATABASE_URL'])
+        'default': dj_database_url.parse(
+            os.environ['DATABASE_URL'],
+            conn_max_age=int(os.environ.get('CONN_MAX_AGE', 60)),
+            conn_health_checks=True,
+        )
     }
 
+# A shared cache lets page cache purges reach every worker; without it each
+# process keeps its own local-memory cache.
+if 'REDIS_URL' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
+# Session storage, chosen with SESSION_BACKEND:
+#   cached_db       read through the cache, written through to the database
+#                   (the default when REDIS_URL is set)
+#   db              the database only (the default otherwise; a per-process
+#                   cache would serve stale sessions across workers)
+#   signed_cookies  no server-side storage at all; sessions cannot be revoked
+#                   before they expire, and are limited to about 4 KB
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'db': 'django.contrib.sessions.backends.db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cached_db' if 'REDIS_URL' in os.environ else 'db')
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ValueError(f"SESSION_BACKEND must be one of {', '.join(SESSION_ENGINES)}")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+
+# "pbkdf2" (Django's default) or "argon2"; see PASSWORD_HASHERS in base.py.
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+if PASSWORD_HASHER == 'argon2':
+    PASSWORD_HASHERS.remove('totrip.hashers.TunedArgon2PasswordHasher')
+    PASSWORD_HASHERS.insert(0, 'totrip.hashers.TunedArgon2PasswordHasher')
+elif PASSWORD_HASHER != 'pbkdf2':
+    raise ValueError("PASSWORD_HASHER must be pbkdf2 or argon2")
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', ARGON2_TIME_COST))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', ARGON2_MEMORY_COST))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', ARGON2_PARALLELISM))
+
+# The number of reverse proxies in front of the app, so login and review
+# limits apply per visitor rather than to the proxy's address. Render puts
+# one proxy in front of every service.
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 1 if render_url else 0))
+
+# A sync worker handles one request at a time, so a per-process in-flight
+# count never passes 1: the login concurrency limit needs the shared cache.
+AUTH_CONCURRENCY_ENABLED = 'REDIS_URL' in os.environ
+
+# Purges must reach every web worker, and the refresh commands run in
+# processes of their own, so the page cache needs the shared Redis cache; a
+# per-process one would keep serving pages other processes purged.
+PAGE_CACHE_ENABLED = 'REDIS_URL' in os.environ
+
+# Set to "x-accel-redirect" or "x-sendfile" when a front-end web server sits in
+# front of gunicorn, so media bytes never pass through the Python workers.
+MEDIA_SERVE_BACKEND = os.environ.get('MEDIA_SERVE_BACKEND', 'python')
+
 WAGTAILADMIN_BASE_URL = os.environ.get('WAGTAILADMIN_BASE_URL', 'https://your-app.onrender.com')
 
 base_url = os.environ.get('RENDER_EXTERNAL_URL')
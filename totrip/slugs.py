@@ -0,0 +1,64 @@
+"""
+Slugs for public URLs.
+
+django.utils.text.slugify() keeps only ASCII, so an Arabic title came out
+empty and every such package collided on the same slug. Arabic letters are
+transliterated to Latin ones first, which keeps slugs ASCII: they still
+match the <slug:> path converter and read the same in cache keys and
+shared links.
+
+unique_slug() finds a free slug with one query for every slug sharing the
+base as a prefix, which the slug column's index answers, instead of trying
+base-2, base-3 and so on one query at a time.
+"""
+
+import re
+from itertools import count
+
+from django.utils.text import slugify
+
+_ARABIC = {
+    'ا': 'a', 'أ': 'a', 'إ': 'i', 'آ': 'a', 'ٱ': 'a', 'ء': '', 'ؤ': 'u', 'ئ': 'i',
+    'ب': 'b', 'ت': 't', 'ث': 'th', 'ج': 'j', 'ح': 'h', 'خ': 'kh', 'د': 'd', 'ذ': 'dh',
+    'ر': 'r', 'ز': 'z', 'س': 's', 'ش': 'sh', 'ص': 's', 'ض': 'd', 'ط': 't', 'ظ': 'z',
+    'ع': 'a', 'غ': 'gh', 'ف': 'f', 'ق': 'q', 'ك': 'k', 'ل': 'l', 'م': 'm', 'ن': 'n',
+    'ه': 'h', 'ة': 'a', 'و': 'w', 'ي': 'y', 'ى': 'a',
+    'پ': 'p', 'چ': 'ch', 'ژ': 'zh', 'ڤ': 'v', 'گ': 'g', 'ک': 'k', 'ی': 'y',
+    # Tatweel and the short-vowel marks carry no letters.
+    'ـ': '', **{chr(mark): '' for mark in range(0x064B, 0x0653)},
+    # Arabic-Indic and Persian digits.
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},
+    '،': ',', '؛': ';', '؟': '?',
+}
+_TRANSLITERATION = str.maketrans(_ARABIC)
+
+
+def slugify_text(value):
+    """slugify() that transliterates Arabic instead of dropping it."""
+    return slugify(str(value).translate(_TRANSLITERATION))
+
+
+def unique_slug(queryset, value, max_length, fallback, reserved=None):
+    """
+    A slug for value that no row of queryset uses: the slugified value, or
+    the value with the lowest free "-2", "-3"... suffix. Falls back to
+    fallback when value has no letters or digits. reserved, a queryset with
+    a slug column, holds slugs that are off limits as well, in the same query.
+    """
+    base = slugify_text(value)[:max_length].strip('-') or fallback
+    taken = queryset.filter(slug__startswith=base).order_by().values_list('slug', flat=True)
+    if reserved is not None:
+        taken = taken.union(reserved.filter(slug__startswith=base).order_by().values_list('slug', flat=True))
+    taken = set(taken)
+    if base not in taken:
+        return base
+
+    suffixed = re.compile(rf'{re.escape(base)}-(\d+)')
+    used = {int(match[1]) for match in map(suffixed.fullmatch, taken) if match}
+    number = next(number for number in count(2) if number not in used)
+    suffix = f'-{number}'
+    if len(base) + len(suffix) > max_length:
+        # No room for the suffix: shorten the base, which needs a fresh look.
+        return unique_slug(queryset, base[:max_length - len(suffix)], max_length, fallback, reserved)
+    return f'{base}{suffix}'
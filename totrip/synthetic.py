@@ -0,0 +1,277 @@
+"""
+Synthetic data at configurable scale, for seed_db, benchmarks and load tests.
+
+Rows are generated from a seeded random.Random and written with
+bulk_create, one transaction per batch of guides, so the same arguments on
+the same starting database always produce the same dataset and a million
+rows load in minutes. bulk_create skips save() and signals: slugs are
+assigned here, and page cache purges and freshness bumps don't fire. Blog
+posts are the exception: they go through add_child(), as Wagtail pages should.
+"""
+
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from wagtail.models import Site
+
+from blog.models import BlogCategory, BlogIndexPage, BlogPage
+from tourguides.durations import parse_duration_minutes
+from tourguides.models import (
+    Language, Location, Review, Specialty, TourGuide, TourPackage, WorkSchedule, refresh_guide_ratings
+)
+from tourguides.pricing import refresh_price_stats
+
+BATCH_SIZE = 1000
+USERNAME_PREFIX = 'synthetic-'
+POST_SLUG_PREFIX = 'synthetic-post-'
+
+FIRST_NAMES = [
+    ('Ahmed', 'أحمد'), ('Fatima', 'فاطمة'), ('Khalid', 'خالد'), ('Noura', 'نورة'), ('Omar', 'عمر'),
+    ('Sara', 'سارة'), ('Faisal', 'فيصل'), ('Layla', 'ليلى'), ('Yousef', 'يوسف'), ('Reem', 'ريم'),
+]
+LAST_NAMES = [
+    ('Al-Saud', 'آل سعود'), ('Al-Rashid', 'الراشد'), ('Al-Mansouri', 'المنصوري'), ('Al-Harbi', 'الحربي'),
+    ('Al-Qahtani', 'القحطاني'), ('Al-Otaibi', 'العتيبي'), ('Al-Zahrani', 'الزهراني'),
+]
+LANGUAGES = [('Arabic', 'ar'), ('English', 'en'), ('French', 'fr'), ('Urdu', 'ur'), ('Spanish', 'es')]
+SPECIALTIES = ['Historical Tours', 'Adventure Tours', 'Cultural Tours', 'Desert Safari', 'Food Tours', 'Diving']
+LOCATIONS = ['Riyadh', 'Jeddah', 'Mecca', 'Medina', 'AlUla', 'Abha', 'Dammam', 'Taif', 'Tabuk', 'Diriyah']
+DURATIONS = ['2 hours', '4 hours', 'half day', '1 day', '2 days', '3 days']
+WORDS = (
+    'desert heritage old town souk oasis mountain coast coral palace fort museum '
+    'market caravan dunes canyon valley village mosque garden sunset'
+).split()
+ARABIC_WORDS = (
+    'الصحراء التراث البلدة القديمة السوق الواحة الجبل الساحل المرجان القصر القلعة '
+    'المتحف القافلة الكثبان الوادي القرية الحديقة الغروب رحلة جولة مرشد تاريخ ثقافة'
+).split()
+BLOG_CATEGORIES = [('travel-tips', 'Travel Tips'), ('destinations', 'Destinations'), ('guides', 'Guides')]
+
+
+def _sentence(rng, words=8, vocabulary=WORDS):
+    text = ' '.join(rng.choice(vocabulary) for _ in range(words))
+    if vocabulary is ARABIC_WORDS:
+        return text + '.'
+    return text.capitalize() + '.'
+
+
+def _text(rng, words):
+    """Mostly Arabic copy with some English, like the real site."""
+    return _sentence(rng, words, ARABIC_WORDS if rng.random() < 0.7 else WORDS)
+
+
+def _name(rng, names):
+    english, arabic = rng.choice(names)
+    return arabic if rng.random() < 0.5 else english
+
+
+def _share(total, done, size, whole):
+    """This batch's part of total when whole items are split into batches."""
+    return total * (done + size) // whole - total * done // whole
+
+
+def _sample(rng, population, low, high):
+    return rng.sample(population, rng.randint(low, min(high, len(population))))
+
+
+def _lookups():
+    """Small lookup tables, created once and shared by every guide."""
+    languages = [Language.get_or_create_by_name(name, code=code)[0] for name, code in LANGUAGES]
+    specialties = [Specialty.get_or_create_by_name(name)[0] for name in SPECIALTIES]
+    locations = [
+        Location.objects.get_or_create(name=name, city=name, defaults={'is_popular': index < 3})[0]
+        for index, name in enumerate(LOCATIONS)
+    ]
+    return languages, specialties, locations
+
+
+def create_guides(rng, count, start, languages, specialties, password):
+    users = User.objects.bulk_create([
+        User(
+            username=f'{USERNAME_PREFIX}{start + n:07d}',
+            first_name=_name(rng, FIRST_NAMES),
+            last_name=_name(rng, LAST_NAMES),
+            email=f'guide{start + n}@example.com',
+            password=password,
+        )
+        for n in range(count)
+    ])
+    guides = TourGuide.objects.bulk_create([
+        TourGuide(
+            user=user,
+            slug=user.username,
+            bio=_text(rng, 25),
+            years_of_experience=rng.randint(0, 25),
+            is_verified=rng.random() < 0.6,
+            is_featured=rng.random() < 0.05,
+            is_recommended=rng.random() < 0.1,
+            is_active=rng.random() < 0.95,
+        )
+        for user in users
+    ])
+
+    # Through-table rows directly: one INSERT per relation instead of one
+    # .set() per guide.
+    TourGuide.languages.through.objects.bulk_create([
+        TourGuide.languages.through(tourguide_id=guide.pk, language_id=language.pk)
+        for guide in guides
+        for language in _sample(rng, languages, 1, 3)
+    ])
+    TourGuide.specialties.through.objects.bulk_create([
+        TourGuide.specialties.through(tourguide_id=guide.pk, specialty_id=specialty.pk)
+        for guide in guides
+        for specialty in _sample(rng, specialties, 1, 3)
+    ])
+    return guides
+
+
+def create_packages(rng, count, guides, locations):
+    packages = [
+        TourPackage(
+            tour_guide=guide,
+            title=f'{rng.choice(WORDS).capitalize()} tour {n}',
+            slug=f'{guide.slug}-tour-{n}',
+            description=_text(rng, 20),
+            duration=rng.choice(DURATIONS),
+            price=Decimal(rng.randint(50, 2000)),
+            max_people=rng.randint(1, 20),
+            is_active=rng.random() < 0.9,
+        )
+        for n, guide in ((n, rng.choice(guides)) for n in range(count))
+    ]
+    for package in packages:
+        # bulk_create() skips TourPackage.save().
+        package.duration_minutes = parse_duration_minutes(package.duration)
+    packages = TourPackage.objects.bulk_create(packages)
+    TourPackage.locations.through.objects.bulk_create([
+        TourPackage.locations.through(tourpackage_id=package.pk, location_id=location.pk)
+        for package in packages
+        for location in _sample(rng, locations, 1, 2)
+    ])
+    return packages
+
+
+def create_schedules(rng, count, guides, locations):
+    today = timezone.localdate()
+    schedules = []
+    for _ in range(count):
+        start_date = today + timedelta(days=rng.randint(-60, 180))
+        schedules.append(WorkSchedule(
+            tour_guide=rng.choice(guides),
+            location=rng.choice(locations),
+            start_date=start_date,
+            end_date=start_date + timedelta(days=rng.randint(0, 14)),
+            is_available=rng.random() < 0.8,
+        ))
+    return WorkSchedule.objects.bulk_create(schedules)
+
+
+def create_reviews(rng, count, guides):
+    return Review.objects.bulk_create([
+        Review(
+            tour_guide=rng.choice(guides),
+            author_name=f'{_name(rng, FIRST_NAMES)} {_name(rng, LAST_NAMES)}',
+            rating=rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 8, 12])[0],
+            comment=_text(rng, 15),
+            is_approved=rng.random() < 0.85,
+        )
+        for _ in range(count)
+    ])
+
+
+def _blog_index():
+    index = BlogIndexPage.objects.first()
+    if index is None:
+        root = Site.objects.get(is_default_site=True).root_page
+        index = root.add_child(instance=BlogIndexPage(title='Blog', slug='blog'))
+    return index
+
+
+def _next_post_number(index):
+    """One past the highest synthetic-post-N under the index, so deleted posts' numbers aren't reused."""
+    slugs = index.get_children().filter(slug__regex=rf'^{POST_SLUG_PREFIX}[0-9]+$').values_list('slug', flat=True)
+    return max((int(slug[len(POST_SLUG_PREFIX):]) for slug in slugs), default=-1) + 1
+
+
+def create_blog_pages(rng, count, index, categories, author=None):
+    """
+    Add live posts under the blog index. add_child() saves them, so they are
+    indexed for search like posts written in the admin.
+    """
+    start = _next_post_number(index)
+    now = timezone.now()
+
+    pages = []
+    for n in range(count):
+        number = start + n
+        published = now - timedelta(hours=number)
+        title = f'{rng.choice(WORDS).capitalize()} {rng.choice(ARABIC_WORDS)} {number}'
+        post = BlogPage(
+            title=title,
+            slug=f'{POST_SLUG_PREFIX}{number}',
+            first_published_at=published,
+            last_published_at=published,
+            intro=_text(rng, 12),
+            body=f'<p>{_text(rng, 60)}</p>',
+            date=published.date(),
+            author=author,
+            read_time=rng.randint(2, 15),
+            view_count=rng.randint(0, 5000),
+        )
+        post.categories = _sample(rng, categories, 1, 2)
+        pages.append(index.add_child(instance=post))
+    return pages
+
+
+def generate_dataset(guides=100, reviews=1000, schedules=500, packages=None, blog_pages=20, seed=0,
+                     batch_size=BATCH_SIZE, progress=None):
+    """
+    Create a synthetic dataset and return the number of rows per kind.
+
+    Totals are split evenly over batches of batch_size guides; each batch
+    (users, guides, their M2M rows, packages, schedules and reviews) is one
+    transaction. packages defaults to two per guide. progress, if given, is
+    called with (kind, done, total) after every batch.
+    """
+    rng = random.Random(seed)
+    languages, specialties, locations = _lookups()
+    packages = guides * 2 if packages is None else packages
+    counts = {'guides': 0, 'packages': 0, 'schedules': 0, 'reviews': 0, 'blog_pages': 0}
+
+    start = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+    # One unusable password hash for everybody; benchmarks log in with force_login().
+    password = make_password(None)
+    for done in range(0, guides, batch_size):
+        size = min(batch_size, guides - done)
+        with transaction.atomic():
+            batch = create_guides(rng, size, start + done, languages, specialties, password)
+            counts['packages'] += len(create_packages(rng, _share(packages, done, size, guides), batch, locations))
+            counts['schedules'] += len(create_schedules(rng, _share(schedules, done, size, guides), batch, locations))
+            counts['reviews'] += len(create_reviews(rng, _share(reviews, done, size, guides), batch))
+            # bulk_create() sends no signals.
+            refresh_guide_ratings([guide.pk for guide in batch])
+        counts['guides'] += size
+        if progress:
+            progress('guides', counts['guides'], guides)
+    if counts['packages']:
+        refresh_price_stats()
+
+    if blog_pages:
+        index = _blog_index()
+        categories = [
+            BlogCategory.objects.get_or_create(slug=slug, defaults={'name': name})[0]
+            for slug, name in BLOG_CATEGORIES
+        ]
+        for done in range(0, blog_pages, batch_size):
+            size = min(batch_size, blog_pages - done)
+            with transaction.atomic():
+                create_blog_pages(rng, size, index, categories)
+            counts['blog_pages'] += size
+            if progress:
+                progress('blog_pages', counts['blog_pages'], blog_pages)
+    return counts
@@ -0,0 +1,335 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from wagtail.models import Page
+
+from blog.models import BlogPage
+from totrip import changelist, ratelimit
+from totrip.benchmark import run_benchmarks
+from totrip.hashers import TunedArgon2PasswordHasher
+from totrip.management.commands.import_profile import package_totals, parse_importtime
+from totrip.synthetic import generate_dataset
+from totrip.views import serve_media
+from totrip.warmup import project_template_dirs, warm_templates
+from tourguides.models import Review, TourGuide
+
+
+class TemplateWarmupTests(SimpleTestCase):
+    def test_only_project_template_dirs_are_warmed(self):
+        dirs = project_template_dirs()
+        self.assertTrue(any(d.endswith('tourguides/templates') for d in dirs))
+        self.assertFalse(any('site-packages' in d for d in dirs))
+
+    def test_every_project_template_compiles(self):
+        self.assertGreater(warm_templates(), 0)
+
+    def test_warm_templates_command(self):
+        out = StringIO()
+        call_command('warm_templates', stdout=out)
+        self.assertIn('Compiled', out.getvalue())
+
+
+class ImportProfileTests(SimpleTestCase):
+    def test_parse_importtime_output(self):
+        modules = parse_importtime(
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   django.utils\n'
+            'import time:       300 |        420 | django\n'
+            'import time:        80 |         80 | wagtail\n'
+        )
+        self.assertEqual([m['module'] for m in modules], ['django.utils', 'django', 'wagtail'])
+        self.assertEqual([m['depth'] for m in modules], [1, 0, 0])
+        self.assertEqual(package_totals(modules), [('django', 420), ('wagtail', 80)])
+
+    def test_command_reports_startup_imports(self):
+        out = StringIO()
+        call_command('import_profile', '--runs', '1', '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertGreater(report['modules_imported'], 0)
+        self.assertIn('django', [p['package'] for p in report['packages']])
+
+
+class BenchmarkTests(TestCase):
+    def test_synthetic_dataset_is_deterministic(self):
+        counts = generate_dataset(guides=4, reviews=12, schedules=6, blog_pages=2, seed=7)
+        self.assertEqual(counts, {'guides': 4, 'packages': 8, 'schedules': 6, 'reviews': 12, 'blog_pages': 2})
+        ratings = list(Review.objects.order_by('pk').values_list('rating', flat=True))
+
+        Review.objects.all().delete()
+        TourGuide.objects.all().delete()
+        generate_dataset(guides=4, reviews=12, schedules=6, blog_pages=0, seed=7)
+        self.assertEqual(list(Review.objects.order_by('pk').values_list('rating', flat=True)), ratings)
+
+    def test_every_scenario_renders(self):
+        generate_dataset(guides=6, reviews=30, schedules=10, blog_pages=3)
+        results = run_benchmarks(iterations=1)
+        names = [result['name'] for result in results]
+        self.assertIn('guides_list[location+specialty+language]', names)
+        self.assertIn('guide_dashboard', names)
+        self.assertIn('blog_index[popular]', names)
+        for result in results:
+            self.assertEqual(result['status'], 200, result['name'])
+            self.assertGreater(result['queries'], 0, result['name'])
+
+
+class SeedDbTests(TestCase):
+    def test_generates_scaled_dataset(self):
+        call_command(
+            'seed_db', '--guides', '5', '--reviews-per-guide', '3', '--blog-pages', '4',
+            '--batch-size', '2', stdout=StringIO(),
+        )
+        self.assertEqual(TourGuide.objects.filter(slug__startswith='synthetic-').count(), 5)
+        self.assertEqual(Review.objects.count(), 15)
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+        post = BlogPage.objects.get(slug='synthetic-post-3')
+        self.assertTrue(post.live)
+        self.assertEqual(post.get_parent().specific.numchild, BlogPage.objects.count())
+
+    def test_blog_posts_are_numbered_after_the_highest_existing_one(self):
+        generate_dataset(guides=0, blog_pages=3)
+        BlogPage.objects.get(slug='synthetic-post-0').delete()
+        generate_dataset(guides=0, blog_pages=2)
+        self.assertEqual(
+            sorted(BlogPage.objects.values_list('slug', flat=True)),
+            ['synthetic-post-1', 'synthetic-post-2', 'synthetic-post-3', 'synthetic-post-4'],
+        )
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+
+class CompressedStaticFilesTests(SimpleTestCase):
+    """
+    Production static file pipeline: hashed names, gzip and Brotli variants
+    written by collectstatic, served by WhiteNoise with the right headers.
+    """
+
+    css = 'body { font-family: Tajawal, sans-serif; }\n' * 200
+
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source_dir)
+        self.addCleanup(shutil.rmtree, self.static_root)
+        os.makedirs(os.path.join(self.source_dir, 'css'))
+        with open(os.path.join(self.source_dir, 'css', 'site.css'), 'w') as f:
+            f.write(self.css)
+
+        overrides = override_settings(
+            STATICFILES_DIRS=[self.source_dir],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STATIC_ROOT=self.static_root,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+            },
+            MIDDLEWARE=['whitenoise.middleware.WhiteNoiseMiddleware'],
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_collectstatic_writes_compressed_variants(self):
+        hashed = staticfiles_storage.stored_name('css/site.css')
+        self.assertNotEqual(hashed, 'css/site.css')
+        for suffix in ('.gz', '.br'):
+            self.assertTrue(os.path.exists(os.path.join(self.static_root, hashed + suffix)))
+
+    def test_hashed_files_are_served_compressed_and_immutable(self):
+        url = staticfiles_storage.url('css/site.css')
+        for accept, encoding in (('br, gzip', 'br'), ('gzip', 'gzip')):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING=accept)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Encoding'], encoding)
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('Accept-Encoding', response['Vary'])
+            response.close()
+
+
+class StaffUser:
+    is_authenticated = True
+    is_staff = True
+
+
+class ServeMediaTests(SimpleTestCase):
+    content = b'0123456789' * 10
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        for folder in ('images', 'private'):
+            os.makedirs(os.path.join(self.media_root, folder))
+            with open(os.path.join(self.media_root, folder, 'photo.jpg'), 'wb') as f:
+                f.write(self.content)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, MEDIA_SERVE_BACKEND='python')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.factory = RequestFactory()
+
+    def get(self, path, user=None, **headers):
+        request = self.factory.get('/media/' + path, headers=headers)
+        request.user = user or AnonymousUser()
+        return serve_media(request, path)
+
+    def test_python_fallback_streams_file_with_validators(self):
+        response = self.get('images/photo.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        response.close()
+
+    def test_if_none_match_returns_not_modified(self):
+        etag = self.get('images/photo.jpg')['ETag']
+        response = self.get('images/photo.jpg', If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_request(self):
+        response = self.get('images/photo.jpg', Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+        response = self.get('images/photo.jpg', Range='bytes=-5')
+        self.assertEqual(response['Content-Range'], 'bytes 95-99/100')
+
+        response = self.get('images/photo.jpg', Range='bytes=500-')
+        self.assertEqual(response.status_code, 416)
+
+        # Syntactically invalid: ignored, not refused.
+        response = self.get('images/photo.jpg', Range='bytes=50-10')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_stale_if_range_sends_full_file(self):
+        response = self.get('images/photo.jpg', Range='bytes=0-4', If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    @override_settings(MEDIA_SERVE_BACKEND='x-accel-redirect', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_accel_redirect(self):
+        response = self.get('images/photo.jpg')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/images/photo.jpg')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SERVE_BACKEND='x-sendfile')
+    def test_sendfile(self):
+        response = self.get('images/photo.jpg')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'images', 'photo.jpg'))
+
+    def test_private_media_requires_staff(self):
+        with self.assertRaises(Http404):
+            self.get('private/photo.jpg')
+        with self.assertRaises(Http404):
+            self.get('images/../private/photo.jpg')
+        response = self.get('private/photo.jpg', user=StaffUser())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        response.close()
+
+    def test_path_traversal_is_rejected(self):
+        with self.assertRaises(Http404):
+            self.get('../etc/passwd')
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def test_small_or_filtered_tables_get_exact_counts(self):
+        generate_dataset(guides=3, reviews=5, schedules=0, blog_pages=0)
+        # SQLite has no planner estimate.
+        self.assertIsNone(changelist.estimated_count(Review.objects.all()))
+        self.assertEqual(changelist.EstimatedCountPaginator(Review.objects.all(), 2).count, 5)
+
+        with mock.patch.object(changelist, 'estimated_count', return_value=10):
+            self.assertEqual(changelist.EstimatedCountPaginator(Review.objects.all(), 2).count, 5)
+
+    def test_big_tables_use_the_estimate(self):
+        with mock.patch.object(changelist, 'estimated_count', return_value=2_000_000):
+            paginator = changelist.EstimatedCountPaginator(Review.objects.all(), 100)
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.num_pages, 20_000)
+
+
+class PruneSessionsTests(TestCase):
+    def test_deletes_only_expired_sessions(self):
+        for expiry in (-60,) * 5 + (60,):
+            session = SessionStore()
+            session.set_expiry(expiry)
+            session.save()
+        out = StringIO()
+        call_command('prune_sessions', '--batch-size=2', stdout=out)
+        self.assertIn('Deleted 5 expired sessions', out.getvalue())
+        self.assertEqual(Session.objects.get().expire_date > timezone.now(), True)
+
+
+class TunedArgon2Tests(SimpleTestCase):
+    @override_settings(ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=8 * 1024, ARGON2_PARALLELISM=1)
+    def test_costs_come_from_settings(self):
+        hasher = TunedArgon2PasswordHasher()
+        encoded = hasher.encode('secret', hasher.salt())
+        self.assertIn('$m=8192,t=1,p=1$', encoded)
+        self.assertTrue(hasher.verify('secret', encoded))
+        self.assertFalse(hasher.must_update(encoded))
+        with override_settings(ARGON2_MEMORY_COST=16 * 1024):
+            # Verifies, and is rehashed at the next login.
+            self.assertTrue(hasher.verify('secret', encoded))
+            self.assertTrue(hasher.must_update(encoded))
+
+
+@override_settings(RATE_LIMITS={'test': {'ip': '2/m'}})
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.view = ratelimit.rate_limit('test')(lambda request: 'ok')
+        self.request = RequestFactory().post('/', REMOTE_ADDR='203.0.113.7')
+
+    def test_token_bucket_refills_over_time(self):
+        refused = []
+        ratelimit.throttled.connect(lambda **kwargs: refused.append(kwargs['retry_after']), weak=False)
+        self.addCleanup(ratelimit.throttled.receivers.clear)
+        with mock.patch.object(ratelimit.time, 'time', return_value=1000.0) as now:
+            self.assertEqual([self.view(self.request), self.view(self.request)], ['ok', 'ok'])
+            with self.assertLogs('totrip.ratelimit', 'WARNING'):
+                response = self.view(self.request)
+            self.assertEqual((response.status_code, response['Retry-After']), (429, '30'))
+            self.assertEqual(refused, [30])
+
+            # One token back every 30 seconds, shared by nobody else.
+            now.return_value = 1030.0
+            self.assertEqual(self.view(self.request), 'ok')
+            self.assertEqual(self.view(RequestFactory().post('/', REMOTE_ADDR='203.0.113.8')), 'ok')
+            with self.assertLogs('totrip.ratelimit', 'WARNING'):
+                self.assertEqual(self.view(self.request).status_code, 429)
+
+    @override_settings(RATE_LIMITS={'test': {'user': '2/m', 'ip': '1/m'}})
+    def test_refused_requests_spend_no_tokens(self):
+        user = mock.Mock(pk=1, is_authenticated=True)
+        behind_nat = RequestFactory().post('/', REMOTE_ADDR='203.0.113.7')
+        behind_nat.user = user
+        self.view(self.request)
+        # The address bucket refuses, so the user keeps both tokens.
+        with self.assertLogs('totrip.ratelimit', 'WARNING'):
+            self.assertEqual(self.view(behind_nat).status_code, 429)
+        elsewhere = RequestFactory().post('/', REMOTE_ADDR='198.51.100.1')
+        elsewhere.user = user
+        self.assertEqual(self.view(elsewhere), 'ok')
+        other_address = RequestFactory().post('/', REMOTE_ADDR='198.51.100.2')
+        other_address.user = user
+        self.assertEqual(self.view(other_address), 'ok')
+
+    def test_other_methods_are_not_limited(self):
+        request = RequestFactory().get('/')
+        self.assertEqual([self.view(request) for _ in range(5)], ['ok'] * 5)
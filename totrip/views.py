@@ -0,0 +1,176 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT after checking the request may see it.
+
+    Depending on MEDIA_SERVE_BACKEND the bytes are either streamed by Django
+    (local development, single-container deploys) or handed to the front-end
+    server with X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd).
+    Conditional requests are answered with 304 before any file is opened.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Invalid media path")
+    # Authorize against the normalized path so "images/../private" can't
+    # borrow the public prefix.
+    path = os.path.relpath(full_path, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, '/')
+
+    if not can_view_media(request, path):
+        raise Http404("Media file not found")
+
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Media file not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Media file not found")
+
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        backend = settings.MEDIA_SERVE_BACKEND
+        if backend == 'x-accel-redirect':
+            response = _accel_redirect_response(path, full_path)
+        elif backend == 'x-sendfile':
+            response = _sendfile_response(full_path)
+        else:
+            response = _python_file_response(request, full_path, stat.st_size, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if _is_public(path):
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    else:
+        patch_cache_control(response, private=True)
+    return response
+
+
+def can_view_media(request, path):
+    """
+    Images (originals and renditions) are shown on public guide profiles and
+    blog posts, so anyone may fetch them. Everything else under MEDIA_ROOT is
+    restricted to staff; Wagtail documents have their own serve view.
+    """
+    if _is_public(path):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and user.is_staff)
+
+
+def _is_public(path):
+    return path.startswith(tuple(settings.MEDIA_PUBLIC_PREFIXES))
+
+
+def _content_type(full_path):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    return content_type or 'application/octet-stream'
+
+
+def _accel_redirect_response(path, full_path):
+    response = HttpResponse(content_type=_content_type(full_path))
+    response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+    return response
+
+
+def _sendfile_response(full_path):
+    response = HttpResponse(content_type=_content_type(full_path))
+    response['X-Sendfile'] = full_path
+    return response
+
+
+def _python_file_response(request, full_path, size, etag, last_modified):
+    """
+    Stream the file from the worker, honouring a single byte range.
+
+    Multi-range requests fall back to the full body, which RFC 9110 allows.
+    """
+    byte_range = _requested_range(request, size, etag, last_modified)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=_content_type(full_path))
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _read_range(full_path, start, length),
+            status=206,
+            content_type=_content_type(full_path),
+        )
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _requested_range(request, size, etag, last_modified):
+    """
+    Return (start, end) for a satisfiable single range, None to send the whole
+    file, or False when the range cannot be satisfied. An invalid header,
+    such as a range ending before it starts, is ignored (RFC 9110, 14.2).
+    """
+    header = request.headers.get('Range')
+    if not header:
+        return None
+
+    if_range = request.headers.get('If-Range')
+    if if_range:
+        if if_range.startswith(('"', 'W/')):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != last_modified:
+            return None
+
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        return False
+    return start, min(end, size - 1)
+
+
+def _read_range(full_path, start, length):
+    with open(full_path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
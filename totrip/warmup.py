@@ -0,0 +1,76 @@
+"""
+Start-up warm-up helpers.
+
+Compiling the project's templates ahead of the first request means a freshly
+started worker does not pay the parse cost on its first page view, and a
+broken template stops the deploy instead of surfacing as a 500 later on.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template import engines
+from django.template.utils import get_app_template_dirs
+
+
+def project_template_dirs():
+    """
+    Return the template directories that belong to this project.
+
+    Third-party apps (Wagtail admin, Django admin, crispy forms) ship hundreds
+    of templates that public pages never touch, so only directories that live
+    inside BASE_DIR are warmed.
+    """
+    base_dir = os.path.realpath(settings.BASE_DIR)
+    dirs = []
+    for engine in engines.all():
+        candidates = list(engine.dirs)
+        if engine.app_dirs:
+            candidates += [str(d) for d in get_app_template_dirs("templates")]
+        for directory in candidates:
+            directory = os.path.realpath(directory)
+            if directory.startswith(base_dir + os.sep) and directory not in dirs:
+                dirs.append(directory)
+    return dirs
+
+
+def iter_template_names(directory):
+    """Yield the loader-relative names of every HTML template under directory."""
+    for root, _dirs, files in os.walk(directory):
+        for filename in sorted(files):
+            if filename.endswith(".html"):
+                path = os.path.join(root, filename)
+                yield os.path.relpath(path, directory).replace(os.sep, "/")
+
+
+def warm_templates():
+    """
+    Compile every project template through the configured loaders.
+
+    With the cached loader enabled the compiled templates stay in memory for
+    the lifetime of the process. Any TemplateSyntaxError propagates so the
+    caller fails fast. Returns the number of templates compiled.
+    """
+    compiled = set()
+    for engine in engines.all():
+        for directory in project_template_dirs():
+            for name in iter_template_names(directory):
+                if (engine.name, name) in compiled:
+                    continue
+                engine.get_template(name)
+                compiled.add((engine.name, name))
+    return len(compiled)
+
+
+def warm_connections():
+    """
+    Open this thread's database and cache connections.
+
+    Only useful where the connections outlive a request (CONN_MAX_AGE) and
+    requests are served on the calling thread, e.g. gunicorn sync workers.
+    """
+    for connection in connections.all():
+        connection.ensure_connection()
+    caches[settings.PAGE_CACHE_ALIAS].get("warmup")
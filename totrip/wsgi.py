@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "totrip.settings.dev")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "totrip.settings.production")
 
 application = get_wsgi_application()
+
+if settings.TEMPLATE_WARMUP:
+    from totrip.warmup import warm_templates
+
+    warm_templates()
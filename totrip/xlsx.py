@@ -0,0 +1,144 @@
+"""
+A minimal streaming XLSX writer.
+
+An .xlsx file is a zip of XML parts. openpyxl, even in write-only mode,
+only assembles the zip in save(), so nothing can be sent until the whole
+workbook is built. Here the single worksheet is written row by row into a
+zip entry with data descriptors, and the compressed bytes are handed back
+as they are produced. Memory stays flat and the first bytes go out
+straight away.
+
+Cells are written as inline strings, plain numbers or booleans; there
+are no styles, so dates appear as ISO text.
+"""
+
+import datetime
+import decimal
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+# XML 1.0 has no escape for most control characters, so they are dropped.
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Excel's limit on characters in one cell.
+MAX_CELL_LENGTH = 32767
+
+
+class _Pipe:
+    """
+    Write-only, unseekable file object for ZipFile; take() returns the
+    bytes written since the last call.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, (list, tuple)):
+        value = '|'.join(str(item) for item in value)
+    elif isinstance(value, (datetime.date, datetime.time)):
+        value = value.isoformat()
+    text = _ILLEGAL_XML.sub('', str(value))[:MAX_CELL_LENGTH]
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _row(values):
+    return ('<row>' + ''.join(_cell(value) for value in values) + '</row>').encode()
+
+
+def stream_xlsx(header, rows, sheet_name='Sheet1', chunk_rows=500):
+    """
+    Yield an .xlsx file as bytes: a header row, then each row of values,
+    flushed every chunk_rows rows.
+    """
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for name, content in _PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(name=escape(sheet_name[:31], {'"': '&quot;'})))
+        yield pipe.take()
+
+        # The sheet's size is unknown up front; zip64 lets it pass 2 GiB.
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(_SHEET_START.encode())
+            sheet.write(_row(header))
+            for count, values in enumerate(rows, 1):
+                sheet.write(_row(values))
+                if count % chunk_rows == 0:
+                    # Deflate buffers internally, so this can be empty.
+                    data = pipe.take()
+                    if data:
+                        yield data
+            sheet.write(_SHEET_END.encode())
+    yield pipe.take()
@@ -1,9 +1,88 @@
+import io
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+
+from totrip.changelist import LargeTableAdminMixin
+
+from .bulk_io import CONTENT_TYPES, FORMATS, KINDS, detect_format, import_rows, read_rows, stream_export
+from .forms import BulkImportForm
 from .models import (
     TourGuide, Language, Certification, Specialty, TourPackage, 
-    Location, WorkSchedule, Gallery, Video, Review, Badge, BadgeAssignment
+    Location, WorkSchedule, Gallery, Video, Review, Badge, BadgeAssignment,
+    batched_rating_refresh, set_reviews_approved, touch_tour_guides
 )
 
+class BulkDataAdminMixin:
+    """
+    CSV, JSON Lines and XLSX export actions and an import page for the
+    models in tourguides/bulk_io.py. Exports are streamed, so the response
+    starts at once and memory stays flat however many rows are selected.
+    """
+    bulk_kind = None
+    change_list_template = 'admin/tourguides/bulk_change_list.html'
+    actions = ['export_csv', 'export_jsonl', 'export_xlsx']
+    max_listed_errors = 200
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='%s_%s_import' % info),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+        form = BulkImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            fmt = detect_format(upload.name)
+            if fmt not in FORMATS:
+                form.add_error('file', 'Upload a CSV or JSON Lines file.')
+            else:
+                stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+                dry_run = form.cleaned_data['dry_run']
+                result = import_rows(self.bulk_kind, read_rows(stream, fmt), dry_run=dry_run)
+                if not result.errors and not dry_run:
+                    self.message_user(request, f'{result.created} created and {result.updated} updated.')
+                    info = self.model._meta.app_label, self.model._meta.model_name
+                    return HttpResponseRedirect(reverse('admin:%s_%s_changelist' % info))
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f'Import {self.model._meta.verbose_name_plural}',
+            'opts': self.model._meta,
+            'form': form,
+            'columns': KINDS[self.bulk_kind].columns,
+            'result': result,
+            'errors': result.errors[:self.max_listed_errors] if result else [],
+        }
+        return TemplateResponse(request, 'admin/tourguides/bulk_import.html', context)
+
+    def export_response(self, queryset, fmt):
+        response = StreamingHttpResponse(
+            stream_export(self.bulk_kind, fmt, queryset), content_type=CONTENT_TYPES[fmt]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.bulk_kind}.{fmt}"'
+        return response
+
+    def export_csv(self, request, queryset):
+        return self.export_response(queryset, 'csv')
+    export_csv.short_description = "Export selected as CSV"
+
+    def export_jsonl(self, request, queryset):
+        return self.export_response(queryset, 'jsonl')
+    export_jsonl.short_description = "Export selected as JSON Lines"
+
+    def export_xlsx(self, request, queryset):
+        return self.export_response(queryset, 'xlsx')
+    export_xlsx.short_description = "Export selected as Excel (XLSX)"
+
+
 class GalleryInline(admin.TabularInline):
     model = Gallery
     extra = 1
@@ -25,13 +104,18 @@ class BadgeAssignmentInline(admin.TabularInline):
     extra = 1
 
 @admin.register(TourGuide)
-class TourGuideAdmin(admin.ModelAdmin):
+class TourGuideAdmin(LargeTableAdminMixin, BulkDataAdminMixin, admin.ModelAdmin):
+    bulk_kind = 'guides'
     list_display = ('user', 'is_active', 'is_verified', 'is_featured', 'is_recommended', 'created_at')
     list_filter = ('is_active', 'is_verified', 'is_featured', 'is_recommended')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email', 'user__first_name', 'user__last_name')
     readonly_fields = ('created_at', 'updated_at')
     inlines = [GalleryInline, VideoInline, TourPackageInline, WorkScheduleInline, BadgeAssignmentInline]
-    actions = ['verify_guides', 'feature_guides', 'recommend_guides', 'deactivate_guides', 'activate_guides']
+    actions = [
+        'verify_guides', 'feature_guides', 'recommend_guides', 'deactivate_guides', 'activate_guides',
+        'export_csv', 'export_jsonl', 'export_xlsx',
+    ]
     fieldsets = (
         ('User Information', {
             'fields': ('user', 'slug', 'profile_image', 'banner_image', 'bio', 'phone_number')
@@ -54,50 +138,63 @@ class TourGuideAdmin(admin.ModelAdmin):
     
     def verify_guides(self, request, queryset):
         updated = queryset.update(is_verified=True)
+        touch_tour_guides(queryset.values('pk'))
         self.message_user(request, f'{updated} guides were verified successfully.')
     verify_guides.short_description = "Verify selected tour guides"
     
     def feature_guides(self, request, queryset):
         updated = queryset.update(is_featured=True)
+        touch_tour_guides(queryset.values('pk'))
         self.message_user(request, f'{updated} guides were featured successfully.')
     feature_guides.short_description = "Feature selected tour guides"
     
     def recommend_guides(self, request, queryset):
         updated = queryset.update(is_recommended=True)
+        touch_tour_guides(queryset.values('pk'))
         self.message_user(request, f'{updated} guides were recommended successfully.')
     recommend_guides.short_description = "Recommend selected tour guides"
     
     def deactivate_guides(self, request, queryset):
         updated = queryset.update(is_active=False)
+        touch_tour_guides(queryset.values('pk'))
         self.message_user(request, f'{updated} guides were deactivated successfully.')
     deactivate_guides.short_description = "Deactivate selected tour guides"
     
     def activate_guides(self, request, queryset):
         updated = queryset.update(is_active=True)
+        touch_tour_guides(queryset.values('pk'))
         self.message_user(request, f'{updated} guides were activated successfully.')
     activate_guides.short_description = "Activate selected tour guides"
 
 @admin.register(TourPackage)
-class TourPackageAdmin(admin.ModelAdmin):
+class TourPackageAdmin(LargeTableAdminMixin, BulkDataAdminMixin, admin.ModelAdmin):
+    bulk_kind = 'packages'
     list_display = ('title', 'tour_guide', 'price', 'is_active', 'is_featured')
     list_filter = ('is_active', 'is_featured')
+    list_select_related = ('tour_guide__user',)
     search_fields = ('title', 'description', 'tour_guide__user__username')
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ('created_at', 'updated_at')
-    actions = ['activate_packages', 'deactivate_packages', 'feature_packages']
+    actions = [
+        'activate_packages', 'deactivate_packages', 'feature_packages',
+        'export_csv', 'export_jsonl', 'export_xlsx',
+    ]
     
     def activate_packages(self, request, queryset):
         updated = queryset.update(is_active=True)
+        touch_tour_guides(queryset.values('tour_guide_id'))
         self.message_user(request, f'{updated} packages were activated.')
     activate_packages.short_description = "Activate selected packages"
     
     def deactivate_packages(self, request, queryset):
         updated = queryset.update(is_active=False)
+        touch_tour_guides(queryset.values('tour_guide_id'))
         self.message_user(request, f'{updated} packages were deactivated.')
     deactivate_packages.short_description = "Deactivate selected packages"
     
     def feature_packages(self, request, queryset):
         updated = queryset.update(is_featured=True)
+        touch_tour_guides(queryset.values('tour_guide_id'))
         self.message_user(request, f'{updated} packages were featured.')
     feature_packages.short_description = "Feature selected packages"
 
@@ -119,38 +216,103 @@ class LocationAdmin(admin.ModelAdmin):
     unmark_as_popular.short_description = "Unmark selected locations as popular"
 
 @admin.register(WorkSchedule)
-class WorkScheduleAdmin(admin.ModelAdmin):
+class WorkScheduleAdmin(LargeTableAdminMixin, BulkDataAdminMixin, admin.ModelAdmin):
+    bulk_kind = 'schedules'
     list_display = ('tour_guide', 'location', 'start_date', 'end_date')
     list_filter = ('location', 'start_date', 'end_date')
+    list_select_related = ('tour_guide__user', 'location')
     search_fields = ('tour_guide__user__username', 'location__name')
     date_hierarchy = 'start_date'
 
 @admin.register(Gallery)
-class GalleryAdmin(admin.ModelAdmin):
+class GalleryAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('tour_guide', 'title', 'order', 'created_at')
     list_filter = ('created_at',)
+    list_select_related = ('tour_guide__user',)
     search_fields = ('tour_guide__user__username', 'title')
 
 @admin.register(Video)
-class VideoAdmin(admin.ModelAdmin):
+class VideoAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('tour_guide', 'title', 'order', 'created_at')
     list_filter = ('created_at',)
+    list_select_related = ('tour_guide__user',)
     search_fields = ('tour_guide__user__username', 'title')
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableAdminMixin, BulkDataAdminMixin, admin.ModelAdmin):
+    bulk_kind = 'reviews'
+    change_list_template = 'admin/tourguides/review_change_list.html'
     list_display = ('tour_guide', 'author_name', 'rating', 'is_approved', 'created_at')
     list_filter = ('rating', 'is_approved', 'created_at')
+    list_select_related = ('tour_guide__user',)
     search_fields = ('tour_guide__user__username', 'author_name', 'comment')
-    actions = ['approve_reviews', 'disapprove_reviews']
+    actions = ['approve_reviews', 'disapprove_reviews', 'export_csv', 'export_jsonl', 'export_xlsx']
+    moderation_page_size = 50
+
+    def get_urls(self):
+        return [
+            path(
+                'moderation/', self.admin_site.admin_view(self.moderation_view),
+                name='tourguides_review_moderation',
+            ),
+        ] + super().get_urls()
+
+    def moderation_view(self, request):
+        """
+        Pending reviews only, oldest first. Pages are keyset-paginated on the
+        id (?after=<id>), so a deep page costs the same as the first one.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        try:
+            after = int(request.GET.get('after', 0))
+        except ValueError:
+            after = 0
+
+        if request.method == 'POST':
+            selected = Review.objects.filter(pk__in=request.POST.getlist('review'), is_approved=False)
+            action = request.POST.get('action')
+            if action == 'approve':
+                updated = set_reviews_approved(selected, True)
+                self.message_user(request, f'{updated} reviews were approved.')
+            elif action == 'delete':
+                if not self.has_delete_permission(request):
+                    raise PermissionDenied
+                self.delete_queryset(request, selected)
+                self.message_user(request, 'The selected reviews were deleted.')
+            return HttpResponseRedirect(request.get_full_path())
+
+        pending = Review.objects.filter(is_approved=False)
+        reviews = list(
+            pending.filter(pk__gt=after).select_related('tour_guide__user')
+            .order_by('pk')[:self.moderation_page_size + 1]
+        )
+        has_next = len(reviews) > self.moderation_page_size
+        reviews = reviews[:self.moderation_page_size]
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Review moderation',
+            'opts': self.model._meta,
+            'reviews': reviews,
+            'pending_count': pending.count(),
+            'next_after': reviews[-1].pk if has_next else None,
+            'is_first_page': not after,
+            'has_delete_permission': self.has_delete_permission(request),
+        }
+        return TemplateResponse(request, 'admin/tourguides/review_moderation.html', context)
+
+    def delete_queryset(self, request, queryset):
+        # Deleting fires post_delete per review; refresh each guide once.
+        with batched_rating_refresh():
+            super().delete_queryset(request, queryset)
 
     def approve_reviews(self, request, queryset):
-        updated = queryset.update(is_approved=True)
+        updated = set_reviews_approved(queryset, True)
         self.message_user(request, f'{updated} reviews were approved.')
     approve_reviews.short_description = "Approve selected reviews"
     
     def disapprove_reviews(self, request, queryset):
-        updated = queryset.update(is_approved=False)
+        updated = set_reviews_approved(queryset, False)
         self.message_user(request, f'{updated} reviews were disapproved.')
     disapprove_reviews.short_description = "Disapprove selected reviews"
 
@@ -160,9 +322,10 @@ class BadgeAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description')
 
 @admin.register(BadgeAssignment)
-class BadgeAssignmentAdmin(admin.ModelAdmin):
+class BadgeAssignmentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('tour_guide', 'badge', 'assigned_at', 'assigned_by')
     list_filter = ('badge', 'assigned_at')
+    list_select_related = ('tour_guide__user', 'badge', 'assigned_by')
     search_fields = ('tour_guide__user__username', 'badge__name')
     readonly_fields = ('assigned_at',)
 
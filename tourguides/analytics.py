@@ -0,0 +1,281 @@
+"""
+Guide analytics: profile views, package impressions and review submissions.
+
+record_event() only appends to an in-process buffer. The buffer is written
+to the AnalyticsEvent table with one bulk INSERT once it holds
+ANALYTICS_BUFFER_SIZE events or its oldest event is ANALYTICS_FLUSH_INTERVAL
+seconds old, checked after each response has been sent, so no request
+waits on a write per event. Events still buffered when a worker dies are
+lost; that is the price of keeping them off the request path.
+
+rollup() drains the buffer table into GuideDailyStats, which the dashboard
+reads. Package impressions are not recorded one by one: each profile view
+shows the guide's active packages, so a view counts one impression per
+active package at rollup time.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import DatabaseError, transaction
+from django.db.models import Count, Q
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import purge_dashboard_stats
+from .models import AnalyticsEvent, GuideDailyStats, SlugHistory, TourGuide
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_BATCH_SIZE = 5000
+ROLLUP_LOCK_KEY = 'analytics:rollup:lock'
+ROLLUP_LOCK_TIMEOUT = 60 * 10
+
+_lock = threading.Lock()
+_buffer = []
+_oldest = None
+
+
+def record_event(kind, guide_slug):
+    """Buffer one event; it reaches the database with the next flush."""
+    global _oldest
+    with _lock:
+        if not _buffer:
+            _oldest = time.monotonic()
+        _buffer.append(AnalyticsEvent(kind=kind, guide_slug=guide_slug, created_at=timezone.now()))
+
+
+def _take(force):
+    global _oldest
+    with _lock:
+        if not _buffer:
+            return []
+        if not force and (
+            len(_buffer) < settings.ANALYTICS_BUFFER_SIZE
+            and time.monotonic() - _oldest < settings.ANALYTICS_FLUSH_INTERVAL
+        ):
+            return []
+        events = _buffer[:]
+        _buffer.clear()
+        _oldest = None
+    return events
+
+
+def flush_events(force=True):
+    """
+    Write the buffered events with one bulk INSERT. Without force, only when
+    the buffer is full or old enough. Returns the number of events written.
+    """
+    events = _take(force)
+    if not events:
+        return 0
+    try:
+        AnalyticsEvent.objects.bulk_create(events, batch_size=settings.ANALYTICS_BUFFER_SIZE)
+    except DatabaseError:
+        # Analytics must never break a request; drop the batch.
+        logger.exception('Dropped %d analytics events', len(events))
+        return 0
+    return len(events)
+
+
+@receiver(request_finished)
+def _flush_after_request(sender, **kwargs):
+    flush_events(force=False)
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush_events()
+    except Exception:
+        pass
+
+
+def track_view(kind):
+    """
+    Record kind for the view's slug on every successful GET, including
+    responses served by the page cache and 304s, so it must wrap
+    anonymous_page_cache.
+    """
+    def record(request, response, kwargs):
+        if request.method == 'GET' and response.status_code in (200, 304):
+            record_event(kind, kwargs['slug'])
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                response = await view(request, *args, **kwargs)
+                record(request, response, kwargs)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            record(request, response, kwargs)
+            return response
+        return wrapper
+    return decorator
+
+
+def _guides_by_slug(slugs):
+    """
+    {slug: (pk, active packages)} for the guides behind slugs. Events
+    recorded before a guide was renamed carry an old slug, found through
+    SlugHistory.
+    """
+    guides = TourGuide.objects.annotate(active_packages=Count('packages', filter=Q(packages__is_active=True)))
+    found = {
+        slug: (pk, active_packages)
+        for slug, pk, active_packages in guides.filter(slug__in=slugs).values_list('slug', 'pk', 'active_packages')
+    }
+    renamed = list(
+        SlugHistory.for_model(TourGuide).filter(slug__in=slugs - found.keys()).values_list('slug', 'object_id')
+    )
+    if renamed:
+        by_pk = {
+            pk: (pk, active_packages)
+            for pk, active_packages in guides.filter(
+                pk__in={pk for _, pk in renamed}
+            ).values_list('pk', 'active_packages')
+        }
+        found.update((slug, by_pk[pk]) for slug, pk in renamed if pk in by_pk)
+    return found
+
+
+def _rollup_batch(events):
+    """
+    Fold (pk, guide_slug, kind, created_at) rows into the daily counters;
+    return the guides touched.
+    """
+    totals = Counter(
+        (slug, kind, timezone.localdate(created_at)) for _, slug, kind, created_at in events
+    )
+    guides = _guides_by_slug({slug for slug, _, _ in totals})
+
+    counters = {}
+    for (slug, kind, date), total in totals.items():
+        if slug not in guides:
+            # The guide was deleted since.
+            continue
+        pk, active_packages = guides[slug]
+        counter = counters.setdefault((pk, date), [0, 0, 0])
+        if kind == AnalyticsEvent.PROFILE_VIEW:
+            counter[0] += total
+            counter[1] += total * active_packages
+        elif kind == AnalyticsEvent.REVIEW_SUBMITTED:
+            counter[2] += total
+    if not counters:
+        return set()
+
+    # Make sure every counter row exists, then lock and add to them, so a
+    # concurrent rollup of other events for the same day waits instead of
+    # failing on the unique constraint. Sorted, so runs lock in one order.
+    keys = sorted(counters)
+    GuideDailyStats.objects.bulk_create(
+        [GuideDailyStats(tour_guide_id=pk, date=date) for pk, date in keys], ignore_conflicts=True
+    )
+    rows = GuideDailyStats.objects.select_for_update().filter(
+        tour_guide_id__in={pk for pk, _ in keys}, date__in={date for _, date in keys}
+    ).order_by('tour_guide_id', 'date')
+    updated = []
+    for stats in rows:
+        counter = counters.get((stats.tour_guide_id, stats.date))
+        if counter is None:
+            continue
+        views, impressions, reviews = counter
+        stats.profile_views += views
+        stats.package_impressions += impressions
+        stats.reviews_submitted += reviews
+        updated.append(stats)
+    GuideDailyStats.objects.bulk_update(
+        updated, ['profile_views', 'package_impressions', 'reviews_submitted']
+    )
+    return {pk for pk, _ in keys}
+
+
+def rollup(batch_size=ROLLUP_BATCH_SIZE):
+    """
+    Drain AnalyticsEvent into GuideDailyStats, batch_size events per
+    transaction, and drop the affected guides' cached dashboards. Returns the
+    number of events processed, or None when another rollup is running.
+
+    Each batch is claimed by deleting its rows in the same transaction that
+    adds them to the counters, and only a batch this run deleted in full is
+    counted, so overlapping runs never count an event twice. The cache lock
+    only saves a second run the work; without a shared cache it does not
+    span processes.
+    """
+    if not cache.add(ROLLUP_LOCK_KEY, 1, ROLLUP_LOCK_TIMEOUT):
+        return None
+    processed = 0
+    try:
+        while True:
+            with transaction.atomic():
+                events = list(
+                    AnalyticsEvent.objects.select_for_update(skip_locked=True).order_by('pk')
+                    .values_list('pk', 'guide_slug', 'kind', 'created_at')[:batch_size]
+                )
+                if not events:
+                    break
+                # By id, not range: a flush may commit a lower id after this batch was read.
+                deleted, _ = AnalyticsEvent.objects.filter(pk__in=[event[0] for event in events]).delete()
+                if deleted != len(events):
+                    # Another run took some of these rows first (only possible
+                    # where rows cannot be locked); leave the batch to it.
+                    transaction.set_rollback(True)
+                    continue
+                guide_ids = _rollup_batch(events)
+            purge_dashboard_stats(guide_ids)
+            processed += deleted
+    finally:
+        cache.delete(ROLLUP_LOCK_KEY)
+    return processed
+
+
+def guide_trends(tour_guide_id, periods=(30, 90)):
+    """
+    Totals over each period in days and the daily series of the shortest
+    one, read from at most max(periods) GuideDailyStats rows.
+    """
+    today = timezone.localdate()
+    since = today - timedelta(days=max(periods) - 1)
+    rows = {
+        date: (views, impressions, reviews)
+        for date, views, impressions, reviews in GuideDailyStats.objects.filter(
+            tour_guide_id=tour_guide_id, date__gte=since
+        ).values_list('date', 'profile_views', 'package_impressions', 'reviews_submitted')
+    }
+
+    totals = []
+    for days in periods:
+        start = today - timedelta(days=days - 1)
+        values = [value for date, value in rows.items() if date >= start]
+        totals.append({
+            'days': days,
+            'profile_views': sum(value[0] for value in values),
+            'package_impressions': sum(value[1] for value in values),
+            'reviews_submitted': sum(value[2] for value in values),
+        })
+
+    days = min(periods)
+    series = [
+        (date, rows.get(date, (0, 0, 0))[0])
+        for date in (today - timedelta(days=offset) for offset in range(days - 1, -1, -1))
+    ]
+    peak = max((views for _, views in series), default=0) or 1
+    daily_views = [
+        {'date': date, 'profile_views': views, 'height': round(views * 100 / peak)}
+        for date, views in series
+    ]
+    return totals, daily_views
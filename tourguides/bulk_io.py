@@ -0,0 +1,651 @@
+"""
+Bulk import and export of tour guides, packages, schedules and reviews.
+
+Files are CSV or JSON Lines with one object per row. Many-to-many columns
+(languages, specialties, certifications, package locations) hold names
+separated by "|". Guides are matched on username and packages on slug;
+schedules and reviews on their id column, left empty to create a new row.
+Exports use the same columns, so an exported file imports back unchanged.
+
+Imports read and validate rows in batches. Lookup names are resolved from
+dictionaries loaded once per import, and each batch is written with
+bulk_create/bulk_update in its own transaction. A row that fails is
+reported with its line number and skipped; the rest of its batch is still
+written. Exports read a values_list() projection in chunks and can also be
+written as XLSX, so memory stays flat however many rows there are.
+"""
+
+import csv
+import json
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from totrip.slugs import slugify_text
+from totrip.xlsx import CONTENT_TYPE as XLSX_CONTENT_TYPE, stream_xlsx
+
+from .caching import purge_guide_pages
+from .durations import parse_duration_minutes
+from .models import (
+    Certification, Language, Location, Review, SlugHistory, Specialty, TourGuide, TourPackage,
+    WorkSchedule, lookup_name_key, refresh_guide_ratings, touch_tour_guides
+)
+from .relations import sync_relations
+
+BATCH_SIZE = 500
+FORMATS = ('csv', 'jsonl')
+EXPORT_FORMATS = (*FORMATS, 'xlsx')
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson', 'xlsx': XLSX_CONTENT_TYPE}
+SEPARATOR = '|'
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n', ''}
+
+
+class RowError(Exception):
+    """A row that cannot be imported; the message is shown to the user."""
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors: list = field(default_factory=list)  # (line number, message)
+
+
+def detect_format(filename, default='csv'):
+    """Pick the file format from the extension."""
+    name = filename.lower()
+    if name.endswith('.xlsx'):
+        return 'xlsx'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def read_rows(stream, fmt):
+    """
+    Yield (line number, row) from a text stream. row is None for JSON Lines
+    that do not hold an object.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+class _Echo:
+    """Pseudo-buffer for csv.writer: write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return SEPARATOR.join(value)
+    return '' if value is None else value
+
+
+def stream_export(kind, fmt, queryset=None, chunk_size=BATCH_SIZE):
+    """
+    Yield an export of queryset (default: every object of the kind), one
+    chunk per chunk_size rows: text for csv and jsonl, bytes for xlsx.
+    """
+    spec = KINDS[kind]
+    rows = spec.export_rows(queryset, chunk_size)
+    if fmt == 'xlsx':
+        yield from stream_xlsx(
+            spec.columns, ([row[column] for column in spec.columns] for row in rows),
+            sheet_name=kind, chunk_rows=chunk_size,
+        )
+        return
+
+    lines = []
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        lines.append(writer.writerow(spec.columns))
+        encode = lambda row: writer.writerow([_csv_value(row[column]) for column in spec.columns])
+    else:
+        encode = lambda row: json.dumps(row, ensure_ascii=False, default=str) + '\n'
+
+    for row in rows:
+        lines.append(encode(row))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def import_rows(kind, rows, batch_size=BATCH_SIZE, dry_run=False):
+    """Import (line number, row) pairs, see read_rows(). Returns an ImportResult."""
+    return KINDS[kind](dry_run=dry_run).run(rows, batch_size)
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else '').strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(f'"{value}" is not a yes/no value.')
+
+
+def _text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def _names(value):
+    items = value if isinstance(value, list) else _text(value).split(SEPARATOR)
+    return [name for name in (_text(item) for item in items) if name]
+
+
+def _lookup_map(model):
+    """
+    Map name keys (see lookup_name_key) to primary keys. Locations also answer to
+    "name, city", the form exports use; a name shared by several rows maps
+    to None.
+    """
+    if model is Location:
+        rows = (
+            (pk, name, f'{name}, {city}')
+            for pk, name, city in Location.objects.values_list('pk', 'name', 'city')
+        )
+    else:
+        rows = model.objects.values_list('pk', 'name')
+    mapping = {}
+    for pk, *names in rows:
+        for name in names:
+            key = lookup_name_key(name)
+            mapping[key] = pk if mapping.get(key, pk) == pk else None
+    return mapping
+
+
+def _label_expression(model, prefix=''):
+    """The name a lookup row is exported under; locations add their city."""
+    if model is Location:
+        return Concat(f'{prefix}name', Value(', '), f'{prefix}city')
+    return F(f'{prefix}name')
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _message(error):
+    if hasattr(error, 'error_dict'):
+        return '; '.join(
+            f"{name}: {' '.join(messages)}" for name, messages in error.message_dict.items()
+        )
+    return ' '.join(error.messages)
+
+
+class BulkKind:
+    """
+    Import and export of one model. Subclasses list their columns; an
+    instance holds the lookup maps for a single import.
+    """
+    model = None
+    columns = ()
+    key = 'id'
+    # Plain model fields, set from the column of the same name.
+    fields = ()
+    boolean_fields = ()
+    # Foreign keys and many-to-many fields given by name, column -> model.
+    lookups = {}
+    relations = {}
+    # Whether the model has a tour_guide foreign key, given as a username
+    # in the "guide" column.
+    has_guide = True
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        # Line of the first row for each key, so a file cannot name the
+        # same object twice.
+        self.seen = {}
+        self.maps = {
+            column: _lookup_map(model)
+            for column, model in {**self.lookups, **self.relations}.items()
+        }
+
+    # Export
+
+    @classmethod
+    def export_expression(cls, column):
+        """What values_list() selects for a column that is not many-to-many."""
+        if column == 'id':
+            return 'pk'
+        if column == 'guide':
+            return 'tour_guide__user__username'
+        if column in cls.lookups:
+            return _label_expression(cls.lookups[column], f'{column}__')
+        return column
+
+    @classmethod
+    def export_rows(cls, queryset=None, chunk_size=BATCH_SIZE):
+        """
+        Yield one dict per object. Plain columns come from a values_list()
+        projection read through iterator(), so no model instances are built;
+        many-to-many names take one query per column and chunk.
+        """
+        if queryset is None:
+            queryset = cls.model.objects.all()
+        columns = [column for column in cls.columns if column not in cls.relations]
+        values = queryset.order_by('pk').values_list(
+            'pk', *(cls.export_expression(column) for column in columns)
+        )
+        for chunk in _chunks(values.iterator(chunk_size=chunk_size), chunk_size):
+            names = {column: cls.relation_names(column, [row[0] for row in chunk]) for column in cls.relations}
+            for pk, *row in chunk:
+                row = dict(zip(columns, row))
+                for column in cls.relations:
+                    row[column] = names[column].get(pk, [])
+                yield {column: row[column] for column in cls.columns}
+
+    @classmethod
+    def relation_names(cls, column, pks):
+        """Map each of pks to the names in its many-to-many column."""
+        m2m = cls.model._meta.get_field(column)
+        through = m2m.remote_field.through
+        source, target = m2m.m2m_field_name(), m2m.m2m_reverse_field_name()
+        rows = (
+            through.objects.filter(**{f'{source}_id__in': pks})
+            .order_by('pk')
+            .values_list(f'{source}_id', _label_expression(cls.relations[column], f'{target}__'))
+        )
+        names = {}
+        for pk, name in rows:
+            names.setdefault(pk, []).append(name)
+        return names
+
+    # Import
+
+    def run(self, rows, batch_size=BATCH_SIZE):
+        result = ImportResult()
+        batch = []
+        for line, row in rows:
+            batch.append((line, row))
+            if len(batch) >= batch_size:
+                self.import_batch(batch, result)
+                batch = []
+        if batch:
+            self.import_batch(batch, result)
+        return result
+
+    def row_key(self, row):
+        """The value identifying an existing object, or None to create one."""
+        value = _text(row.get(self.key))
+        if self.key == 'id' and value and not value.isdigit():
+            raise RowError(f'id must be a number, not "{value}".')
+        return str(int(value)) if value else None
+
+    def load_batch(self, rows):
+        """
+        Fetch what the batch refers to in as few queries as possible and
+        return its existing objects keyed by row_key().
+        """
+        if self.has_guide:
+            usernames = {_text(row.get('guide')) for row in rows}
+            self.guides = dict(
+                TourGuide.objects.filter(user__username__in=usernames).values_list('user__username', 'pk')
+            )
+        return self.existing(self.batch_keys(rows))
+
+    def batch_keys(self, rows):
+        keys = set()
+        for row in rows:
+            try:
+                keys.add(self.row_key(row))
+            except RowError:
+                pass
+        keys.discard(None)
+        return keys
+
+    def existing(self, keys):
+        return {str(obj.pk): obj for obj in self.model.objects.filter(pk__in=keys)}
+
+    def import_batch(self, batch, result):
+        existing = self.load_batch([row for _, row in batch if row is not None])
+        new, changed = [], []
+        for line, row in batch:
+            try:
+                if row is None:
+                    raise RowError('Not a JSON object.')
+                key = self.row_key(row)
+                if key is not None and key in self.seen:
+                    raise RowError(f'Duplicate of line {self.seen[key]}.')
+                obj = existing.get(key) if key is not None else None
+                if obj is None and self.key == 'id' and key is not None:
+                    raise RowError(f'No {self.model._meta.verbose_name} with id {key}.')
+                is_new = obj is None
+                if is_new:
+                    obj = self.model()
+                else:
+                    before = self.snapshot(obj)
+                self.fill(obj, row)
+                relations = self.resolve_relations(row)
+                obj.full_clean(exclude=self.clean_exclude(), validate_unique=False, validate_constraints=False)
+            except RowError as e:
+                result.errors.append((line, str(e)))
+                continue
+            except ValidationError as e:
+                result.errors.append((line, _message(e)))
+                continue
+            if key is not None:
+                self.seen[key] = line
+            if is_new:
+                new.append((obj, relations))
+                continue
+            after = self.snapshot(obj)
+            obj._changed_fields = {name for name, value in after.items() if before[name] != value}
+            if obj._changed_fields or relations:
+                changed.append((obj, relations))
+            else:
+                # Re-importing an export should not rewrite every row.
+                result.unchanged += 1
+
+        if not self.dry_run and (new or changed):
+            with transaction.atomic():
+                self.write(new, changed)
+        result.created += len(new)
+        result.updated += len(changed)
+
+    def clean_exclude(self):
+        # Foreign keys are resolved from the maps; validating them would
+        # cost a query per row.
+        return [*self.lookups, *(['tour_guide'] if self.has_guide else [])]
+
+    def fill(self, obj, row):
+        if self.has_guide and ('guide' in row or obj.pk is None):
+            username = _text(row.get('guide'))
+            if not username:
+                raise RowError('guide is required.')
+            if username not in self.guides:
+                raise RowError(f'Unknown guide "{username}".')
+            if obj.tour_guide_id is not None:
+                obj._previous_guide_id = obj.tour_guide_id
+            obj.tour_guide_id = self.guides[username]
+
+        for name in self.fields:
+            if name not in row:
+                continue
+            value = row[name]
+            if name in self.boolean_fields:
+                value = _to_bool(value)
+            elif value is None or _text(value) == '':
+                model_field = self.model._meta.get_field(name)
+                if model_field.null:
+                    value = None
+                else:
+                    value = model_field.get_default() if model_field.has_default() else ''
+            elif isinstance(value, str):
+                value = value.strip()
+            setattr(obj, name, value)
+
+        for column in self.lookups:
+            if column in row or obj.pk is None:
+                pk = self.resolve(column, _text(row.get(column)))
+                if pk is None:
+                    raise RowError(f'{column} is required.')
+                setattr(obj, f'{column}_id', pk)
+
+    def resolve(self, column, name):
+        if not name:
+            return None
+        key = lookup_name_key(name)
+        model = {**self.lookups, **self.relations}[column]
+        if key not in self.maps[column]:
+            raise RowError(f'Unknown {model._meta.verbose_name} "{name}".')
+        pk = self.maps[column][key]
+        if pk is None:
+            raise RowError(f'"{name}" matches more than one {model._meta.verbose_name}.')
+        return pk
+
+    def resolve_relations(self, row):
+        """Primary keys for every many-to-many column present in the row."""
+        return {
+            column: list(dict.fromkeys(self.resolve(column, name) for name in _names(row[column])))
+            for column in self.relations if column in row
+        }
+
+    def update_fields(self):
+        """Fields an import can change."""
+        names = [*self.fields, *self.lookups]
+        if self.has_guide:
+            names.append('tour_guide')
+        return names
+
+    def snapshot(self, obj):
+        return {name: getattr(obj, self.model._meta.get_field(name).attname) for name in self.update_fields()}
+
+    def write(self, new, changed):
+        self.model.objects.bulk_create([obj for obj, _ in new])
+
+        # bulk_update() cost grows with rows times fields, so send only the
+        # rows and fields that differ.
+        updated = [obj for obj, _ in changed if obj._changed_fields]
+        fields = set().union(*(obj._changed_fields for obj in updated)) & set(self.update_fields())
+        if fields:
+            if any(f.name == 'updated_at' for f in self.model._meta.fields):
+                # bulk_update() does not run auto_now.
+                now = timezone.now()
+                for obj in updated:
+                    obj.updated_at = now
+                fields.add('updated_at')
+            self.model.objects.bulk_update(updated, sorted(fields))
+        self.write_relations(new, changed)
+
+        if self.has_guide:
+            # Bulk writes send no signals, so touch the guides here.
+            guide_ids = {obj.tour_guide_id for obj, _ in new + changed}
+            guide_ids.update(
+                obj._previous_guide_id for obj, _ in changed if hasattr(obj, '_previous_guide_id')
+            )
+            self.touch(guide_ids)
+
+    def touch(self, guide_ids):
+        touch_tour_guides(guide_ids)
+
+    def write_relations(self, new, changed):
+        """Write the many-to-many rows named in each row, inserting and deleting only the differences."""
+        for column in self.relations:
+            sync_relations(self.model._meta.get_field(column), {
+                obj.pk: relations[column] for obj, relations in new + changed if column in relations
+            })
+
+
+class GuideKind(BulkKind):
+    model = TourGuide
+    columns = (
+        'username', 'email', 'first_name', 'last_name', 'slug', 'bio', 'phone_number',
+        'years_of_experience', 'languages', 'specialties', 'certifications', 'website',
+        'twitter', 'instagram', 'facebook', 'linkedin', 'youtube', 'is_active',
+        'is_verified', 'is_featured', 'is_recommended',
+    )
+    key = 'username'
+    user_fields = ('email', 'first_name', 'last_name')
+    fields = (
+        'slug', 'bio', 'phone_number', 'years_of_experience', 'website', 'twitter',
+        'instagram', 'facebook', 'linkedin', 'youtube', 'is_active', 'is_verified',
+        'is_featured', 'is_recommended',
+    )
+    boolean_fields = ('is_active', 'is_verified', 'is_featured', 'is_recommended')
+    relations = {'languages': Language, 'specialties': Specialty, 'certifications': Certification}
+    has_guide = False
+
+    @classmethod
+    def export_expression(cls, column):
+        if column == 'username' or column in cls.user_fields:
+            return f'user__{column}'
+        return super().export_expression(column)
+
+    def row_key(self, row):
+        username = _text(row.get('username'))
+        if not username:
+            raise RowError('username is required.')
+        return username
+
+    def load_batch(self, rows):
+        usernames = self.batch_keys(rows)
+        self.users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        slugs = {_text(row.get('slug')) or slugify_text(_text(row.get('username'))) for row in rows}
+        self.slug_owners = dict(TourGuide.objects.filter(slug__in=slugs).values_list('slug', 'user__username'))
+        self.batch_slugs = {}
+        guides = TourGuide.objects.select_related('user').filter(user__username__in=usernames)
+        return {guide.user.username: guide for guide in guides}
+
+    def clean_exclude(self):
+        return ['user', 'profile_image', 'banner_image']
+
+    def snapshot(self, obj):
+        values = super().snapshot(obj)
+        values.update((f'user.{name}', getattr(obj.user, name)) for name in self.user_fields)
+        return values
+
+    def fill(self, obj, row):
+        username = self.row_key(row)
+        if obj.pk is None:
+            obj.user = self.users.get(username) or User(username=username, password=make_password(None))
+        else:
+            obj._previous_slug = obj.slug
+        user = obj.user
+        for name in self.user_fields:
+            if name in row:
+                setattr(user, name, _text(row[name]))
+        user.full_clean(exclude=['password'], validate_unique=False, validate_constraints=False)
+
+        super().fill(obj, row)
+        if not obj.slug:
+            obj.slug = slugify_text(username)
+        owner = self.slug_owners.get(obj.slug, username)
+        owner = self.batch_slugs.setdefault(obj.slug, owner)
+        if owner != username:
+            raise RowError(f'Slug "{obj.slug}" is already used by {owner}.')
+
+    def write(self, new, changed):
+        # New guides may belong to users that already exist.
+        users = [obj.user for obj, _ in new if obj.user.pk is not None]
+        User.objects.bulk_create([obj.user for obj, _ in new if obj.user.pk is None])
+        users += [
+            obj.user for obj, _ in changed
+            if any(name.startswith('user.') for name in obj._changed_fields)
+        ]
+        if users:
+            User.objects.bulk_update(users, self.user_fields)
+        super().write(new, changed)
+        # bulk_update() skips save(), which would record renames.
+        renamed = [(obj.pk, obj._previous_slug, obj.slug) for obj, _ in changed if obj._previous_slug != obj.slug]
+        if renamed:
+            SlugHistory.record(TourGuide, renamed)
+        purge_guide_pages(
+            {obj.slug for obj, _ in new + changed}
+            | {obj._previous_slug for obj, _ in changed}
+        )
+
+
+class PackageKind(BulkKind):
+    model = TourPackage
+    columns = (
+        'slug', 'guide', 'title', 'description', 'duration', 'price', 'discount_price',
+        'locations', 'included_services', 'excluded_services', 'max_people', 'is_active',
+        'is_featured',
+    )
+    key = 'slug'
+    fields = (
+        'title', 'slug', 'description', 'duration', 'price', 'discount_price',
+        'included_services', 'excluded_services', 'max_people', 'is_active', 'is_featured',
+    )
+    boolean_fields = ('is_active', 'is_featured')
+    relations = {'locations': Location}
+
+    def row_key(self, row):
+        # TourPackage.save() derives a missing slug from the title.
+        key = _text(row.get('slug')) or slugify_text(_text(row.get('title')))
+        if not key:
+            raise RowError('slug or title is required.')
+        return key
+
+    def existing(self, keys):
+        return {package.slug: package for package in TourPackage.objects.filter(slug__in=keys)}
+
+    def fill(self, obj, row):
+        super().fill(obj, row)
+        obj.slug = self.row_key(row)
+        # Bulk writes skip TourPackage.save().
+        obj.duration_minutes = parse_duration_minutes(obj.duration)
+
+    def update_fields(self):
+        return [*super().update_fields(), 'duration_minutes']
+
+
+class ScheduleKind(BulkKind):
+    model = WorkSchedule
+    columns = ('id', 'guide', 'location', 'start_date', 'end_date', 'notes', 'is_available')
+    fields = ('start_date', 'end_date', 'notes', 'is_available')
+    boolean_fields = ('is_available',)
+    lookups = {'location': Location}
+
+
+class ReviewKind(BulkKind):
+    model = Review
+    columns = ('id', 'guide', 'author_name', 'email', 'rating', 'comment', 'is_approved', 'created_at')
+    fields = ('author_name', 'email', 'rating', 'comment', 'is_approved')
+    boolean_fields = ('is_approved',)
+
+    def fill(self, obj, row):
+        super().fill(obj, row)
+        value = row.get('created_at')
+        if _text(value):
+            created_at = Review._meta.get_field('created_at').to_python(_text(value))
+            if timezone.is_naive(created_at):
+                created_at = timezone.make_aware(created_at)
+            obj.created_at = created_at
+
+    def update_fields(self):
+        return [*super().update_fields(), 'created_at']
+
+    def touch(self, guide_ids):
+        refresh_guide_ratings(guide_ids)
+
+    def write(self, new, changed):
+        created_at = [(obj, obj.created_at) for obj, _ in new if obj.created_at]
+        super().write(new, changed)
+        # bulk_create() stamps auto_now_add fields; put imported dates back.
+        for obj, value in created_at:
+            obj.created_at = value
+        Review.objects.bulk_update([obj for obj, _ in created_at], ['created_at'])
+
+
+KINDS = {
+    'guides': GuideKind,
+    'packages': PackageKind,
+    'schedules': ScheduleKind,
+    'reviews': ReviewKind,
+}
@@ -0,0 +1,49 @@
+"""
+Page cache namespaces for the public tour guide pages, and the per-guide
+dashboard statistics entries (see dashboard.py).
+
+See totrip/pagecache.py. The guide directory and every profile share the
+"guides" namespace, so lookup changes (languages, specialties, locations)
+can mark all of them stale at once.
+"""
+
+from django.core.cache import cache
+
+from totrip.pagecache import purge
+
+GUIDES_NAMESPACE = 'guides'
+GUIDES_LIST_NAMESPACE = 'guides_list'
+GUIDES_LIST_PARAMS = ('location', 'specialty', 'language', 'page')
+# The package catalogue lists packages of many guides, so it shares the
+# directory's namespaces.
+PACKAGES_PARAMS = (
+    'location', 'language', 'min_price', 'max_price', 'min_hours', 'max_hours', 'people', 'sort', 'cursor',
+)
+
+
+def guide_namespace(slug):
+    return f'guide:{slug}'
+
+
+def guide_page_namespaces(request, slug):
+    return (GUIDES_NAMESPACE, guide_namespace(slug))
+
+
+def purge_guide_pages(slugs):
+    """Mark the given guides' profiles and the guide directory stale."""
+    purge(GUIDES_LIST_NAMESPACE, *(guide_namespace(slug) for slug in slugs))
+
+
+def purge_all_guide_pages():
+    purge(GUIDES_NAMESPACE)
+
+
+def dashboard_stats_key(tour_guide_id):
+    return f'dashboard:stats:{tour_guide_id}'
+
+
+def purge_dashboard_stats(tour_guide_ids):
+    """Drop the cached dashboard statistics of the given guides."""
+    keys = [dashboard_stats_key(pk) for pk in tour_guide_ids]
+    if keys:
+        cache.delete_many(keys)
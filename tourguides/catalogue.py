@@ -0,0 +1,111 @@
+"""
+The public tour package catalogue: filters and keyset pagination.
+
+A page is the rows after the previous page's last (sort value, id), not an
+OFFSET, so a deep page costs the same as the first one and packages added
+in between never shift rows across pages. Every sort has a matching
+(is_active, value, id) index on TourPackage.
+"""
+
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+from django.db.models import Exists, OuterRef, Q
+from django.utils.dateparse import parse_datetime
+
+from .models import TourGuide, TourPackage
+
+PAGE_SIZE = 24
+# Ids and counts past the bigint range would fail in the database rather than match nothing.
+MAX_ID = 2**63 - 1
+
+# sort -> (ordering column, descending, parser for cursor values)
+SORTS = {
+    'price': ('effective_price', False, Decimal),
+    '-price': ('effective_price', True, Decimal),
+    'duration': ('duration_minutes', False, int),
+    'newest': ('created_at', True, parse_datetime),
+}
+DEFAULT_SORT = 'price'
+
+
+def encode_cursor(sort, package):
+    column = SORTS[sort][0]
+    value = getattr(package, column)
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else str(value), package.pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(sort, cursor):
+    """(value, pk) from encode_cursor(), or ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        value = SORTS[sort][2](value)
+    except (TypeError, ValueError, ArithmeticError, binascii.Error) as error:
+        raise ValueError('Invalid cursor.') from error
+    if (
+        value is None
+        or (isinstance(value, Decimal) and not value.is_finite())
+        or (isinstance(value, int) and not 0 <= value <= MAX_ID)
+        or type(pk) is not int
+        or not 1 <= pk <= MAX_ID
+    ):
+        raise ValueError('Invalid cursor.')
+    return value, pk
+
+
+def search_packages(location=None, language=None, min_price=None, max_price=None, min_hours=None,
+                    max_hours=None, people=None, sort=DEFAULT_SORT, cursor=None):
+    """
+    Active packages of active guides matching the filters, in sort order,
+    starting after cursor (a decoded (value, pk) pair). Slice it to the page
+    size plus one to know whether a next page exists.
+    """
+    packages = TourPackage.objects.filter(is_active=True, tour_guide__is_active=True)
+    if location:
+        packages = packages.filter(Exists(TourPackage.locations.through.objects.filter(
+            tourpackage_id=OuterRef('pk'), location_id=location
+        )))
+    if language:
+        packages = packages.filter(Exists(TourGuide.languages.through.objects.filter(
+            tourguide_id=OuterRef('tour_guide_id'), language_id=language
+        )))
+    if min_price is not None:
+        packages = packages.filter(effective_price__gte=min_price)
+    if max_price is not None:
+        packages = packages.filter(effective_price__lte=max_price)
+    if min_hours is not None:
+        packages = packages.filter(duration_minutes__gte=min_hours * 60)
+    if max_hours is not None:
+        packages = packages.filter(duration_minutes__lte=max_hours * 60)
+    if people:
+        packages = packages.filter(max_people__gte=people)
+
+    column, descending, _ = SORTS[sort]
+    if column == 'duration_minutes':
+        # Durations that could not be parsed have no place in this order.
+        packages = packages.filter(duration_minutes__isnull=False)
+    if cursor is not None:
+        value, pk = cursor
+        after = 'lt' if descending else 'gt'
+        packages = packages.filter(Q(**{f'{column}__{after}': value}) | Q(**{column: value, f'pk__{after}': pk}))
+    prefix = '-' if descending else ''
+    return (
+        packages.select_related('tour_guide__user')
+        .prefetch_related('locations')
+        .order_by(f'{prefix}{column}', f'{prefix}pk')
+    )
+
+
+def next_cursor(sort, rows):
+    """
+    Split a fetched slice of PAGE_SIZE + 1 rows into the page and the cursor
+    for the next one, None on the last page.
+    """
+    if len(rows) <= PAGE_SIZE:
+        return rows, None
+    page = rows[:PAGE_SIZE]
+    return page, encode_cursor(sort, page[-1])
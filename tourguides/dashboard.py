@@ -0,0 +1,73 @@
+"""
+Statistics for the tour guide dashboard.
+
+dashboard_stats() counts a guide's packages, schedules, gallery images,
+videos and pending reviews in one query of correlated subqueries on
+TourGuide, fetches the few recent rows the page lists and the 30/90-day
+analytics trends, and caches the lot per guide. Every change to those rows
+goes through touch_tour_guides(), refresh_guide_ratings() (see models.py)
+or analytics.rollup(), which drop the entry, so the timeout only bounds how
+long a write racing a recompute can go unseen.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .analytics import guide_trends
+from .caching import dashboard_stats_key
+from .models import Gallery, Review, TourGuide, TourPackage, Video, WorkSchedule
+
+RECENT_PACKAGES = 4
+RECENT_SCHEDULES = 3
+RECENT_VIDEOS = 3
+RECENT_REVIEWS = 5
+
+
+def _count(model, condition=None):
+    """Correlated subquery counting the guide's rows of model that match condition."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(tour_guide=OuterRef('pk')).order_by().values('tour_guide')
+            .annotate(total=Count('pk', filter=condition)).values('total')
+        ),
+        0,
+    )
+
+
+def compute_dashboard_stats(tour_guide_id):
+    """Build the dashboard statistics of one guide, bypassing the cache."""
+    counts = TourGuide.objects.filter(pk=tour_guide_id).values(
+        package_count=_count(TourPackage),
+        active_package_count=_count(TourPackage, Q(is_active=True)),
+        schedule_count=_count(WorkSchedule),
+        gallery_count=_count(Gallery),
+        video_count=_count(Video),
+        pending_review_count=_count(Review, Q(is_approved=False)),
+    ).get()
+    trends, daily_views = guide_trends(tour_guide_id)
+    return {
+        **counts,
+        'trends': trends,
+        'daily_views': daily_views,
+        'packages': list(
+            TourPackage.objects.filter(tour_guide_id=tour_guide_id).order_by('-created_at')[:RECENT_PACKAGES]
+        ),
+        'schedules': list(
+            WorkSchedule.objects.filter(tour_guide_id=tour_guide_id)
+            .select_related('location').order_by('start_date')[:RECENT_SCHEDULES]
+        ),
+        'videos': list(Video.objects.filter(tour_guide_id=tour_guide_id)[:RECENT_VIDEOS]),
+        'reviews': list(Review.objects.filter(tour_guide_id=tour_guide_id)[:RECENT_REVIEWS]),
+    }
+
+
+def dashboard_stats(tour_guide_id):
+    """Return the dashboard statistics of one guide, from the cache when possible."""
+    key = dashboard_stats_key(tour_guide_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_dashboard_stats(tour_guide_id)
+        cache.set(key, stats, settings.DASHBOARD_STATS_TIMEOUT)
+    return stats
@@ -0,0 +1,118 @@
+"""
+Read the free-text TourPackage.duration ("2 hours", "1 day", "ساعتان",
+"3 أيام و ليلتان") as minutes, so packages can be filtered and sorted by
+length.
+
+Units are calendar units: a day is 24 hours, so "half day" is 12 hours.
+Amounts of different units add up ("1 hour 30 minutes", "ساعة ونصف"), a
+range counts as its upper end ("2-3 hours", "2 to 3 hours"), and nights only
+count when no days are given ("3 days 2 nights" is three days). A number
+only counts when the unit follows it, so "Up to 10 people, 4 hours" is four
+hours, and text in parentheses is only read when the rest gives nothing
+("Full day (8 h)" is a day). Text with no recognisable unit gives None.
+"""
+
+import re
+from decimal import Decimal
+
+MINUTE, HOUR, DAY, WEEK = 1, 60, 24 * 60, 7 * 24 * 60
+NIGHT = 'night'
+
+# Word -> (unit, amount implied by the word alone, as in "an hour").
+UNITS = {
+    **dict.fromkeys(('min', 'mins', 'minute', 'minutes', 'دقيقة', 'دقيقه', 'دقائق'), (MINUTE, 1)),
+    **dict.fromkeys(('h', 'hr', 'hrs', 'hour', 'hours', 'ساعة', 'ساعه', 'ساعات'), (HOUR, 1)),
+    **dict.fromkeys(('day', 'days', 'يوم', 'أيام', 'ايام'), (DAY, 1)),
+    **dict.fromkeys(('wk', 'week', 'weeks', 'أسبوع', 'اسبوع', 'أسابيع', 'اسابيع'), (WEEK, 1)),
+    **dict.fromkeys(('night', 'nights', 'ليلة', 'ليله', 'ليال', 'ليالي'), (NIGHT, 1)),
+    # Arabic duals carry their own "two".
+    **dict.fromkeys(('دقيقتان', 'دقيقتين'), (MINUTE, 2)),
+    **dict.fromkeys(('ساعتان', 'ساعتين'), (HOUR, 2)),
+    **dict.fromkeys(('يومان', 'يومين'), (DAY, 2)),
+    **dict.fromkeys(('أسبوعان', 'أسبوعين', 'اسبوعان', 'اسبوعين'), (WEEK, 2)),
+    **dict.fromkeys(('ليلتان', 'ليلتين'), (NIGHT, 2)),
+}
+
+NUMBERS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'twelve': 12, 'half': Decimal('0.5'),
+    'quarter': Decimal('0.25'),
+    'واحد': 1, 'واحدة': 1, 'اثنان': 2, 'اثنين': 2, 'ثلاث': 3, 'ثلاثة': 3, 'أربع': 4, 'اربع': 4,
+    'أربعة': 4, 'اربعة': 4, 'خمس': 5, 'خمسة': 5, 'ست': 6, 'ستة': 6, 'سبع': 7, 'سبعة': 7,
+    'ثمان': 8, 'ثماني': 8, 'ثمانية': 8, 'تسع': 9, 'تسعة': 9, 'عشر': 10, 'عشرة': 10,
+    'نصف': Decimal('0.5'), 'ربع': Decimal('0.25'),
+}
+
+# Single letters ("3D tour", "5 m walk") are too ambiguous to be units, except h.
+
+# Words between two numbers that make them a range.
+RANGE_SEPARATORS = {'-', 'to', 'or', 'إلى', 'الى', 'أو', 'او'}
+
+# Words that, after a unit, add that fraction of it: "ساعة ونصف", "an hour and a half".
+FRACTIONS = {'half': Decimal('0.5'), 'نصف': Decimal('0.5'), 'quarter': Decimal('0.25'), 'ربع': Decimal('0.25')}
+
+_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹٫', '01234567890123456789.')
+_PARENTHESES = re.compile(r'\(([^()]*)\)')
+_TOKENS = re.compile(r'\d+(?:[.,]\d+)?|[^\W\d_]+|[-–—]')
+
+
+def _tokens(text):
+    for token in _TOKENS.findall(text.translate(_DIGITS).lower()):
+        if token in '–—':
+            token = '-'
+        # Arabic joins "and" to the next word: "ونصف", "و3".
+        if token.startswith('و') and token not in UNITS and token[1:] in {**UNITS, **NUMBERS}:
+            yield 'و'
+            token = token[1:]
+        # The article on a unit: "الساعة"
+        elif token.startswith('ال') and token[2:] in UNITS:
+            token = token[2:]
+        yield token
+
+
+def _parse(text):
+    totals = {}
+    amount = None
+    in_range = False
+    last_unit = None
+    for token in _tokens(text):
+        if token[0].isdigit() or (token in NUMBERS and token not in FRACTIONS) or (
+            token in FRACTIONS and last_unit is None
+        ):
+            value = Decimal(token.replace(',', '.')) if token[0].isdigit() else Decimal(NUMBERS[token])
+            # In a range keep the larger end; otherwise a new number replaces one no unit followed.
+            amount = max(amount, value) if amount is not None and in_range else value
+            in_range = False
+        elif token in UNITS:
+            unit, implied = UNITS[token]
+            totals[unit] = totals.get(unit, 0) + (amount if amount is not None else implied)
+            amount, in_range, last_unit = None, False, unit
+        elif token in FRACTIONS and amount is None:
+            # Only a trailing fraction: "نصف يوم" has the number before the unit.
+            totals[last_unit] += FRACTIONS[token]
+            last_unit = None
+        elif token in RANGE_SEPARATORS and amount is not None:
+            in_range = True
+        elif token not in ('و', 'and', 'a', 'an'):
+            # Any other word means a number before it counted something else:
+            # "10 people", "5 km".
+            amount, in_range = None, False
+
+    nights = totals.pop(NIGHT, 0)
+    if nights and DAY not in totals:
+        totals[DAY] = nights
+    if not totals:
+        return None
+    return round(sum(unit * amount for unit, amount in totals.items()))
+
+
+def parse_duration_minutes(text):
+    """Minutes described by text, or None."""
+    if not text:
+        return None
+    minutes = _parse(_PARENTHESES.sub(' ', text))
+    for aside in _PARENTHESES.findall(text) if minutes is None else ():
+        minutes = _parse(aside)
+        if minutes is not None:
+            break
+    return minutes
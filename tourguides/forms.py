@@ -4,6 +4,8 @@ from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
 
+from . import catalogue
+from .catalogue import MAX_ID
 from .models import (
     TourGuide, TourPackage, Gallery, Video, WorkSchedule,
     Language, Certification, Specialty, Location
@@ -266,4 +268,54 @@ class WorkScheduleForm(forms.ModelForm):
             'start_date': _('تاريخ البداية'),
             'end_date': _('تاريخ النهاية'),
             'notes': _('ملاحظات'),
-        } 
\ No newline at end of file
+        } 
+
+class BulkImportForm(forms.Form):
+    """
+    Upload form for the admin import views, see tourguides/bulk_io.py.
+    """
+    file = forms.FileField(help_text=_('CSV with a header row, or JSON Lines (.jsonl) with one object per line.'))
+    dry_run = forms.BooleanField(required=False, help_text=_('Validate every row without saving anything.'))
+
+
+class PackageSearchForm(forms.Form):
+    """
+    Filters for the public package catalogue, read from the query string;
+    see tourguides/catalogue.py.
+    """
+    SORT_CHOICES = [
+        ('price', _('الأقل سعراً')),
+        ('-price', _('الأعلى سعراً')),
+        ('duration', _('الأقصر مدة')),
+        ('newest', _('الأحدث')),
+    ]
+
+    location = forms.IntegerField(required=False, min_value=1, max_value=MAX_ID)
+    language = forms.IntegerField(required=False, min_value=1, max_value=MAX_ID)
+    min_price = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2)
+    max_price = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2)
+    min_hours = forms.DecimalField(required=False, min_value=0, max_digits=7, decimal_places=2)
+    max_hours = forms.DecimalField(required=False, min_value=0, max_digits=7, decimal_places=2)
+    people = forms.IntegerField(required=False, min_value=1, max_value=MAX_ID)
+    sort = forms.ChoiceField(required=False, choices=SORT_CHOICES)
+    cursor = forms.CharField(required=False, max_length=200)
+
+    def clean_sort(self):
+        return self.cleaned_data['sort'] or catalogue.DEFAULT_SORT
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cursor = cleaned_data.get('cursor')
+        if cursor and 'sort' in cleaned_data:
+            try:
+                cleaned_data['cursor'] = catalogue.decode_cursor(cleaned_data['sort'], cursor)
+            except ValueError:
+                self.add_error('cursor', _('رابط الصفحة غير صالح.'))
+        else:
+            cleaned_data['cursor'] = None
+        return cleaned_data
+
+    def filters(self):
+        """The valid filters as search_packages() arguments; invalid ones are dropped."""
+        data = getattr(self, 'cleaned_data', {})
+        return {name: data[name] for name in self.fields if data.get(name) not in (None, '')}
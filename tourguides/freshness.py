@@ -0,0 +1,96 @@
+"""
+Cheap freshness queries for the public tour guide pages.
+
+Each function returns (etag_parts, last_modified) for totrip.conditional, or
+None when there is nothing to validate against.
+"""
+
+from datetime import datetime, time
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import PackagePriceStats, Review, TourGuide, TourPackage
+
+
+def _latest(queryset, field):
+    """Correlated subquery returning the newest value of field, or NULL."""
+    return Subquery(queryset.order_by(f'-{field}').values(field)[:1])
+
+
+def _count(queryset):
+    """Correlated subquery returning the number of rows in queryset."""
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values('tour_guide').annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def _start_of_today():
+    """
+    Schedules are filtered by today's date, so a page can change at midnight
+    without any row changing.
+    """
+    return timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+
+def guide_freshness(request, slug):
+    """
+    Freshness of a guide's profile and review pages, in one query.
+
+    Gallery, video, schedule and badge changes bump TourGuide.updated_at (see
+    the receivers in models.py). Packages and reviews are checked directly
+    because admin bulk actions update them without calling save().
+    """
+    packages = TourPackage.objects.filter(tour_guide=OuterRef('pk'))
+    reviews = Review.objects.filter(tour_guide=OuterRef('pk'), is_approved=True)
+    row = (
+        TourGuide.objects.filter(slug=slug, is_active=True)
+        .annotate(
+            packages_updated=_latest(packages, 'updated_at'),
+            active_packages=_count(packages.filter(is_active=True)),
+            reviews_created=_latest(reviews, 'created_at'),
+            approved_reviews=_count(reviews),
+        )
+        .values_list(
+            'updated_at', 'packages_updated', 'active_packages',
+            'reviews_created', 'approved_reviews',
+        )
+        .first()
+    )
+    if row is None:
+        return None
+
+    today = _start_of_today()
+    timestamps = [value for value in (row[0], row[1], row[3]) if value is not None]
+    return row + (today,), max(timestamps + [today])
+
+
+def guides_list_freshness(request):
+    """
+    Freshness of the public guide directory.
+
+    Every change to a guide's packages, schedules or profile bumps its
+    TourGuide.updated_at, so two aggregates cover the whole listing. A third
+    covers the precomputed price ranges (see pricing.py).
+    """
+    guides = TourGuide.objects.filter(is_active=True).aggregate(
+        updated=Max('updated_at'), total=Count('pk')
+    )
+    reviews = Review.objects.filter(is_approved=True).aggregate(
+        created=Max('created_at'), total=Count('pk')
+    )
+    prices = PackagePriceStats.objects.aggregate(updated=Max('updated_at'), total=Count('pk'))
+    timestamps = [
+        value for value in (guides['updated'], reviews['created'], prices['updated']) if value is not None
+    ]
+    if not timestamps:
+        return None
+    parts = (
+        guides['updated'], guides['total'], reviews['created'], reviews['total'],
+        prices['updated'], prices['total'],
+    )
+    return parts, max(timestamps)
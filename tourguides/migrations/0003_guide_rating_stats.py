@@ -0,0 +1,40 @@
+# Generated by Django 5.1.15 on 2026-10-19 03:40
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_stats(apps, schema_editor):
+    TourGuide = apps.get_model('tourguides', 'TourGuide')
+    Review = apps.get_model('tourguides', 'Review')
+    approved = Review.objects.filter(tour_guide=OuterRef('pk'), is_approved=True).order_by().values('tour_guide')
+    TourGuide.objects.update(
+        review_count=Coalesce(Subquery(approved.annotate(total=Count('pk')).values('total')), 0),
+        avg_rating=Subquery(approved.annotate(average=Avg('rating')).values('average')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourguides', '0002_workschedule_is_available'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tourguide',
+            name='avg_rating',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='tourguide',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['is_approved', 'id'], name='review_moderation_idx'),
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
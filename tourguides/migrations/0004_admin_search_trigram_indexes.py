@@ -0,0 +1,63 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+from django.db.models.functions import Upper
+
+# Trigram indexes for the admin search_fields. Django compiles icontains on
+# PostgreSQL to UPPER("column"::text) LIKE UPPER('%term%'); a leading
+# wildcard can't use a btree index, but a pg_trgm GIN index on the same
+# expression can. Other databases are left alone.
+#
+# The indexes are built here rather than declared in Meta.indexes with
+# AddIndexConcurrently: auth_user belongs to another app, and SQLite would
+# try to rebuild GIN indexes whenever it remakes one of these tables.
+TRIGRAM_INDEXES = [
+    ('auth', 'User', 'username'),
+    ('auth', 'User', 'email'),
+    ('auth', 'User', 'first_name'),
+    ('auth', 'User', 'last_name'),
+    ('tourguides', 'Review', 'author_name'),
+    ('tourguides', 'Review', 'comment'),
+    ('tourguides', 'TourPackage', 'title'),
+    ('tourguides', 'TourPackage', 'description'),
+]
+
+
+def _trigram_indexes(apps):
+    for app_label, model_name, field_name in TRIGRAM_INDEXES:
+        model = apps.get_model(app_label, model_name)
+        yield model, GinIndex(
+            OpClass(Upper(field_name), name='gin_trgm_ops'),
+            name=f'{model._meta.db_table}_{field_name}_trgm',
+        )
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model, index in _trigram_indexes(apps):
+        # Concurrently keeps the tables writable while the index builds.
+        schema_editor.add_index(model, index, concurrently=True)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model, index in _trigram_indexes(apps):
+        schema_editor.remove_index(model, index, concurrently=True)
+
+
+class Migration(migrations.Migration):
+    # Indexes can't be built concurrently inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tourguides', '0003_guide_rating_stats'),
+    ]
+
+    operations = [
+        # Does nothing on databases other than PostgreSQL.
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
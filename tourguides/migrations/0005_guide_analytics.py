@@ -0,0 +1,40 @@
+# Generated by Django 5.1.15 on 2026-10-19 03:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourguides', '0004_admin_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('profile_view', 'Profile view'), ('review_submitted', 'Review submitted')], max_length=20)),
+                ('guide_slug', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GuideDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('profile_views', models.PositiveIntegerField(default=0)),
+                ('package_impressions', models.PositiveIntegerField(default=0)),
+                ('reviews_submitted', models.PositiveIntegerField(default=0)),
+                ('tour_guide', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='tourguides.tourguide')),
+            ],
+            options={
+                'verbose_name': 'Guide Daily Stats',
+                'verbose_name_plural': 'Guide Daily Stats',
+                'constraints': [models.UniqueConstraint(fields=('tour_guide', 'date'), name='guide_daily_stats_unique')],
+            },
+        ),
+    ]
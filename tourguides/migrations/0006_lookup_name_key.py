@@ -0,0 +1,58 @@
+# Generated by Django 5.1.15 on 2026-10-19 05:12
+
+from django.db import migrations, models
+
+
+def merge_duplicate_lookups(apps, schema_editor):
+    """
+    Fill name_key and fold rows that share it into the oldest one, moving
+    their guides across. The unique index is added by the next migration:
+    PostgreSQL will not alter a table with pending trigger events.
+    """
+    TourGuide = apps.get_model('tourguides', 'TourGuide')
+    for field_name in ('languages', 'certifications', 'specialties'):
+        field = TourGuide._meta.get_field(field_name)
+        model = field.related_model
+        through = field.remote_field.through
+        column = f'{model._meta.model_name}_id'
+
+        survivors, duplicates = {}, {}
+        for row in model.objects.order_by('pk'):
+            row.name = ' '.join(row.name.split())
+            row.name_key = row.name.casefold()
+            survivor = survivors.setdefault(row.name_key, row)
+            if survivor is not row:
+                duplicates[row.pk] = survivor.pk
+
+        for duplicate, survivor in duplicates.items():
+            linked = list(through.objects.filter(**{column: survivor}).values_list('tourguide_id', flat=True))
+            through.objects.filter(**{column: duplicate, 'tourguide_id__in': linked}).delete()
+            through.objects.filter(**{column: duplicate}).update(**{column: survivor})
+        model.objects.filter(pk__in=list(duplicates)).delete()
+        model.objects.bulk_update(survivors.values(), ['name', 'name_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourguides', '0005_guide_analytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certification',
+            name='name_key',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='language',
+            name='name_key',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='specialty',
+            name='name_key',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(merge_duplicate_lookups, migrations.RunPython.noop),
+    ]
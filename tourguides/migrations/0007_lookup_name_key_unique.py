@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-19 05:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourguides', '0006_lookup_name_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='certification',
+            name='name_key',
+            field=models.CharField(editable=False, max_length=255, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='language',
+            name='name_key',
+            field=models.CharField(editable=False, max_length=255, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='specialty',
+            name='name_key',
+            field=models.CharField(editable=False, max_length=255, unique=True),
+        ),
+    ]
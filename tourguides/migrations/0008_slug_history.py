@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-19 04:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('tourguides', '0007_lookup_name_key_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('slug', models.SlugField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name_plural': 'Slug history',
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'slug'), name='slug_history_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.15 on 2026-10-19 04:32
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+from tourguides.durations import parse_duration_minutes
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_duration_minutes(apps, schema_editor):
+    TourPackage = apps.get_model('tourguides', 'TourPackage')
+    batch = []
+    for package in TourPackage.objects.only('pk', 'duration').iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        package.duration_minutes = parse_duration_minutes(package.duration)
+        if package.duration_minutes is not None:
+            batch.append(package)
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            TourPackage.objects.bulk_update(batch, ['duration_minutes'])
+            batch = []
+    TourPackage.objects.bulk_update(batch, ['duration_minutes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourguides', '0008_slug_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tourpackage',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='tourpackage',
+            index=models.Index(models.F('is_active'), django.db.models.functions.comparison.Coalesce('discount_price', 'price'), models.F('id'), name='package_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tourpackage',
+            index=models.Index(fields=['is_active', 'duration_minutes', 'id'], name='package_active_duration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tourpackage',
+            index=models.Index(fields=['is_active', 'created_at', 'id'], name='package_active_created_idx'),
+        ),
+        migrations.RunPython(backfill_duration_minutes, migrations.RunPython.noop),
+    ]
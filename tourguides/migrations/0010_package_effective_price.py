@@ -0,0 +1,50 @@
+# Generated by Django 5.1.15 on 2026-10-19 04:38
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourguides', '0009_package_catalogue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackagePriceStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('package_count', models.PositiveIntegerField()),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('percentiles', models.JSONField(default=dict)),
+                ('histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Package Price Stats',
+                'verbose_name_plural': 'Package Price Stats',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='tourpackage',
+            name='package_active_price_idx',
+        ),
+        migrations.AddField(
+            model_name='tourpackage',
+            name='effective_price',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Coalesce('discount_price', 'price'), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddIndex(
+            model_name='tourpackage',
+            index=models.Index(fields=['is_active', 'effective_price', 'id'], name='package_active_price_idx'),
+        ),
+        migrations.AddField(
+            model_name='packagepricestats',
+            name='location',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_stats', to='tourguides.location'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+from tourguides.durations import parse_duration_minutes
+
+BATCH_SIZE = 1000
+
+
+def reparse_duration_minutes(apps, schema_editor):
+    """
+    The first parser read stray numbers ("Up to 10 people, 4 hours") as part
+    of the duration; rewrite the values that change.
+    """
+    TourPackage = apps.get_model('tourguides', 'TourPackage')
+    batch = []
+    for package in TourPackage.objects.only('pk', 'duration', 'duration_minutes').iterator(chunk_size=BATCH_SIZE):
+        minutes = parse_duration_minutes(package.duration)
+        if minutes != package.duration_minutes:
+            package.duration_minutes = minutes
+            batch.append(package)
+        if len(batch) >= BATCH_SIZE:
+            TourPackage.objects.bulk_update(batch, ['duration_minutes'])
+            batch = []
+    TourPackage.objects.bulk_update(batch, ['duration_minutes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourguides', '0010_package_effective_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(reparse_duration_minutes, migrations.RunPython.noop),
+    ]
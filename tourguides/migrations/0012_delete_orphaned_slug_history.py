@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def delete_orphaned_slug_history(apps, schema_editor):
+    """
+    Old slugs of deleted guides and packages were kept, still reserved but
+    redirecting nowhere. Deleting them is now done when the object goes.
+    """
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    SlugHistory = apps.get_model('tourguides', 'SlugHistory')
+    for model_name in ('tourguide', 'tourpackage'):
+        model = apps.get_model('tourguides', model_name)
+        content_type = ContentType.objects.filter(app_label='tourguides', model=model_name).first()
+        if content_type is None:
+            continue
+        SlugHistory.objects.filter(content_type=content_type).exclude(
+            object_id__in=model.objects.values('pk')
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('tourguides', '0011_reparse_duration_minutes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_orphaned_slug_history, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,93 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.db import models
 from django.contrib.auth.models import User
-from django.utils.text import slugify
+from django.contrib.contenttypes.models import ContentType
+from django.core import checks
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Avg, Count, OuterRef, Subquery
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
 from wagtail.images.models import Image as WagtailImage
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+import math
 import re
 
+from totrip.slugs import unique_slug
+
+from .caching import purge_all_guide_pages, purge_dashboard_stats, purge_guide_pages
+from .durations import parse_duration_minutes
+from .relations import relations_changed
+
+
+class SlugHistoryMixin:
+    """
+    Give the model a unique slug from slug_source_field when it has none, and
+    record the slug save() replaces in SlugHistory so old URLs redirect.
+
+    slug_source_field names the field the slug is made from, following
+    relations with "__" as in lookups ('user__username').
+    """
+    slug_source_field = None
+    slug_fallback = 'item'
+
+    @classmethod
+    def check(cls, **kwargs):
+        return [*super().check(**kwargs), *cls._check_slug_source_field()]
+
+    @classmethod
+    def _check_slug_source_field(cls):
+        if not cls.slug_source_field:
+            return [checks.Error(
+                f'{cls.__name__} does not set slug_source_field.',
+                obj=cls, id='tourguides.E001',
+            )]
+        model = cls
+        for name in cls.slug_source_field.split(LOOKUP_SEP):
+            try:
+                # Only relations have a model to look the next name up on.
+                model = model._meta.get_field(name).related_model
+            except (AttributeError, FieldDoesNotExist):
+                return [checks.Error(
+                    f"slug_source_field refers to '{cls.slug_source_field}', which is not a field of {cls.__name__}.",
+                    obj=cls, id='tourguides.E002',
+                )]
+        return []
 
-class TourGuide(models.Model):
+    def slug_source(self):
+        value = self
+        for name in self.slug_source_field.split(LOOKUP_SEP):
+            value = getattr(value, name)
+        return value
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_slug = instance.__dict__.get('slug')
+        return instance
+
+    def save(self, *args, **kwargs):
+        model = type(self)
+        if not self.slug:
+            self.slug = unique_slug(
+                model._default_manager.exclude(pk=self.pk),
+                self.slug_source(),
+                self._meta.get_field('slug').max_length,
+                self.slug_fallback,
+                # An old slug still redirects to its owner.
+                reserved=SlugHistory.for_model(model).exclude(object_id=self.pk),
+            )
+        super().save(*args, **kwargs)
+        previous, self._loaded_slug = getattr(self, '_loaded_slug', None), self.slug
+        if previous and previous != self.slug:
+            SlugHistory.record(model, [(self.pk, previous, self.slug)])
+
+
+class TourGuide(SlugHistoryMixin, models.Model):
     """
     Model representing a tour guide with extended profile information.
     """
@@ -51,6 +131,10 @@ class TourGuide(models.Model):
     is_featured = models.BooleanField(default=False)
     is_recommended = models.BooleanField(default=False)
     
+    # Approved-review statistics, kept up to date by refresh_guide_ratings()
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -60,47 +144,85 @@ class TourGuide(models.Model):
         verbose_name_plural = "Tour Guides"
         ordering = ['-created_at']
     
+    slug_source_field = 'user__username'
+    slug_fallback = 'guide'
+
     def __str__(self):
         return self.user.get_full_name() or self.user.username
-    
+
+
+def normalize_lookup_name(name):
+    """'  Arabic\tTours ' -> 'Arabic Tours': trimmed, inner whitespace collapsed."""
+    return ' '.join(name.split())
+
+
+def lookup_name_key(name):
+    """The case-insensitive key lookup names are unique on."""
+    return normalize_lookup_name(name).casefold()
+
+
+class LookupModel(models.Model):
+    """
+    A small lookup table whose names are unique ignoring case and
+    whitespace, through the indexed name_key column kept up to date by save().
+    """
+    name_key = models.CharField(max_length=255, unique=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.name
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.user.username)
+        self.name = normalize_lookup_name(self.name)
+        self.name_key = lookup_name_key(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_key'}
         super().save(*args, **kwargs)
 
+    def clean(self):
+        super().clean()
+        duplicate = type(self)._default_manager.filter(name_key=lookup_name_key(self.name)).exclude(pk=self.pk)
+        if duplicate.exists():
+            raise ValidationError({'name': f'{self._meta.verbose_name.capitalize()} "{self.name}" already exists.'})
 
-class Language(models.Model):
+    @classmethod
+    def get_or_create_by_name(cls, name, **defaults):
+        """
+        get_or_create() on the normalized name. The unique key makes it safe
+        under concurrency: a request that loses the race to create the row
+        gets the IntegrityError, which get_or_create() answers by fetching
+        the winner's row.
+        """
+        name = normalize_lookup_name(name)
+        return cls.objects.get_or_create(name_key=lookup_name_key(name), defaults={'name': name, **defaults})
+
+
+class Language(LookupModel):
     """Model for languages spoken by tour guides."""
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=10, blank=True)
-    
-    def __str__(self):
-        return self.name
 
 
-class Certification(models.Model):
+class Certification(LookupModel):
     """Model for tour guide certifications."""
     name = models.CharField(max_length=255)
     issuing_organization = models.CharField(max_length=255, blank=True)
     description = models.TextField(blank=True)
-    
-    def __str__(self):
-        return self.name
 
 
-class Specialty(models.Model):
+class Specialty(LookupModel):
     """Model for tour guide specialties."""
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     
     class Meta:
         verbose_name_plural = "Specialties"
-    
-    def __str__(self):
-        return self.name
 
 
-class TourPackage(models.Model):
+class TourPackage(SlugHistoryMixin, models.Model):
     """
     Model for tour packages offered by tour guides.
     """
@@ -109,8 +231,16 @@ class TourPackage(models.Model):
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     description = models.TextField()
     duration = models.CharField(max_length=100, help_text="E.g., '2 hours', '1 day'")
+    # Parsed from duration on save, for filtering and sorting (see durations.py)
+    duration_minutes = models.PositiveIntegerField(null=True, blank=True, editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # The price the customer pays, stored by the database so it can be indexed
+    effective_price = models.GeneratedField(
+        expression=Coalesce('discount_price', 'price'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
     locations = models.ManyToManyField('Location', related_name='packages')
     included_services = models.TextField(blank=True, help_text="What's included in the package")
     excluded_services = models.TextField(blank=True, help_text="What's not included in the package")
@@ -124,12 +254,26 @@ class TourPackage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    slug_source_field = 'title'
+    slug_fallback = 'package'
+
+    class Meta:
+        indexes = [
+            # The catalogue filters active packages on the price paid and
+            # pages through them in (value, id) order.
+            models.Index(fields=['is_active', 'effective_price', 'id'], name='package_active_price_idx'),
+            models.Index(fields=['is_active', 'duration_minutes', 'id'], name='package_active_duration_idx'),
+            models.Index(fields=['is_active', 'created_at', 'id'], name='package_active_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
-    
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.title)
+        self.duration_minutes = parse_duration_minutes(self.duration)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'duration' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'duration_minutes'}
         super().save(*args, **kwargs)
 
 
@@ -250,6 +394,10 @@ class Review(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # The moderation queue walks pending reviews in id order.
+            models.Index(fields=['is_approved', 'id'], name='review_moderation_idx'),
+        ]
     
     def __str__(self):
         return f"Review by {self.author_name} for {self.tour_guide}"
@@ -282,3 +430,307 @@ class BadgeAssignment(models.Model):
     
     def __str__(self):
         return f"{self.badge.name} for {self.tour_guide}"
+
+
+class AnalyticsEvent(models.Model):
+    """
+    Append-only buffer of raw analytics events, written in batches by
+    analytics.flush_events() and drained into GuideDailyStats by the
+    rollup_analytics command.
+    """
+    PROFILE_VIEW = 'profile_view'
+    REVIEW_SUBMITTED = 'review_submitted'
+    KIND_CHOICES = [
+        (PROFILE_VIEW, 'Profile view'),
+        (REVIEW_SUBMITTED, 'Review submitted'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Cached profile pages never load the guide, so events carry its slug.
+    guide_slug = models.CharField(max_length=100)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.kind} for {self.guide_slug}"
+
+
+class GuideDailyStats(models.Model):
+    """
+    Per-guide daily analytics counters, aggregated from AnalyticsEvent.
+    """
+    tour_guide = models.ForeignKey(TourGuide, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    profile_views = models.PositiveIntegerField(default=0)
+    package_impressions = models.PositiveIntegerField(default=0)
+    reviews_submitted = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Guide Daily Stats"
+        verbose_name_plural = "Guide Daily Stats"
+        constraints = [
+            models.UniqueConstraint(fields=['tour_guide', 'date'], name='guide_daily_stats_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.tour_guide} on {self.date}"
+
+
+class PackagePriceStats(models.Model):
+    """
+    Effective price distribution of the active packages in a location, or in
+    all locations when location is empty. Rebuilt by the refresh_price_stats
+    command (see pricing.py), so price sliders and "from" prices never read
+    the packages themselves.
+    """
+    location = models.OneToOneField(
+        Location, on_delete=models.CASCADE, null=True, blank=True, related_name='price_stats'
+    )
+    package_count = models.PositiveIntegerField()
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # {"10": "120.00", "25": ...}: the price at each percentile
+    percentiles = models.JSONField(default=dict)
+    # Package counts in equal-width bins from min_price to max_price
+    histogram = models.JSONField(default=list)
+    # Only moves when the figures change, for the directory's ETag
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Package Price Stats"
+        verbose_name_plural = "Package Price Stats"
+
+    def __str__(self):
+        return f"Prices in {self.location or 'all locations'}"
+
+    @property
+    def floor_price(self):
+        """min_price rounded down to a whole riyal, for slider bounds."""
+        return math.floor(self.min_price)
+
+    @property
+    def ceiling_price(self):
+        return math.ceil(self.max_price)
+
+    def bins(self):
+        """The histogram as dicts with start, end, count and a 0-100 height."""
+        if not self.histogram:
+            return []
+        width = (self.max_price - self.min_price) / len(self.histogram)
+        peak = max(self.histogram) or 1
+        return [
+            {
+                'start': self.min_price + width * index,
+                'end': self.min_price + width * (index + 1),
+                'count': count,
+                'height': round(count * 100 / peak),
+            }
+            for index, count in enumerate(self.histogram)
+        ]
+
+
+class SlugHistory(models.Model):
+    """
+    Slugs guides and packages used to have. Requests for an old slug are
+    redirected to the object's current one.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_id = models.PositiveBigIntegerField()
+    slug = models.SlugField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Slug history"
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'slug'], name='slug_history_unique'),
+        ]
+
+    def __str__(self):
+        return self.slug
+
+    @classmethod
+    def for_model(cls, model):
+        return cls.objects.filter(content_type=ContentType.objects.get_for_model(model))
+
+    @classmethod
+    def record(cls, model, changes):
+        """
+        Record (pk, old slug, new slug) changes. A slug that is in use again
+        stops redirecting.
+        """
+        cls.for_model(model).filter(slug__in={slug for _, *slugs in changes for slug in slugs}).delete()
+        content_type = ContentType.objects.get_for_model(model)
+        cls.objects.bulk_create([
+            cls(content_type=content_type, object_id=pk, slug=old_slug) for pk, old_slug, _ in changes
+        ])
+
+    @classmethod
+    def current_slug(cls, model, slug):
+        """The current slug of the object that used to have slug, if any."""
+        return model._default_manager.filter(
+            pk__in=cls.for_model(model).filter(slug=slug).values('object_id')
+        ).values_list('slug', flat=True).first()
+
+
+def touch_tour_guides(tour_guide_ids):
+    """
+    Bump updated_at for the given guides without calling save().
+
+    TourGuide.updated_at doubles as the freshness marker for the public
+    profile pages, so anything shown there should touch its guide. The
+    guide's cached pages and dashboard statistics are purged as well.
+    """
+    guides = TourGuide.objects.filter(pk__in=tour_guide_ids)
+    guides.update(updated_at=timezone.now())
+    _purge_guides(guides)
+
+
+def refresh_guide_ratings(tour_guide_ids):
+    """
+    Recompute review_count and avg_rating from the approved reviews of the
+    given guides in a single UPDATE, and touch them like touch_tour_guides().
+    """
+    approved = Review.objects.filter(tour_guide=OuterRef('pk'), is_approved=True).order_by().values('tour_guide')
+    guides = TourGuide.objects.filter(pk__in=tour_guide_ids)
+    guides.update(
+        review_count=Coalesce(Subquery(approved.annotate(total=Count('pk')).values('total')), 0),
+        avg_rating=Subquery(approved.annotate(average=Avg('rating')).values('average')),
+        updated_at=timezone.now(),
+    )
+    _purge_guides(guides)
+
+
+def _purge_guides(guides):
+    rows = list(guides.values_list('pk', 'slug'))
+    purge_guide_pages([slug for _, slug in rows])
+    purge_dashboard_stats([pk for pk, _ in rows])
+
+
+_pending_rating_refresh = ContextVar('pending_rating_refresh', default=None)
+
+
+@contextmanager
+def batched_rating_refresh():
+    """
+    Collect the guides touched by Review saves and deletes in the block and
+    refresh their ratings once at the end, instead of once per review.
+    """
+    tour_guide_ids = set()
+    token = _pending_rating_refresh.set(tour_guide_ids)
+    try:
+        yield tour_guide_ids
+    finally:
+        _pending_rating_refresh.reset(token)
+    if tour_guide_ids:
+        refresh_guide_ratings(tour_guide_ids)
+
+
+def set_reviews_approved(reviews, approved):
+    """
+    Approve or unapprove a queryset of reviews and refresh each affected
+    guide once. Returns the number of reviews updated.
+    """
+    # Read the guides first: the queryset may filter on is_approved.
+    tour_guide_ids = set(reviews.values_list('tour_guide_id', flat=True))
+    updated = reviews.update(is_approved=approved)
+    refresh_guide_ratings(tour_guide_ids)
+    return updated
+
+
+@receiver([post_save, post_delete], sender=Review)
+def review_changed(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    pending = _pending_rating_refresh.get()
+    if pending is not None:
+        pending.add(instance.tour_guide_id)
+    else:
+        refresh_guide_ratings([instance.tour_guide_id])
+
+
+@receiver([post_save, post_delete], sender=TourPackage)
+@receiver([post_save, post_delete], sender=WorkSchedule)
+@receiver([post_save, post_delete], sender=Gallery)
+@receiver([post_save, post_delete], sender=Video)
+@receiver([post_save, post_delete], sender=BadgeAssignment)
+def tour_guide_content_changed(sender, instance, **kwargs):
+    """
+    Touch the owning guide whenever content on its profile changes.
+    """
+    if kwargs.get('raw'):
+        return
+    touch_tour_guides([instance.tour_guide_id])
+
+
+@receiver([post_save, post_delete], sender=TourGuide)
+def tour_guide_changed(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    # Pages cached under a slug the guide just gave up would go on being served.
+    purge_guide_pages({instance.slug, getattr(instance, '_loaded_slug', None) or instance.slug})
+
+
+@receiver(post_delete, sender=TourGuide)
+@receiver(post_delete, sender=TourPackage)
+def slugged_object_deleted(sender, instance, **kwargs):
+    """Old slugs of a deleted object would redirect nowhere and stay reserved."""
+    SlugHistory.for_model(sender).filter(object_id=instance.pk).delete()
+
+
+@receiver(m2m_changed, sender=TourGuide.languages.through)
+@receiver(m2m_changed, sender=TourGuide.certifications.through)
+@receiver(m2m_changed, sender=TourGuide.specialties.through)
+def tour_guide_lookups_changed(sender, instance, action, reverse, **kwargs):
+    """
+    The admin saves M2M fields after the guide itself, so purge again once
+    the through rows have changed. The site's own forms write them through
+    relations.save_relations() instead, which sends relations_changed.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        purge_all_guide_pages()
+    else:
+        purge_guide_pages([instance.slug])
+
+
+@receiver(m2m_changed, sender=TourPackage.locations.through)
+def tour_package_locations_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        purge_all_guide_pages()
+    else:
+        touch_tour_guides([instance.tour_guide_id])
+
+
+@receiver(relations_changed, sender=TourGuide)
+def tour_guide_relations_changed(sender, instance, **kwargs):
+    touch_tour_guides([instance.pk])
+
+
+@receiver(relations_changed, sender=TourPackage)
+def tour_package_relations_changed(sender, instance, **kwargs):
+    touch_tour_guides([instance.tour_guide_id])
+
+
+@receiver(post_save, sender=Location)
+def location_changed(sender, instance, **kwargs):
+    """Dashboards show schedule locations by name."""
+    if kwargs.get('raw'):
+        return
+    purge_dashboard_stats(
+        WorkSchedule.objects.filter(location=instance)
+        .values_list('tour_guide_id', flat=True).distinct()
+    )
+
+
+@receiver([post_save, post_delete], sender=Language)
+@receiver([post_save, post_delete], sender=Certification)
+@receiver([post_save, post_delete], sender=Specialty)
+@receiver([post_save, post_delete], sender=Location)
+@receiver([post_save, post_delete], sender=Badge)
+def lookup_changed(sender, instance, **kwargs):
+    """Lookup names appear in filters and on every profile."""
+    if kwargs.get('raw'):
+        return
+    purge_all_guide_pages()
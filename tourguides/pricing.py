@@ -0,0 +1,122 @@
+"""
+Precomputed package price distributions, for the catalogue's price slider
+and the "from X SAR" labels.
+
+refresh_price_stats() reads the effective price of every active package
+once and stores the package count, price range, percentiles and a histogram
+in PackagePriceStats, for each location and for all locations together.
+Pages then read one small row instead of aggregating packages per request.
+Rows whose figures did not change are left alone, so the guide directory's
+ETag and cached pages only go stale when prices actually move. Figures can
+lag behind package edits by one run of the refresh_price_stats command.
+"""
+
+import math
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from totrip.pagecache import purge
+
+from .caching import GUIDES_LIST_NAMESPACE
+from .models import Location, PackagePriceStats, TourPackage
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 12
+FIGURES = ('package_count', 'min_price', 'max_price', 'percentiles', 'histogram')
+REFRESH_LOCK_KEY = 'pricing:refresh:lock'
+REFRESH_LOCK_TIMEOUT = 60 * 10
+
+
+def _percentile(prices, percent):
+    """Nearest-rank percentile of sorted prices, so always a real price."""
+    rank = max(math.ceil(percent * len(prices) / 100), 1)
+    return prices[rank - 1]
+
+
+def _histogram(prices, bins):
+    """Counts of sorted prices in bins equal-width bins over their range."""
+    low, high = prices[0], prices[-1]
+    counts = [0] * bins
+    if low == high:
+        counts[0] = len(prices)
+        return counts
+    width = (high - low) / bins
+    for price in prices:
+        counts[min(int((price - low) / width), bins - 1)] += 1
+    return counts
+
+
+def summarize(prices):
+    """PackagePriceStats figures for a non-empty list of prices."""
+    prices = sorted(prices)
+    return {
+        'package_count': len(prices),
+        'min_price': prices[0],
+        'max_price': prices[-1],
+        'percentiles': {str(percent): str(_percentile(prices, percent)) for percent in PERCENTILES},
+        'histogram': _histogram(prices, HISTOGRAM_BINS),
+    }
+
+
+def _prices_by_location():
+    """{location id, or None for all locations: [effective prices]}."""
+    packages = TourPackage.objects.filter(is_active=True, tour_guide__is_active=True)
+    prices = {None: list(packages.values_list('effective_price', flat=True).iterator())}
+    rows = TourPackage.locations.through.objects.filter(tourpackage__in=packages).values_list(
+        'location_id', 'tourpackage__effective_price'
+    )
+    for location_id, price in rows.iterator():
+        prices.setdefault(location_id, []).append(price)
+    return prices
+
+
+def refresh_price_stats():
+    """
+    Bring PackagePriceStats in line with the active packages and mark the
+    directory pages stale if anything changed. Returns the number of rows
+    created, updated or deleted, or None when another refresh is running.
+    """
+    if not cache.add(REFRESH_LOCK_KEY, 1, REFRESH_LOCK_TIMEOUT):
+        return None
+    try:
+        prices = _prices_by_location()
+        now = timezone.now()
+        with transaction.atomic():
+            existing = {stats.location_id: stats for stats in PackagePriceStats.objects.select_for_update()}
+            created, updated = [], []
+            for location_id, values in prices.items():
+                if not values:
+                    continue
+                figures = summarize(values)
+                stats = existing.pop(location_id, None)
+                if stats is None:
+                    created.append(PackagePriceStats(location_id=location_id, updated_at=now, **figures))
+                elif any(getattr(stats, name) != value for name, value in figures.items()):
+                    for name, value in figures.items():
+                        setattr(stats, name, value)
+                    stats.updated_at = now
+                    updated.append(stats)
+            PackagePriceStats.objects.bulk_create(created)
+            PackagePriceStats.objects.bulk_update(updated, [*FIGURES, 'updated_at'])
+            # Locations without active packages any more.
+            PackagePriceStats.objects.filter(pk__in=[stats.pk for stats in existing.values()]).delete()
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+
+    changed = len(created) + len(updated) + len(existing)
+    if changed:
+        purge(GUIDES_LIST_NAMESPACE)
+    return changed
+
+
+def price_stats(location_id=None):
+    """The stored stats of a location, or of all locations, or None."""
+    return PackagePriceStats.objects.filter(location_id=location_id).first()
+
+
+def locations_with_prices():
+    """Locations, each with from_price: the cheapest active package there, or None."""
+    return Location.objects.annotate(from_price=F('price_stats__min_price'))
@@ -0,0 +1,83 @@
+"""
+Diff-based writes for many-to-many fields.
+
+ModelForm.save_m2m() calls set() on each field, which sends m2m_changed
+once per field, and for every field in the form even when nothing changed,
+so each save purged the guide's caches several times over. Here the
+current through rows are read once per field, only the missing rows are
+inserted and only the stale ones deleted, in bulk, and a single
+relations_changed signal describes the whole save, only when something
+actually changed. Bulk writes send no m2m_changed.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+
+# Sent once per save_relations() call that changed anything, with
+# instance and changes: {field name: (added pks, removed pks)}.
+relations_changed = Signal()
+
+
+def sync_relations(field, targets):
+    """
+    Make the through rows of the many-to-many field match targets,
+    {source pk: target pks}, with one SELECT and at most one bulk DELETE and
+    one bulk INSERT. Returns {source pk: (added pks, removed pks)} for the
+    sources that changed.
+    """
+    through = field.remote_field.through
+    source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+    current = defaultdict(set)
+    rows = through.objects.filter(**{f'{source}__in': list(targets)}).values_list(source, target)
+    for source_pk, target_pk in rows:
+        current[source_pk].add(target_pk)
+
+    changes = {}
+    for source_pk, target_pks in targets.items():
+        target_pks = set(target_pks)
+        added, removed = target_pks - current[source_pk], current[source_pk] - target_pks
+        if added or removed:
+            changes[source_pk] = (added, removed)
+
+    stale = Q()
+    for source_pk, (_, removed) in changes.items():
+        if removed:
+            stale |= Q(**{source: source_pk, f'{target}__in': removed})
+    if stale:
+        through.objects.filter(stale).delete()
+    through.objects.bulk_create([
+        through(**{source: source_pk, target: target_pk})
+        for source_pk, (added, _) in changes.items()
+        for target_pk in added
+    ])
+    return changes
+
+
+def save_relations(instance, values):
+    """
+    Set the instance's many-to-many fields from values, {field name: objects
+    or pks}, and send relations_changed if any changed. Returns the changes.
+    """
+    changes = {}
+    with transaction.atomic():
+        for name, objs in values.items():
+            field = instance._meta.get_field(name)
+            target_pks = {getattr(obj, 'pk', obj) for obj in objs}
+            changed = sync_relations(field, {instance.pk: target_pks})
+            if changed:
+                changes[name] = changed[instance.pk]
+    if changes:
+        relations_changed.send(sender=type(instance), instance=instance, changes=changes)
+    return changes
+
+
+def save_form_relations(form):
+    """save_m2m() for a ModelForm saved with commit=False, through save_relations()."""
+    return save_relations(form.instance, {
+        field.name: form.cleaned_data[field.name]
+        for field in form.instance._meta.many_to_many
+        if field.name in form.cleaned_data
+    })
@@ -0,0 +1,52 @@
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponsePermanentRedirect
+from django.urls import reverse
+
+from .models import SlugHistory
+
+
+def redirect_old_slugs(model):
+    """
+    Answer GET and HEAD requests for a slug a model instance used to have
+    with a permanent redirect to the same URL under its current slug, so
+    old links keep working and the redirect itself can be cached. History
+    is only read when the view raises Http404, so current slugs cost
+    nothing extra.
+    """
+    def redirect_for(request, kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        slug = SlugHistory.current_slug(model, kwargs['slug'])
+        if slug is None:
+            return None
+        url = reverse(request.resolver_match.view_name, kwargs={**kwargs, 'slug': slug})
+        query = request.META.get('QUERY_STRING')
+        return HttpResponsePermanentRedirect(f'{url}?{query}' if query else url)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                try:
+                    return await view(request, *args, **kwargs)
+                except Http404:
+                    response = await sync_to_async(redirect_for)(request, kwargs)
+                    if response is None:
+                        raise
+                    return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except Http404:
+                response = redirect_for(request, kwargs)
+                if response is None:
+                    raise
+                return response
+        return wrapper
+    return decorator
@@ -1,3 +1,1035 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import QuerySet
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from totrip import pagecache, ratelimit
+from totrip.slugs import slugify_text, unique_slug
+
+from . import analytics, catalogue
+from .admin import ReviewAdmin
+from .bulk_io import GuideKind, import_rows, read_rows, stream_export
+from .durations import parse_duration_minutes
+from .pricing import refresh_price_stats
+from .caching import dashboard_stats_key, guide_page_namespaces, purge_guide_pages
+from .models import (
+    AnalyticsEvent, Badge, GuideDailyStats, Language, Location, PackagePriceStats, Review, SlugHistory,
+    Specialty, TourGuide, TourPackage, batched_rating_refresh, set_reviews_approved
+)
+from .relations import relations_changed, sync_relations
+
+# Pages extend base.html, which resolves {% static %} through the manifest
+# storage; tests don't run collectstatic.
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def create_guide(username='ahmed', **kwargs):
+    user = User.objects.create_user(username=username, password='secret-pass-123')
+    return TourGuide.objects.create(user=user, **kwargs)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.guide = create_guide()
+        self.profile_url = reverse('tourguides:tourguide_profile', args=[self.guide.slug])
+
+    def test_profile_sends_validators_and_304(self):
+        response = self.client.get(self.profile_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_approving_review_changes_etag(self):
+        review = Review.objects.create(
+            tour_guide=self.guide, author_name='Sara', rating=5, comment='Great'
+        )
+        etag = self.client.get(self.profile_url)['ETag']
+
+        # Admin approval is a bulk update that bypasses save().
+        Review.objects.filter(pk=review.pk).update(is_approved=True)
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_package_change_changes_etag(self):
+        etag = self.client.get(self.profile_url)['ETag']
+        TourPackage.objects.create(
+            tour_guide=self.guide, title='Old Riyadh', description='Walk',
+            duration='2 hours', price=100
+        )
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        etag = self.client.get(self.profile_url)['ETag']
+        self.client.force_login(self.guide.user)
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_reviews_and_list_pages_are_conditional(self):
+        for url in (
+            reverse('tourguides:tourguide_reviews', args=[self.guide.slug]),
+            reverse('tourguides:guides_list') + '?page=1',
+        ):
+            etag = self.client.get(url)['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+    def test_missing_guide_still_404s(self):
+        url = reverse('tourguides:tourguide_profile', args=['missing'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(STORAGES=TEST_STORAGES, PAGE_CACHE_ENABLED=True)
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Profile views in earlier tests leave events that a request could flush.
+        analytics._buffer.clear()
+        self.guide = create_guide()
+        self.profile_url = reverse('tourguides:tourguide_profile', args=[self.guide.slug])
+
+    def test_second_anonymous_request_is_served_from_cache(self):
+        self.assertEqual(self.client.get(self.profile_url)['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.profile_url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_page_answers_conditional_requests(self):
+        etag = self.client.get(self.profile_url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_authenticated_users_bypass_cache(self):
+        self.client.get(self.profile_url)
+        self.client.force_login(self.guide.user)
+        response = self.client.get(self.profile_url)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertTrue(response.context['is_owner'])
+
+    def test_query_string_is_normalized(self):
+        url = reverse('tourguides:guides_list')
+        self.client.get(url + '?page=1&language=')
+        response = self.client.get(url + '?utm_source=ad&page=1')
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        response = self.client.get(url + '?page=2')
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+
+    def test_content_change_purges_guide_pages(self):
+        self.client.get(self.profile_url)
+        self.client.get(reverse('tourguides:guides_list'))
+        TourPackage.objects.create(
+            tour_guide=self.guide, title='Old Riyadh', description='Walk',
+            duration='2 hours', price=100
+        )
+        response = self.client.get(self.profile_url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Old Riyadh')
+        response = self.client.get(reverse('tourguides:guides_list'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+
+    def test_stale_page_is_served_while_another_request_revalidates(self):
+        self.client.get(self.profile_url)
+        purge_guide_pages([self.guide.slug])
+        # Another worker holds the revalidation lock for this page.
+        request = RequestFactory().get(self.profile_url)
+        key = pagecache._page_key(request, guide_page_namespaces(request, self.guide.slug), None)
+        cache.add(f'{key}:lock', 1)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.profile_url)
+        self.assertEqual(response['X-Page-Cache'], 'stale')
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AnonymousSessionTests(TestCase):
+    def test_flash_messages_do_not_create_sessions(self):
+        guide = create_guide()
+        response = self.client.post(
+            reverse('tourguides:add_review', args=[guide.slug]),
+            {'author_name': 'Mona', 'rating': 5, 'comment': 'Nice'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.cookies['messages'].value)
+        self.assertNotIn('sessionid', response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AsgiPublicViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guide = create_guide()
+        TourPackage.objects.create(
+            tour_guide=self.guide, title='Old Riyadh', description='Walk',
+            duration='2 hours', price=100
+        )
+
+    async def test_public_pages_render_under_asgi(self):
+        for name in ('tourguide_profile', 'tourguide_reviews', 'similar_guides'):
+            response = await self.async_client.get(reverse(f'tourguides:{name}', args=[self.guide.slug]))
+            self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(reverse('tourguides:guides_list'))
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+    async def test_conditional_get_and_page_cache_under_asgi(self):
+        url = reverse('tourguides:tourguide_profile', args=[self.guide.slug])
+        with self.settings(PAGE_CACHE_ENABLED=True):
+            response = await self.async_client.get(url)
+            self.assertContains(response, 'Old Riyadh')
+            self.assertEqual(response['X-Page-Cache'], 'miss')
+            response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['X-Page-Cache'], 'hit')
+
+    async def test_missing_guide_404s_under_asgi(self):
+        response = await self.async_client.get(reverse('tourguides:tourguide_profile', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+
+def import_text(kind, text, fmt='csv', **kwargs):
+    return import_rows(kind, read_rows(io.StringIO(text), fmt), **kwargs)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class BulkDataTests(TestCase):
+    def setUp(self):
+        self.arabic = Language.objects.create(name='Arabic')
+        self.english = Language.objects.create(name='English')
+        self.riyadh = Location.objects.create(name='Diriyah', city='Riyadh')
+
+    def test_guides_round_trip(self):
+        guide = create_guide(bio='Old bio')
+        guide.languages.set([self.arabic])
+        exported = ''.join(stream_export('guides', 'csv'))
+        self.assertIn('ahmed', exported)
+        self.assertIn('Arabic', exported)
+
+        edited = exported.replace('Old bio', 'New bio').replace('Arabic', 'Arabic|English')
+        result = import_text('guides', edited)
+        self.assertEqual((result.created, result.updated, result.errors), (0, 1, []))
+        guide.refresh_from_db()
+        self.assertEqual(guide.bio, 'New bio')
+        self.assertEqual(set(guide.languages.all()), {self.arabic, self.english})
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        text = (
+            'username,email,years_of_experience,languages\n'
+            'sara,sara@example.com,4,Arabic|english\n'
+            'omar,not-an-email,2,\n'
+            'laila,,3,Klingon\n'
+            'sara,,1,\n'
+        )
+        result = import_text('guides', text, batch_size=2)
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [3, 4, 5])
+        self.assertIn('email', result.errors[0][1])
+        self.assertIn('Klingon', result.errors[1][1])
+
+        sara = TourGuide.objects.get(user__username='sara')
+        self.assertEqual(sara.slug, 'sara')
+        self.assertEqual(sara.years_of_experience, 4)
+        self.assertEqual(set(sara.languages.all()), {self.arabic, self.english})
+        self.assertFalse(sara.user.has_usable_password())
+
+    def test_packages_resolve_guides_and_locations(self):
+        guide = create_guide()
+        rows = [
+            {'guide': 'ahmed', 'title': 'Old Town Walk', 'description': 'A walk', 'duration': '2 hours',
+             'price': '150.00', 'locations': ['Diriyah, Riyadh']},
+            {'guide': 'nobody', 'title': 'Desert Trip', 'description': 'Sand', 'duration': '1 day', 'price': '10'},
+            {'guide': 'ahmed', 'title': 'Free Tour', 'description': 'Free', 'duration': '1 day', 'price': 'free'},
+        ]
+        text = ''.join(json.dumps(row) + '\n' for row in rows)
+        result = import_text('packages', text, fmt='jsonl')
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [2, 3])
+
+        package = TourPackage.objects.get(slug='old-town-walk')
+        self.assertEqual(package.tour_guide, guide)
+        self.assertEqual(list(package.locations.all()), [self.riyadh])
+
+        exported = ''.join(stream_export('packages', 'jsonl'))
+        self.assertEqual(json.loads(exported)['locations'], ['Diriyah, Riyadh'])
+
+    def test_reviews_keep_created_at_and_update_by_id(self):
+        create_guide()
+        text = (
+            'id,guide,author_name,rating,comment,created_at\n'
+            ',ahmed,Mona,5,Great,2023-04-01 10:00:00\n'
+            ',ahmed,Ali,9,Too good,\n'
+        )
+        result = import_text('reviews', text)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors[0][0], 3)
+        review = Review.objects.get()
+        self.assertEqual(review.created_at.year, 2023)
+
+        result = import_text('reviews', f'id,is_approved\n{review.pk},yes\n999,yes\n')
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(result.errors, [(3, 'No review with id 999.')])
+        review.refresh_from_db()
+        self.assertTrue(review.is_approved)
+        self.assertEqual(review.created_at.year, 2023)
+
+        result = import_text('reviews', ''.join(stream_export('reviews', 'csv')))
+        self.assertEqual((result.updated, result.unchanged), (0, 1))
+
+    def test_dry_run_writes_nothing(self):
+        result = import_text('guides', 'username\nsara\n', dry_run=True)
+        self.assertEqual(result.created, 1)
+        self.assertFalse(User.objects.filter(username='sara').exists())
+
+    def test_command_round_trip(self):
+        create_guide()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'guides.jsonl')
+            call_command('bulk_data', 'export', 'guides', path, stdout=io.StringIO())
+            TourGuide.objects.all().delete()
+            call_command('bulk_data', 'import', 'guides', path, stdout=io.StringIO())
+            self.assertTrue(TourGuide.objects.filter(user__username='ahmed').exists())
+
+            with open(path, 'a') as f:
+                f.write('{"username": ""}\n')
+            with self.assertRaisesMessage(CommandError, '1 rows failed'):
+                call_command('bulk_data', 'import', 'guides', path, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_admin_export_and_import(self):
+        create_guide()
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+        self.client.force_login(admin)
+
+        response = self.client.post(reverse('admin:tourguides_tourguide_changelist'), {
+            'action': 'export_csv', '_selected_action': TourGuide.objects.values_list('pk', flat=True),
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn('ahmed', b''.join(response.streaming_content).decode())
+
+        upload = SimpleUploadedFile('guides.csv', b'username,languages\nsara,Arabic\n')
+        response = self.client.post(reverse('admin:tourguides_tourguide_import'), {'file': upload})
+        self.assertRedirects(response, reverse('admin:tourguides_tourguide_changelist'))
+        self.assertTrue(TourGuide.objects.filter(user__username='sara', languages=self.arabic).exists())
+
+    def test_export_queries_are_per_chunk(self):
+        for username in ('a', 'b', 'c', 'd'):
+            create_guide(username).languages.set([self.arabic, self.english])
+        # One projection query, then one per many-to-many column and chunk.
+        with self.assertNumQueries(1 + 3 * 2):
+            rows = list(GuideKind.export_rows(chunk_size=2))
+        self.assertEqual([row['username'] for row in rows], ['a', 'b', 'c', 'd'])
+        self.assertEqual(rows[0]['languages'], ['Arabic', 'English'])
+
+    def test_admin_streams_reviews_as_xlsx(self):
+        guide = create_guide()
+        Review.objects.create(tour_guide=guide, author_name='Mona', rating=5, comment='<Great> & clear')
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+        self.client.force_login(admin)
+
+        response = self.client.post(reverse('admin:tourguides_review_changelist'), {
+            'action': 'export_xlsx', '_selected_action': Review.objects.values_list('pk', flat=True),
+        })
+        self.assertTrue(response.streaming)
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        header, row = list(workbook.active.values)
+        self.assertEqual(header[:5], ('id', 'guide', 'author_name', 'email', 'rating'))
+        self.assertEqual(row[1:7], ('ahmed', 'Mona', None, 5, '<Great> & clear', False))
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ReviewModerationTests(TestCase):
+    def setUp(self):
+        self.guide = create_guide()
+        self.other = create_guide('sara')
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+
+    def add_review(self, guide, rating, approved=False):
+        return Review.objects.create(
+            tour_guide=guide, author_name='Mona', rating=rating, comment='Nice', is_approved=approved,
+        )
+
+    def test_saving_reviews_refreshes_stats(self):
+        self.add_review(self.guide, 5, approved=True)
+        review = self.add_review(self.guide, 2, approved=True)
+        self.add_review(self.guide, 1)
+        self.guide.refresh_from_db()
+        self.assertEqual((self.guide.review_count, float(self.guide.avg_rating)), (2, 3.5))
+
+        review.delete()
+        self.guide.refresh_from_db()
+        self.assertEqual((self.guide.review_count, float(self.guide.avg_rating)), (1, 5.0))
+
+    def test_bulk_approval_refreshes_each_guide_once(self):
+        for rating in (4, 5, 3):
+            self.add_review(self.guide, rating)
+            self.add_review(self.other, rating)
+        pending = Review.objects.filter(is_approved=False)
+        # Guide ids, the approval, one stats UPDATE and the slugs to purge.
+        with self.assertNumQueries(4):
+            self.assertEqual(set_reviews_approved(pending, True), 6)
+        self.guide.refresh_from_db()
+        self.assertEqual((self.guide.review_count, float(self.guide.avg_rating)), (3, 4.0))
+
+        with batched_rating_refresh():
+            Review.objects.filter(tour_guide=self.other).delete()
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.review_count, self.other.avg_rating), (0, None))
+
+    def test_guides_list_and_similar_guides_use_stored_rating(self):
+        self.add_review(self.other, 5, approved=True)
+        response = self.client.get(reverse('tourguides:guides_list'))
+        self.assertEqual([guide.pk for guide in response.context['page_obj']], [self.other.pk, self.guide.pk])
+
+    def test_moderation_queue_pages_by_id_and_approves(self):
+        approved = self.add_review(self.guide, 5, approved=True)
+        pending = [self.add_review(self.guide, 4) for _ in range(3)]
+        self.client.force_login(self.admin)
+        url = reverse('admin:tourguides_review_moderation')
+
+        with mock.patch.object(ReviewAdmin, 'moderation_page_size', 2):
+            response = self.client.get(url)
+            self.assertEqual(response.context['pending_count'], 3)
+            self.assertEqual(response.context['reviews'], pending[:2])
+            self.assertEqual(response.context['next_after'], pending[1].pk)
+            response = self.client.get(url, {'after': pending[1].pk})
+            self.assertEqual(response.context['reviews'], pending[2:])
+            self.assertIsNone(response.context['next_after'])
+
+        response = self.client.post(url, {'action': 'approve', 'review': [pending[0].pk, pending[1].pk]})
+        self.assertEqual(response.status_code, 302)
+        self.guide.refresh_from_db()
+        self.assertEqual(self.guide.review_count, 3)
+
+        # Only pending reviews can be deleted from the queue.
+        self.client.post(url, {'action': 'delete', 'review': [pending[2].pk, approved.pk]})
+        self.assertEqual(
+            set(Review.objects.values_list('pk', flat=True)), {approved.pk, pending[0].pk, pending[1].pk}
+        )
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        analytics._buffer.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123'))
+        self.location = Location.objects.create(name='Diriyah', city='Riyadh')
+        self.badge = Badge.objects.create(name='Top guide')
+
+    def add_rows(self, start, count):
+        for number in range(start, start + count):
+            guide = create_guide(f'guide{number}')
+            TourPackage.objects.create(
+                tour_guide=guide, title=f'Tour {number}', description='Walk', duration='2 hours', price=10,
+            )
+            guide.schedules.create(location=self.location, start_date='2030-01-01', end_date='2030-01-02')
+            Review.objects.create(tour_guide=guide, author_name='Mona', rating=5, comment='Nice')
+            # assigned_by is nullable, so the admin's automatic select_related() skips it.
+            guide.badges.create(badge=self.badge, assigned_by=guide.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        urls = [
+            reverse(f'admin:tourguides_{model}_changelist')
+            for model in ('tourguide', 'tourpackage', 'workschedule', 'review', 'badgeassignment')
+        ]
+        self.add_rows(0, 2)
+        before = [self.count_queries(url) for url in urls]
+        self.add_rows(2, 4)
+        self.assertEqual([self.count_queries(url) for url in urls], before)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class GuideDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        analytics._buffer.clear()
+        self.guide = create_guide()
+        self.location = Location.objects.create(name='Diriyah', city='Riyadh')
+        self.client.force_login(self.guide.user)
+        self.url = reverse('tourguides:tourguide_dashboard')
+        for number in range(6):
+            TourPackage.objects.create(
+                tour_guide=self.guide, title=f'Tour {number}', description='Walk', duration='2 hours',
+                price=10, is_active=number % 2 == 0,
+            )
+            self.guide.schedules.create(location=self.location, start_date='2030-01-01', end_date='2030-01-02')
+            Review.objects.create(
+                tour_guide=self.guide, author_name='Mona', rating=4, comment='Nice', is_approved=number < 4,
+            )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_counters(self):
+        response, _ = self.count_queries()
+        context = response.context
+        self.assertEqual(
+            [context[name] for name in (
+                'package_count', 'active_package_count', 'schedule_count', 'gallery_count',
+                'video_count', 'pending_review_count',
+            )],
+            [6, 3, 6, 0, 0, 2],
+        )
+        self.assertEqual(len(context['packages']), 4)
+        self.assertEqual(len(context['reviews']), 5)
+        self.assertEqual(context['tour_guide'].review_count, 4)
+
+    def test_cached_dashboard_queries(self):
+        _, cold = self.count_queries()
+        # Session, user and the guide row.
+        _, warm = self.count_queries()
+        self.assertEqual(warm, 3)
+        self.assertLess(warm, cold)
+
+    def test_owned_changes_invalidate(self):
+        self.count_queries()
+        package = TourPackage.objects.filter(tour_guide=self.guide).first()
+        package.delete()
+        self.assertIsNone(cache.get(dashboard_stats_key(self.guide.pk)))
+        response, _ = self.count_queries()
+        self.assertEqual(response.context['package_count'], 5)
+
+        set_reviews_approved(Review.objects.filter(tour_guide=self.guide), True)
+        response, _ = self.count_queries()
+        self.assertEqual(response.context['pending_review_count'], 0)
+
+        self.location.name = 'Al Ula'
+        self.location.save()
+        response, _ = self.count_queries()
+        self.assertEqual(response.context['schedules'][0].location.name, 'Al Ula')
+
+
+@override_settings(STORAGES=TEST_STORAGES, PAGE_CACHE_ENABLED=True, ANALYTICS_BUFFER_SIZE=3)
+class GuideAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        analytics._buffer.clear()
+        self.guide = create_guide()
+        for number in range(2):
+            TourPackage.objects.create(
+                tour_guide=self.guide, title=f'Tour {number}', description='Walk', duration='2 hours', price=10,
+            )
+        self.url = reverse('tourguides:tourguide_profile', args=[self.guide.slug])
+
+    def test_views_are_buffered_and_flushed_in_batches(self):
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'hit')
+        self.client.get(reverse('tourguides:tourguide_profile', args=['nobody']))
+        self.assertFalse(AnalyticsEvent.objects.exists())
+
+        # Cached responses count too; the third view fills the buffer.
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        self.assertEqual(AnalyticsEvent.objects.filter(kind=AnalyticsEvent.PROFILE_VIEW).count(), 3)
+
+    def test_rollup_into_daily_counters_and_dashboard(self):
+        for _ in range(3):
+            self.client.get(self.url)
+        self.client.post(
+            reverse('tourguides:add_review', args=[self.guide.slug]),
+            {'author_name': 'Mona', 'rating': 5, 'comment': 'Nice'},
+        )
+        analytics.flush_events()
+        self.assertEqual(analytics.rollup(), 4)
+        self.assertFalse(AnalyticsEvent.objects.exists())
+
+        self.client.get(self.url)
+        analytics.flush_events()
+        call_command('rollup_analytics', stdout=io.StringIO())
+        stats = GuideDailyStats.objects.get()
+        self.assertEqual(
+            (stats.profile_views, stats.package_impressions, stats.reviews_submitted), (4, 8, 1)
+        )
+
+        self.client.force_login(self.guide.user)
+        response = self.client.get(reverse('tourguides:tourguide_dashboard'))
+        self.assertEqual(
+            [(period['days'], period['profile_views']) for period in response.context['trends']], [(30, 4), (90, 4)]
+        )
+        self.assertEqual(len(response.context['daily_views']), 30)
+        self.assertEqual(response.context['daily_views'][-1]['height'], 100)
+
+    def test_rollup_follows_renames_and_adds_to_existing_counters(self):
+        analytics.record_event(AnalyticsEvent.PROFILE_VIEW, self.guide.slug)
+        analytics.flush_events()
+        self.guide.slug = 'ahmed-riyadh'
+        self.guide.save()
+        # A row another rollup created for the same day is added to.
+        GuideDailyStats.objects.create(tour_guide=self.guide, date=timezone.localdate(), profile_views=2)
+
+        self.assertEqual(analytics.rollup(), 1)
+        stats = GuideDailyStats.objects.get()
+        self.assertEqual((stats.profile_views, stats.package_impressions), (3, 2))
+
+
+@override_settings(RATE_LIMITS={'review': {'ip': '2/h'}, 'lookup': {'user': '1/h', 'ip': '10/h'}})
+class AbuseThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guide = create_guide()
+
+    def test_reviews_are_limited_per_address(self):
+        url = reverse('tourguides:add_review', args=[self.guide.slug])
+        data = {'author_name': 'Mona', 'rating': 5, 'comment': 'Nice'}
+        with self.assertLogs('totrip.ratelimit', 'WARNING') as logs:
+            responses = [self.client.post(url, data) for _ in range(3)]
+        self.assertIn('Throttled review request from 127.0.0.1', logs.output[0])
+        # Refused like the view's other errors: back to the profile with a message.
+        for response in responses:
+            self.assertRedirects(
+                response, reverse('tourguides:tourguide_profile', args=[self.guide.slug]), fetch_redirect_response=False
+            )
+        self.assertEqual(Review.objects.count(), 2)
+        self.assertEqual(
+            [str(message) for message in get_messages(responses[-1].wsgi_request)][-1], ratelimit.TOO_MANY_REQUESTS
+        )
+
+    def test_lookup_endpoints_are_limited_per_user(self):
+        url = reverse('tourguides:add_language')
+        self.client.force_login(self.guide.user)
+        response = self.client.post(url, {'name': 'Urdu'}, content_type='application/json')
+        self.assertTrue(response.json()['success'])
+        # The three lookup endpoints share one bucket.
+        with self.assertLogs('totrip.ratelimit', 'WARNING'):
+            response = self.client.post(
+                reverse('tourguides:add_specialty'), {'name': 'Hiking'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(Language.objects.filter(name='Tagalog').exists())
+
+        other = create_guide('sara')
+        self.client.force_login(other.user)
+        response = self.client.post(url, {'name': 'Tagalog'}, content_type='application/json')
+        self.assertTrue(response.json()['success'])
+
+    def test_lookup_endpoints_require_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.guide.user)
+        response = client.post(reverse('tourguides:add_language'), {'name': 'Urdu'}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+class LookupTableTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guide = create_guide()
+        self.client.force_login(self.guide.user)
+
+    def test_endpoints_reuse_case_and_whitespace_variants(self):
+        url = reverse('tourguides:add_specialty')
+        first = self.client.post(url, {'name': 'Desert  Safari'}, content_type='application/json').json()
+        second = self.client.post(url, {'name': ' desert safari '}, content_type='application/json').json()
+        self.assertEqual((first['name'], first['created']), ('Desert Safari', True))
+        self.assertEqual((second['id'], second['name'], second['created']), (first['id'], 'Desert Safari', False))
+        self.assertEqual(Specialty.objects.count(), 1)
+
+    def test_name_key_is_unique(self):
+        Language.objects.create(name='Arabic', code='ar')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Language.objects.create(name='ARABIC')
+        with self.assertRaises(ValidationError):
+            Language(name='arabic ').full_clean()
+        Language.objects.get(name='Arabic').full_clean()
+
+    def test_get_or_create_by_name_recovers_from_a_lost_race(self):
+        language = Language.objects.create(name='Arabic', code='ar')
+        # The first lookup misses, as if another request created the row just after it.
+        real_get = QuerySet.get
+        misses = [Language.DoesNotExist]
+
+        def get(queryset, *args, **kwargs):
+            if misses:
+                raise misses.pop()
+            return real_get(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'get', get):
+            found, created = Language.get_or_create_by_name('arabic')
+        self.assertFalse(misses)
+        self.assertEqual((found, created), (language, False))
+        self.assertEqual(Language.objects.count(), 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class RelationWriteTests(TestCase):
+    def setUp(self):
+        self.guide = create_guide()
+        self.arabic = Language.objects.create(name='Arabic')
+        self.english = Language.objects.create(name='English')
+        self.guide.languages.set([self.arabic])
+        self.client.force_login(self.guide.user)
+        self.events = []
+        relations_changed.connect(self.record, sender=TourGuide)
+        self.addCleanup(relations_changed.disconnect, self.record, sender=TourGuide)
+
+    def record(self, sender, instance, changes, **kwargs):
+        self.events.append(changes)
+
+    def edit_profile(self, languages):
+        response = self.client.post(reverse('tourguides:tourguide_edit_profile'), {
+            'bio': 'Guide', 'years_of_experience': 3, 'languages': [language.pk for language in languages],
+        })
+        self.assertEqual(response.status_code, 302)
+
+    def through_writes(self, queries):
+        return [
+            query['sql'] for query in queries
+            if 'tourguide_languages' in query['sql'] and not query['sql'].startswith('SELECT')
+        ]
+
+    def test_unchanged_relations_are_not_rewritten(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.edit_profile([self.arabic])
+        self.assertEqual(self.through_writes(queries), [])
+        self.assertEqual(self.events, [])
+
+    def test_changes_are_written_and_announced_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.edit_profile([self.english])
+        self.assertEqual(len(self.through_writes(queries)), 2)
+        self.assertEqual(self.events, [{'languages': ({self.english.pk}, {self.arabic.pk})}])
+        self.assertQuerySetEqual(self.guide.languages.all(), [self.english])
+
+    def test_package_locations_are_diffed(self):
+        diriyah = Location.objects.create(name='Diriyah', city='Riyadh')
+        package = TourPackage.objects.create(
+            tour_guide=self.guide, title='Old town', description='Walk', duration='2 hours', price=10,
+        )
+        self.client.post(reverse('tourguides:update_package', args=[package.slug]), {
+            'title': 'Old town', 'description': 'Walk', 'duration': '2 hours', 'price': 10,
+            'max_people': 4, 'locations': [diriyah.pk],
+        })
+        self.assertQuerySetEqual(package.locations.all(), [diriyah])
+
+    def test_sync_relations_batches_many_sources(self):
+        other = create_guide('sara')
+        field = TourGuide._meta.get_field('languages')
+        # Read, then one INSERT; nothing to delete.
+        with self.assertNumQueries(2):
+            changes = sync_relations(field, {
+                self.guide.pk: [self.arabic.pk, self.english.pk], other.pk: [self.english.pk],
+            })
+        self.assertEqual(changes, {self.guide.pk: ({self.english.pk}, set()), other.pk: ({self.english.pk}, set())})
+        with self.assertNumQueries(2):
+            changes = sync_relations(field, {self.guide.pk: [], other.pk: [self.english.pk]})
+        self.assertEqual(changes, {self.guide.pk: (set(), {self.arabic.pk, self.english.pk})})
+
+
+@override_settings(STORAGES=TEST_STORAGES, PAGE_CACHE_ENABLED=True)
+class SlugTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(analytics._buffer.clear)
+        self.guide = create_guide()
+
+    def create_package(self, title, **kwargs):
+        return TourPackage.objects.create(
+            tour_guide=self.guide, title=title, description='Walk', duration='2 hours', price=10, **kwargs
+        )
+
+    def test_arabic_titles_are_transliterated(self):
+        self.assertEqual(slugify_text('رحلة ٣ أيام'), 'rhla-3-ayam')
+        first = self.create_package('جولة في الدرعية')
+        second = self.create_package('جولة في الدرعية')
+        self.assertEqual((first.slug, second.slug), ('jwla-fy-aldraya', 'jwla-fy-aldraya-2'))
+        self.assertEqual(self.create_package('!!!').slug, 'package')
+
+    def test_free_slug_is_found_with_one_query(self):
+        for slug in ('tour', 'tour-2', 'tour-3', 'tour-guide'):
+            self.create_package('Tour', slug=slug)
+        with self.assertNumQueries(1):
+            self.assertEqual(unique_slug(TourPackage.objects.all(), 'Tour', 255, 'package'), 'tour-4')
+        # The suffix never pushes the slug past max_length.
+        self.assertEqual(unique_slug(TourPackage.objects.all(), 'Tour', 5, 'package'), 'tou')
+
+    def test_old_guide_slugs_redirect(self):
+        self.guide.slug = 'ahmed-riyadh'
+        self.guide.save()
+        self.assertEqual(SlugHistory.current_slug(TourGuide, 'ahmed'), 'ahmed-riyadh')
+
+        response = self.client.get(reverse('tourguides:tourguide_profile', args=['ahmed']))
+        self.assertRedirects(
+            response, reverse('tourguides:tourguide_profile', args=['ahmed-riyadh']), status_code=301
+        )
+        response = self.client.get(reverse('tourguides:tourguide_reviews', args=['ahmed']) + '?page=2')
+        self.assertEqual(response['Location'], reverse('tourguides:tourguide_reviews', args=['ahmed-riyadh']) + '?page=2')
+        self.assertEqual(self.client.get(reverse('tourguides:tourguide_profile', args=['nobody'])).status_code, 404)
+
+        # A new guide can't take the old slug, and a slug back in use stops redirecting.
+        self.assertEqual(create_guide('Ahmed').slug, 'ahmed-2')
+        self.guide.slug = 'ahmed'
+        self.guide.save()
+        self.assertEqual(SlugHistory.objects.get().slug, 'ahmed-riyadh')
+        self.assertEqual(self.client.get(reverse('tourguides:tourguide_profile', args=['ahmed'])).status_code, 200)
+
+    def test_deleting_an_object_frees_its_old_slugs(self):
+        package = self.create_package('Old Riyadh')
+        package.slug = 'diriyah'
+        package.save()
+        self.guide.slug = 'ahmed-riyadh'
+        self.guide.save()
+        self.assertEqual(SlugHistory.objects.count(), 2)
+
+        package.delete()
+        self.assertEqual(self.create_package('Old Riyadh').slug, 'old-riyadh')
+        self.guide.user.delete()
+        self.assertFalse(SlugHistory.objects.exists())
+        self.assertEqual(create_guide('ahmed').slug, 'ahmed')
+
+    def test_slug_source_field_is_checked(self):
+        self.assertEqual(TourGuide.check(), [])
+        with mock.patch.object(TourPackage, 'slug_source_field', None):
+            self.assertEqual([error.id for error in TourPackage.check()], ['tourguides.E001'])
+        for path in ('name', 'title__name', 'tour_guide__user__nickname'):
+            with mock.patch.object(TourPackage, 'slug_source_field', path):
+                self.assertEqual([error.id for error in TourPackage.check()], ['tourguides.E002'])
+
+    def test_renaming_a_guide_purges_pages_under_the_old_slug(self):
+        url = reverse('tourguides:tourguide_profile', args=['ahmed'])
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+        guide = TourGuide.objects.get()
+        guide.slug = 'ahmed-riyadh'
+        guide.save()
+        self.assertEqual(self.client.get(url).status_code, 301)
+
+    def test_old_package_slugs_redirect(self):
+        package = self.create_package('Old town')
+        package.slug = 'old-town-walk'
+        package.save()
+        self.client.force_login(self.guide.user)
+        response = self.client.get(reverse('tourguides:update_package', args=['old-town']))
+        self.assertRedirects(response, reverse('tourguides:update_package', args=['old-town-walk']), status_code=301)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class PackageCatalogueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(analytics._buffer.clear)
+        self.guide = create_guide()
+        self.arabic = Language.objects.create(name='Arabic')
+        self.guide.languages.set([self.arabic])
+        self.diriyah = Location.objects.create(name='Diriyah', city='Riyadh')
+        self.url = reverse('tourguides:packages_api')
+
+    def create_package(self, title, price, duration='2 hours', guide=None, **kwargs):
+        return TourPackage.objects.create(
+            tour_guide=guide or self.guide, title=title, description='Walk', duration=duration, price=price, **kwargs
+        )
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def titles(self, **params):
+        return [package['title'] for package in self.search(**params)['results']]
+
+    def test_durations_are_parsed_in_english_and_arabic(self):
+        cases = {
+            '2 hours': 120, '1h 30min': 90, 'an hour and a half': 90, '2-3 hours': 180, 'half day': 720,
+            '3 days 2 nights': 3 * 1440, 'ساعتان': 120, 'ساعة ونصف': 90, '٣ ساعات': 180,
+            'ثلاثة أيام وليلتان': 3 * 1440, 'نصف يوم': 720, 'Flexible': None,
+            'Up to 10 people, 4 hours': 240, 'Visit 5 sites in 3 hours': 180, '5 km walk, 2 hours': 120,
+            'Full day (8 h)': 1440, 'Walk (3 hours)': 180, '3D tour': None, '2 to 3 hours': 180,
+            'من 2 إلى 3 ساعات': 180, '4 أو 5 أيام': 5 * 1440,
+        }
+        self.assertEqual({text: parse_duration_minutes(text) for text in cases}, cases)
+
+        package = self.create_package('Old town', 10)
+        self.assertEqual(package.duration_minutes, 120)
+        package.duration = 'يومان'
+        package.save(update_fields=['duration'])
+        package.refresh_from_db()
+        self.assertEqual(package.duration_minutes, 2 * 1440)
+
+    def test_filters(self):
+        self.create_package('Cheap', 100, duration='1 hour', max_people=2)
+        discounted = self.create_package('Discounted', 500, discount_price=150, duration='1 day', max_people=10)
+        discounted.locations.set([self.diriyah])
+        self.create_package('Dear', 400, duration='3 hours', max_people=10)
+        self.create_package('Hidden', 120, is_active=False)
+        other = create_guide('sara')
+        self.create_package('Inactive guide', 120, guide=other)
+        TourGuide.objects.filter(pk=other.pk).update(is_active=False)
+
+        self.assertEqual(self.titles(), ['Cheap', 'Discounted', 'Dear'])
+        self.assertEqual(self.titles(min_price=120, max_price=300), ['Discounted'])
+        self.assertEqual(self.titles(min_hours=2, max_hours=4), ['Dear'])
+        self.assertEqual(self.titles(people=5, sort='-price'), ['Dear', 'Discounted'])
+        self.assertEqual(self.titles(location=self.diriyah.pk), ['Discounted'])
+        self.assertEqual(self.titles(language=self.arabic.pk, sort='duration'), ['Cheap', 'Dear', 'Discounted'])
+        self.assertEqual(self.titles(language=self.arabic.pk + 1), [])
+        self.assertEqual(self.search(min_price=120)['results'][0]['effective_price'], '150.00')
+
+    def test_keyset_pagination_walks_every_package_once(self):
+        for number in range(5):
+            # Equal prices: ties are broken by id.
+            self.create_package(f'Tour {number}', 100 if number % 2 else 200)
+        expected = self.titles(sort='newest')
+        self.assertEqual(len(expected), 5)
+
+        seen, cursor = [], None
+        with mock.patch.object(catalogue, 'PAGE_SIZE', 2):
+            while True:
+                page = self.search(sort='newest', **({'cursor': cursor} if cursor else {}))
+                seen += [package['title'] for package in page['results']]
+                cursor = page['next']
+                if cursor is None:
+                    break
+            self.assertEqual(seen, expected)
+            self.assertEqual(
+                [package['title'] for package in self.search(sort='price')['results']], ['Tour 1', 'Tour 3']
+            )
+
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json()['errors'])
+
+    def test_cursors_out_of_range_are_invalid(self):
+        self.create_package('Old town', 100)
+        for sort, value, pk in [
+            ('price', 'NaN', 1), ('-price', 'Infinity', 1), ('price', 'sNaN', 1), ('duration', 2**63, 1),
+            ('price', '10', 0), ('price', '10', 2**63), ('price', '10', True),
+        ]:
+            cursor = base64.urlsafe_b64encode(json.dumps([value, pk]).encode()).decode()
+            with self.subTest(value=value, pk=pk):
+                response = self.client.get(self.url, {'sort': sort, 'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json()['errors'])
+                response = self.client.get(
+                    reverse('tourguides:packages_catalogue'), {'sort': sort, 'cursor': cursor}
+                )
+                self.assertContains(response, 'Old town')
+
+    def test_out_of_range_ids_are_invalid_not_errors(self):
+        huge = '9' * 20
+        response = self.client.get(self.url, {'location': huge, 'language': huge, 'people': huge})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'location', 'language', 'people'})
+        response = self.client.get(reverse('tourguides:packages_catalogue'), {'location': huge})
+        self.assertEqual(response.status_code, 200)
+
+    def test_catalogue_page(self):
+        self.create_package('Old town', 100)
+        with mock.patch.object(catalogue, 'PAGE_SIZE', 1):
+            self.create_package('Souk', 200)
+            response = self.client.get(reverse('tourguides:packages_catalogue'), {'max_price': 'abc'})
+        self.assertContains(response, 'Old town')
+        self.assertNotContains(response, 'Souk')
+        self.assertContains(response, 'cursor=')
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class PriceStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(analytics._buffer.clear)
+        self.guide = create_guide()
+        self.diriyah = Location.objects.create(name='Diriyah', city='Riyadh')
+        self.alula = Location.objects.create(name='Hegra', city='AlUla')
+
+    def create_package(self, price, discount_price=None, locations=()):
+        package = TourPackage.objects.create(
+            tour_guide=self.guide, title=f'Tour {price}', description='Walk', duration='2 hours',
+            price=price, discount_price=discount_price,
+        )
+        package.locations.set(locations)
+        return package
+
+    def test_effective_price_is_computed_by_the_database(self):
+        package = self.create_package(500, discount_price=150)
+        self.assertEqual(package.effective_price, 150)
+        TourPackage.objects.filter(pk=package.pk).update(discount_price=None)
+        package.refresh_from_db()
+        self.assertEqual(package.effective_price, 500)
+        self.assertQuerySetEqual(TourPackage.objects.filter(effective_price__lt=200), [])
+
+    def test_refresh_stores_ranges_per_location_and_overall(self):
+        for price in range(100, 1100, 100):
+            self.create_package(price, locations=[self.diriyah])
+        self.create_package(900, discount_price=50, locations=[self.diriyah, self.alula])
+        hidden = self.create_package(10, locations=[self.alula])
+        TourPackage.objects.filter(pk=hidden.pk).update(is_active=False)
+
+        self.assertEqual(refresh_price_stats(), 3)
+        overall = PackagePriceStats.objects.get(location=None)
+        self.assertEqual((overall.package_count, overall.min_price, overall.max_price), (11, 50, 1000))
+        self.assertEqual(overall.percentiles['50'], '500.00')
+        self.assertEqual(overall.percentiles['90'], '900.00')
+        self.assertEqual(sum(overall.histogram), 11)
+        self.assertEqual(overall.histogram[0], 2)
+        self.assertEqual(overall.bins()[0]['start'], 50)
+        alula = PackagePriceStats.objects.get(location=self.alula)
+        self.assertEqual((alula.package_count, alula.min_price, alula.max_price), (1, 50, 50))
+
+        # Nothing moved: no writes, so no new ETag.
+        self.assertEqual(refresh_price_stats(), 0)
+        TourPackage.objects.filter(locations=self.alula).update(is_active=False)
+        self.assertEqual(refresh_price_stats(), 3)
+        self.assertFalse(PackagePriceStats.objects.filter(location=self.alula).exists())
+
+        cache.add('pricing:refresh:lock', 1)
+        self.assertIsNone(refresh_price_stats())
+
+    def test_pages_show_precomputed_prices(self):
+        self.create_package(300, discount_price=250, locations=[self.diriyah])
+        self.create_package(800, locations=[self.diriyah])
+        out = io.StringIO()
+        call_command('refresh_price_stats', stdout=out)
+        self.assertIn('Updated 2 price stats rows.', out.getvalue())
+
+        # Prices come from the stored stats, not from the packages.
+        TourPackage.objects.update(price=1, discount_price=None)
+        response = self.client.get(reverse('tourguides:packages_catalogue'), {'location': self.diriyah.pk})
+        self.assertContains(response, 'Diriyah, Riyadh - من 250 ريال')
+        self.assertContains(response, 'name="min_price" min="250" max="800"')
+        response = self.client.get(reverse('tourguides:guides_list'), {'location': self.diriyah.pk})
+        self.assertContains(response, 'Diriyah, Riyadh - من 250 ريال')
+        self.assertContains(response, '2 باقة سياحية ابتداءً من 250 ريال')
+        self.assertContains(response, 'Hegra, AlUla</option>')
+
+    def test_directory_ignores_ids_out_of_range(self):
+        response = self.client.get(
+            reverse('tourguides:guides_list'), {'location': '9' * 20, 'specialty': '0', 'language': 'abc'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page_obj']), [self.guide])
+
+    def test_refresh_changes_directory_etag(self):
+        self.create_package(300)
+        url = reverse('tourguides:guides_list')
+        etag = self.client.get(url)['ETag']
+        refresh_price_stats()
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
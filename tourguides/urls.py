@@ -50,4 +50,6 @@ urlpatterns = [
     path('guides/<slug:slug>/review/', views.add_review, name='add_review'),
     path('guides/<slug:slug>/reviews/', views.tourguide_reviews, name='tourguide_reviews'),
     path('guides/<slug:slug>/similar-guides/', views.similar_guides, name='similar_guides'),
+    path('packages/', views.packages_catalogue, name='packages_catalogue'),
+    path('api/packages/', views.packages_api, name='packages_api'),
 ] 
\ No newline at end of file
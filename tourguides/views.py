@@ -1,29 +1,50 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.response import TemplateResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
-from django.db.models import Avg, Count, Q
-from django.http import JsonResponse, HttpResponse
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.http import JsonResponse
 from django.urls import reverse
 from django.utils import timezone
 from django.core.paginator import Paginator
 from wagtail.images.models import Image as WagtailImage
-from django.views.decorators.csrf import csrf_exempt
-from django.core.files.storage import FileSystemStorage
-from django.conf import settings
 import json
-import os
+
 
 from .models import (
     TourGuide, Language, Certification, Specialty, TourPackage, 
-    Location, WorkSchedule, Gallery, Video, Review, Badge, BadgeAssignment
+    Location, WorkSchedule, Gallery, Video, Review, Badge, BadgeAssignment, AnalyticsEvent
 )
 from .forms import (
     TourGuideRegistrationForm, TourGuideProfileForm, TourPackageForm,
-    GalleryForm, VideoForm, WorkScheduleForm
+    GalleryForm, VideoForm, WorkScheduleForm, PackageSearchForm
+)
+from . import catalogue, pricing
+from .catalogue import MAX_ID
+from .analytics import record_event, track_view
+from .caching import (
+    GUIDES_LIST_NAMESPACE, GUIDES_LIST_PARAMS, GUIDES_NAMESPACE, PACKAGES_PARAMS, guide_page_namespaces
 )
+from .dashboard import dashboard_stats
+from .freshness import guide_freshness, guides_list_freshness
+from .relations import save_form_relations
+from .slugs import redirect_old_slugs
+from totrip.conditional import conditional_page
+from totrip.pagecache import anonymous_page_cache
+from totrip.ratelimit import TOO_MANY_REQUESTS, limit_concurrency, rate_limit
+
+def _id_param(request, name):
+    """
+    The query parameter as a database id, or None when it is missing or
+    could not be one (ids past the bigint range fail in the database).
+    """
+    value = request.GET.get(name, '')
+    return int(value) if value.isdigit() and 0 < int(value) <= MAX_ID else None
 
+
+@limit_concurrency('auth')
 def guide_registration(request):
     """
     Handle tour guide registration.
@@ -57,11 +78,7 @@ def guide_registration(request):
                 profile.profile_image = wagtail_image
                 profile.save()
             
-            # Log the user in
-            user = authenticate(
-                username=form.cleaned_data['username'],
-                password=form.cleaned_data['password1']
-            )
+            # Log the user in; authenticate() would hash the password again
             login(request, user)
             
             messages.success(request, "Your account has been successfully created! Complete your profile to get started.")
@@ -71,6 +88,7 @@ def guide_registration(request):
     
     return render(request, 'tourguides/register.html', {'form': form})
 
+@limit_concurrency('auth')
 def guide_login(request):
     """
     Handle tour guide login.
@@ -98,47 +116,24 @@ def guide_dashboard(request):
     """
     Render the dashboard for tour guides
     """
+    has_specialties = Exists(TourGuide.specialties.through.objects.filter(tourguide=OuterRef('pk')))
     try:
-        # Get the tour guide instance for the current user
-        tour_guide = TourGuide.objects.get(user=request.user)
-        
-        # Get tour packages created by this guide
-        packages = TourPackage.objects.filter(tour_guide=tour_guide)
-        
-        # Get work schedules for this guide
-        schedules = WorkSchedule.objects.filter(tour_guide=tour_guide)
-        
-        # Get gallery images count
-        gallery_images_count = Gallery.objects.filter(tour_guide=tour_guide).count()
-        
-        # Get videos for this guide
-        videos = Video.objects.filter(tour_guide=tour_guide).order_by('order', '-created_at')
-        videos_count = videos.count()
-        
-        # Get reviews for this guide
-        reviews = Review.objects.filter(tour_guide=tour_guide)
-        
-        # Calculate average rating
-        avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-        avg_rating = round(avg_rating, 1)
-        
-        context = {
-            'tour_guide': tour_guide,
-            'packages': packages,
-            'schedules': schedules,
-            'gallery_count': gallery_images_count,
-            'videos': videos,
-            'videos_count': videos_count,
-            'reviews': reviews,
-            'avg_rating': avg_rating,
-            'review_count': reviews.count(),
-        }
-        
-        return render(request, 'tourguides/dashboard.html', context)
-    
+        tour_guide = (
+            TourGuide.objects.select_related('profile_image')
+            .annotate(has_specialties=has_specialties)
+            .get(user=request.user)
+        )
     except TourGuide.DoesNotExist:
         messages.error(request, "You don't have a tour guide profile.")
         return redirect('tourguides:guides_list')
+    # Also caches request.user.tour_guide, which base.html reads.
+    tour_guide.user = request.user
+
+    context = {
+        'tour_guide': tour_guide,
+        **dashboard_stats(tour_guide.pk),
+    }
+    return render(request, 'tourguides/dashboard.html', context)
 
 @login_required
 def guide_edit_profile(request):
@@ -182,8 +177,10 @@ def guide_edit_profile(request):
                     )
                     tour_guide.banner_image = wagtail_image
             
-            # Save the form
-            form.save()
+            # Save the form; only changed many-to-many rows are written
+            form.save(commit=False)
+            tour_guide.save()
+            save_form_relations(form)
             
             # Update user model fields if provided
             if form.cleaned_data.get('first_name'):
@@ -212,43 +209,40 @@ def guide_edit_profile(request):
     
     return render(request, 'tourguides/edit_profile.html', context)
 
+@redirect_old_slugs(TourGuide)
+@track_view(AnalyticsEvent.PROFILE_VIEW)
+@anonymous_page_cache(guide_page_namespaces)
+@conditional_page(guide_freshness)
 def guide_profile(request, slug):
     """
     Public profile view for a tour guide.
     """
     tour_guide = get_object_or_404(TourGuide, slug=slug, is_active=True)
-    packages = TourPackage.objects.filter(tour_guide=tour_guide, is_active=True)
-    gallery = Gallery.objects.filter(tour_guide=tour_guide).order_by('order')
-    videos = Video.objects.filter(tour_guide=tour_guide).order_by('order')
     reviews = Review.objects.filter(tour_guide=tour_guide, is_approved=True)
-    schedules = WorkSchedule.objects.filter(
-        tour_guide=tour_guide, 
-        end_date__gte=timezone.now().date()
-    ).order_by('start_date')
-    
-    # Calculate average rating
-    avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-    review_count = reviews.count()
-    
-    # Get assigned badges
-    badges = BadgeAssignment.objects.filter(tour_guide=tour_guide).select_related('badge')
     
     context = {
         'tour_guide': tour_guide,
-        'packages': packages,
-        'gallery': gallery,
-        'videos': videos,
-        'reviews': reviews,
-        'schedules': schedules,
-        'avg_rating': avg_rating,
-        'review_count': review_count,
-        'badges': badges,
-        'is_owner': request.user.is_authenticated and request.user == tour_guide.user,
+        'packages': list(TourPackage.objects.filter(tour_guide=tour_guide, is_active=True)),
+        'gallery': list(Gallery.objects.filter(tour_guide=tour_guide).select_related('image').order_by('order')),
+        'videos': list(Video.objects.filter(tour_guide=tour_guide).order_by('order')),
+        # The profile only shows the two latest reviews.
+        'reviews': list(reviews[:2]),
+        'schedules': list(WorkSchedule.objects.filter(
+            tour_guide=tour_guide,
+            end_date__gte=timezone.now().date()
+        ).select_related('location').order_by('start_date')),
+        'avg_rating': tour_guide.avg_rating or 0,
+        'review_count': tour_guide.review_count,
+        # Get assigned badges
+        'badges': list(BadgeAssignment.objects.filter(tour_guide=tour_guide).select_related('badge')),
+        'is_owner': request.user.is_authenticated and request.user.pk == tour_guide.user_id,
     }
     
-    return render(request, 'tourguides/profile.html', context)
+    return TemplateResponse(request, 'tourguides/profile.html', context)
 
 
+@anonymous_page_cache((GUIDES_NAMESPACE, GUIDES_LIST_NAMESPACE), query_params=GUIDES_LIST_PARAMS)
+@conditional_page(guides_list_freshness)
 def guides_list(request):
     """
     List all active tour guides.
@@ -256,7 +250,7 @@ def guides_list(request):
     guides_query = TourGuide.objects.filter(is_active=True)
     
     # Filter by location if provided
-    location_id = request.GET.get('location')
+    location_id = _id_param(request, 'location')
     if location_id:
         guides_query = guides_query.filter(
             Q(schedules__location_id=location_id) | 
@@ -264,20 +258,20 @@ def guides_list(request):
         ).distinct()
     
     # Filter by specialty if provided
-    specialty_id = request.GET.get('specialty')
+    specialty_id = _id_param(request, 'specialty')
     if specialty_id:
         guides_query = guides_query.filter(specialties__id=specialty_id)
     
     # Filter by language if provided
-    language_id = request.GET.get('language')
+    language_id = _id_param(request, 'language')
     if language_id:
         guides_query = guides_query.filter(languages__id=language_id)
     
-    # Featured guides first, then sort by recommended status
-    guides = guides_query.annotate(
-        review_count=Count('reviews', filter=Q(reviews__is_approved=True)),
-        avg_rating=Avg('reviews__rating', filter=Q(reviews__is_approved=True))
-    ).order_by('-is_featured', '-is_recommended', '-avg_rating', '-review_count')
+    # Featured guides first, then sort by recommended status and the
+    # stored rating stats (see refresh_guide_ratings)
+    guides = guides_query.order_by(
+        '-is_featured', '-is_recommended', F('avg_rating').desc(nulls_last=True), '-review_count'
+    )
     
     # Pagination
     paginator = Paginator(guides, 12)  # Show 12 guides per page
@@ -286,17 +280,89 @@ def guides_list(request):
     
     context = {
         'page_obj': page_obj,
-        'locations': Location.objects.all(),
-        'specialties': Specialty.objects.all(),
-        'languages': Language.objects.all(),
-        'selected_location': location_id,
-        'selected_specialty': specialty_id,
-        'selected_language': language_id,
+        'locations': list(pricing.locations_with_prices()),
+        'specialties': list(Specialty.objects.all()),
+        'languages': list(Language.objects.all()),
+        'selected_location': str(location_id) if location_id else None,
+        'selected_specialty': str(specialty_id) if specialty_id else None,
+        'selected_language': str(language_id) if language_id else None,
+        'price_stats': pricing.price_stats(location_id),
     }
     
-    return render(request, 'tourguides/guides_list.html', context)
+    return TemplateResponse(request, 'tourguides/guides_list.html', context)
+
+
+
+def _search_packages(form):
+    filters = form.filters()
+    sort = filters.get('sort', catalogue.DEFAULT_SORT)
+    rows = list(catalogue.search_packages(**filters)[:catalogue.PAGE_SIZE + 1])
+    return catalogue.next_cursor(sort, rows)
 
 
+@anonymous_page_cache((GUIDES_NAMESPACE, GUIDES_LIST_NAMESPACE), query_params=PACKAGES_PARAMS)
+@conditional_page(guides_list_freshness)
+def packages_catalogue(request):
+    """
+    Public catalogue of active tour packages, with filters and keyset
+    pagination. Invalid filters are ignored.
+    """
+    form = PackageSearchForm(request.GET)
+    form.is_valid()
+    packages, cursor = _search_packages(form)
+
+    next_query = None
+    if cursor:
+        query = request.GET.copy()
+        query['cursor'] = cursor
+        next_query = query.urlencode()
+    first_query = request.GET.copy()
+    first_query.pop('cursor', None)
+
+    context = {
+        'form': form,
+        'packages': packages,
+        'locations': list(pricing.locations_with_prices()),
+        'languages': list(Language.objects.all()),
+        'sort_choices': PackageSearchForm.SORT_CHOICES,
+        'price_stats': pricing.price_stats(form.filters().get('location')),
+        'next_query': next_query,
+        'first_query': first_query.urlencode() if 'cursor' in request.GET else None,
+    }
+    return TemplateResponse(request, 'tourguides/packages_catalogue.html', context)
+
+
+@anonymous_page_cache((GUIDES_NAMESPACE, GUIDES_LIST_NAMESPACE), query_params=PACKAGES_PARAMS)
+@conditional_page(guides_list_freshness)
+def packages_api(request):
+    """
+    The package catalogue as JSON: {"results": [...], "next": cursor}. Pass
+    next back as the cursor parameter for the following page.
+    """
+    form = PackageSearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+    packages, cursor = _search_packages(form)
+    results = [
+        {
+            'slug': package.slug,
+            'title': package.title,
+            'guide': {
+                'name': str(package.tour_guide),
+                'url': reverse('tourguides:tourguide_profile', args=[package.tour_guide.slug]),
+            },
+            'price': str(package.price),
+            'discount_price': str(package.discount_price) if package.discount_price is not None else None,
+            'effective_price': f'{package.effective_price:.2f}',
+            'duration': package.duration,
+            'duration_minutes': package.duration_minutes,
+            'max_people': package.max_people,
+            'locations': [location.name for location in package.locations.all()],
+        }
+        for package in packages
+    ]
+    return JsonResponse({'results': results, 'next': cursor})
+
 @login_required
 def add_tour_package(request):
     """
@@ -310,7 +376,7 @@ def add_tour_package(request):
             package = form.save(commit=False)
             package.tour_guide = tour_guide
             package.save()
-            form.save_m2m()  # Save many-to-many relationships
+            save_form_relations(form)  # Save many-to-many relationships
             
             messages.success(request, "Tour package added successfully!")
             return redirect('tourguides:tourguide_dashboard')
@@ -326,6 +392,7 @@ def add_tour_package(request):
     return render(request, 'tourguides/add_package.html', context)
 
 @login_required
+@redirect_old_slugs(TourPackage)
 def update_tour_package(request, slug):
     """
     Allow tour guides to update an existing tour package.
@@ -338,7 +405,7 @@ def update_tour_package(request, slug):
         if form.is_valid():
             package = form.save(commit=False)
             package.save()
-            form.save_m2m()  # Save many-to-many relationships
+            save_form_relations(form)  # Save many-to-many relationships
             
             messages.success(request, "Tour package updated successfully!")
             return redirect('tourguides:tourguide_dashboard')
@@ -356,6 +423,7 @@ def update_tour_package(request, slug):
     return render(request, 'tourguides/add_package.html', context)
 
 @login_required
+@redirect_old_slugs(TourPackage)
 def delete_tour_package(request, slug):
     """
     Allow tour guides to delete an existing tour package.
@@ -605,6 +673,11 @@ def add_schedule(request):
     
     return render(request, 'tourguides/add_schedule.html', context)
 
+def _review_throttled(request, retry_after, slug):
+    messages.error(request, TOO_MANY_REQUESTS)
+    return redirect('tourguides:tourguide_profile', slug=slug)
+
+@rate_limit('review', refused=_review_throttled)
 def add_review(request, slug):
     """
     Allow users to submit reviews for tour guides.
@@ -626,6 +699,7 @@ def add_review(request, slug):
                 comment=comment,
                 is_approved=False  # Reviews need approval before showing up
             )
+            record_event(AnalyticsEvent.REVIEW_SUBMITTED, tour_guide.slug)
             
             messages.success(request, "Thank you for your review! It will be visible after approval.")
         else:
@@ -635,6 +709,8 @@ def add_review(request, slug):
     
     return redirect('tourguides:tourguide_profile', slug=slug)
 
+@redirect_old_slugs(TourGuide)
+@conditional_page(guide_freshness)
 def tourguide_reviews(request, slug):
     """
     Display all approved reviews for a tour guide.
@@ -642,33 +718,32 @@ def tourguide_reviews(request, slug):
     tour_guide = get_object_or_404(TourGuide, slug=slug, is_active=True)
     reviews = Review.objects.filter(tour_guide=tour_guide, is_approved=True).order_by('-created_at')
     
-    # Calculate average rating
-    avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-    avg_rating = round(avg_rating, 1)
-    
     context = {
         'tour_guide': tour_guide,
-        'reviews': reviews,
-        'avg_rating': avg_rating,
-        'review_count': reviews.count(),
+        'reviews': list(reviews),
+        'avg_rating': round(tour_guide.avg_rating or 0, 1),
+        'review_count': tour_guide.review_count,
     }
     
-    return render(request, 'tourguides/reviews.html', context)
+    return TemplateResponse(request, 'tourguides/reviews.html', context)
 
+@redirect_old_slugs(TourGuide)
 def similar_guides(request, slug):
     """
     Find similar tour guides based on specialties and locations.
     """
-    current_guide = get_object_or_404(TourGuide, slug=slug, is_active=True)
+    current_guide = get_object_or_404(
+        TourGuide.objects.select_related('user'), slug=slug, is_active=True
+    )
     
     # Get specialties of the current guide
-    specialties = current_guide.specialties.all()
+    specialties = current_guide.specialties.values('pk')
     
     # Get locations where the current guide operates
     locations = Location.objects.filter(
         Q(schedules__tour_guide=current_guide) | 
         Q(packages__tour_guide=current_guide)
-    ).distinct()
+    ).values('pk')
     
     # Find similar guides with similar specialties or locations
     similar_guides = TourGuide.objects.filter(
@@ -686,47 +761,10 @@ def similar_guides(request, slug):
     
     context = {
         'current_guide': current_guide,
-        'similar_guides': similar_guides,
-    }
-    
-    return render(request, 'tourguides/similar_guides.html', context)
-
-@login_required
-def dashboard(request):
-    """
-    Admin dashboard for managing tour guides.
-    """
-    try:
-        tour_guide = TourGuide.objects.get(user=request.user)
-    except TourGuide.DoesNotExist:
-        # If user is not a tour guide, redirect to guides list
-        return redirect('tourguides:guides_list')
-    
-    # Get tour packages
-    packages = TourPackage.objects.filter(tour_guide=tour_guide)
-    
-    # Get work schedules
-    schedules = WorkSchedule.objects.filter(tour_guide=tour_guide).order_by('start_date')
-    
-    # Get gallery images count
-    gallery_count = Gallery.objects.filter(tour_guide=tour_guide).count()
-    
-    # Get reviews
-    reviews = Review.objects.filter(tour_guide=tour_guide).order_by('-created_at')
-    
-    # Calculate average rating
-    avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-    
-    context = {
-        'tour_guide': tour_guide,
-        'packages': packages,
-        'schedules': schedules,
-        'gallery_count': gallery_count,
-        'reviews': reviews,
-        'avg_rating': avg_rating,
+        'similar_guides': list(similar_guides.select_related('user')),
     }
     
-    return render(request, 'tourguides/dashboard.html', context)
+    return TemplateResponse(request, 'tourguides/similar_guides.html', context)
 
 @login_required
 def gallery_list(request):
@@ -891,7 +929,7 @@ def delete_schedule(request, id):
     return render(request, 'tourguides/delete_schedule_confirm.html', context)
 
 @login_required
-@csrf_exempt
+@rate_limit('lookup')
 def add_specialty(request):
     """Add a new specialty via AJAX request"""
     if request.method == 'POST':
@@ -902,8 +940,7 @@ def add_specialty(request):
             if not name:
                 return JsonResponse({'success': False, 'error': 'اسم التخصص مطلوب'})
                 
-            # Check if specialty already exists
-            specialty, created = Specialty.objects.get_or_create(name=name)
+            specialty, created = Specialty.get_or_create_by_name(name)
             
             return JsonResponse({
                 'success': True,
@@ -918,7 +955,7 @@ def add_specialty(request):
     return JsonResponse({'success': False, 'error': 'طلب غير صالح'})
 
 @login_required
-@csrf_exempt
+@rate_limit('lookup')
 def add_language(request):
     """Add a new language via AJAX request"""
     if request.method == 'POST':
@@ -929,8 +966,7 @@ def add_language(request):
             if not name:
                 return JsonResponse({'success': False, 'error': 'اسم اللغة مطلوب'})
                 
-            # Check if language already exists
-            language, created = Language.objects.get_or_create(name=name)
+            language, created = Language.get_or_create_by_name(name)
             
             return JsonResponse({
                 'success': True,
@@ -945,7 +981,7 @@ def add_language(request):
     return JsonResponse({'success': False, 'error': 'طلب غير صالح'})
 
 @login_required
-@csrf_exempt
+@rate_limit('lookup')
 def add_certification(request):
     """Add a new certification via AJAX request"""
     if request.method == 'POST':
@@ -956,8 +992,7 @@ def add_certification(request):
             if not name:
                 return JsonResponse({'success': False, 'error': 'اسم الشهادة مطلوب'})
                 
-            # Check if certification already exists
-            certification, created = Certification.objects.get_or_create(name=name)
+            certification, created = Certification.get_or_create_by_name(name)
             
             return JsonResponse({
                 'success': True,
@@ -2,9 +2,10 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.utils.text import slugify
 from wagtail.images.models import Image as WagtailImage
 
+from totrip.slugs import unique_slug
+
 class UserProfile(models.Model):
     """
     Model for regular user profiles.
@@ -28,7 +29,9 @@ class UserProfile(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.user.username)
+            self.slug = unique_slug(
+                UserProfile.objects.exclude(pk=self.pk), self.user.username, 100, fallback='user'
+            )
         super().save(*args, **kwargs)
 
 @receiver(post_save, sender=User)
@@ -1,3 +1,67 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from totrip import ratelimit
+from totrip.ratelimit import client_ip
+
+
+class RegistrationTests(TestCase):
+    def test_register_logs_in_with_a_single_hash(self):
+        data = {
+            'first_name': 'Mona', 'last_name': 'Ali', 'username': 'mona', 'email': 'mona@example.com',
+            'password1': 'a-long-pass-phrase', 'password2': 'a-long-pass-phrase', 'agreement': 'on',
+        }
+        with mock.patch.object(
+            PBKDF2PasswordHasher, 'encode', autospec=True, side_effect=PBKDF2PasswordHasher.encode
+        ) as encode, mock.patch.object(
+            PBKDF2PasswordHasher, 'verify', autospec=True, side_effect=PBKDF2PasswordHasher.verify
+        ) as verify:
+            response = self.client.post(reverse('users:register'), data)
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertEqual((encode.call_count, verify.call_count), (1, 0))
+        self.assertEqual(int(self.client.session['_auth_user_id']), User.objects.get(username='mona').pk)
+
+
+class LoginConcurrencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('mona', password='a-long-pass-phrase')
+
+    def test_excess_concurrent_logins_get_429(self):
+        url = reverse('users:login')
+        data = {'username': 'mona', 'password': 'a-long-pass-phrase'}
+        # Two requests from this address are already hashing.
+        cache.set('ratelimit:concurrency:auth:127.0.0.1', 2)
+        with self.assertLogs('totrip.ratelimit', 'WARNING'):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(cache.get('ratelimit:concurrency:auth:127.0.0.1'), 2)
+
+        cache.set('ratelimit:concurrency:auth:127.0.0.1', 1)
+        self.assertRedirects(self.client.post(url, data), '/', fetch_redirect_response=False)
+        self.assertEqual(cache.get('ratelimit:concurrency:auth:127.0.0.1'), 1)
+
+    @override_settings(AUTH_CONCURRENCY_ENABLED=False)
+    def test_limit_is_off_without_a_shared_cache(self):
+        cache.set('ratelimit:concurrency:auth:127.0.0.1', 5)
+        self.addCleanup(cache.clear)
+        response = self.client.post(reverse('users:login'), {'username': 'mona', 'password': 'a-long-pass-phrase'})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+
+    def test_client_ip_behind_proxies(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='10.0.0.1, 203.0.113.7', REMOTE_ADDR='10.0.0.2')
+        ratelimit._warn_untrusted_proxy.cache_clear()
+        with self.assertLogs('totrip.ratelimit', 'WARNING') as logs:
+            self.assertEqual(client_ip(request), '10.0.0.2')
+            self.assertEqual(client_ip(request), '10.0.0.2')
+        # Once per process.
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('TRUSTED_PROXY_COUNT is 0', logs.output[0])
+        with override_settings(TRUSTED_PROXY_COUNT=1):
+            self.assertEqual(client_ip(request), '203.0.113.7')
@@ -6,9 +6,12 @@ from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_exempt
 from wagtail.images.models import Image as WagtailImage
 
+from totrip.ratelimit import limit_concurrency
+
 from .models import UserProfile
 from .forms import UserRegistrationForm, UserProfileForm
 
+@limit_concurrency('auth')
 def user_register(request):
     """
     Handle regular user registration.
@@ -28,11 +31,7 @@ def user_register(request):
                 user.user_profile.profile_image = wagtail_image
                 user.user_profile.save()
             
-            # Authenticate and login the user
-            user = authenticate(
-                username=form.cleaned_data['username'],
-                password=form.cleaned_data['password1']
-            )
+            # Log the user in; authenticate() would hash the password again
             login(request, user)
             
             messages.success(request, "تم إنشاء حسابك بنجاح!")
@@ -45,6 +44,7 @@ def user_register(request):
     }
     return render(request, 'users/register.html', context)
 
+@limit_concurrency('auth')
 def user_login(request):
     """
     Handle regular user login.